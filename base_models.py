@@ -137,4 +137,34 @@ class Contact(ContactBase):
     updated_at: datetime
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+class DeadLetterReplayRequest(BaseModel):
+    job_ids: List[str]
+    run_at: Optional[datetime] = None  # Defaults to now
+
+class JobStatusRequest(BaseModel):
+    job_ids: List[str] = Field(..., min_length=1, max_length=1000)
+
+class CallTemplate(BaseModel):
+    """What the assistant says on a campaign call; {placeholders} come from each recipient's variables"""
+    name: str = "Outbound Campaign Call"
+    first_message: str
+    system_prompt: str
+    voicemail_message: Optional[str] = None
+    end_call_message: Optional[str] = None
+    assistant_name: str = "Assistant"
+
+class CampaignRecipient(BaseModel):
+    to_number: str
+    variables: Dict[str, str] = {}
+
+class CallCampaignCreate(BaseModel):
+    name: str
+    # A saved template id (e.g. "appointment_confirmation") or a template of your own
+    template_id: Optional[str] = None
+    template: Optional[CallTemplate] = None
+    recipients: List[CampaignRecipient] = Field(..., min_length=1, max_length=10000)
+    max_concurrency: int = Field(5, ge=1, le=50)  # Calls in flight at once
+    calls_per_window: int = Field(5, ge=1)  # Calls started per pacing window
+    pacing_window_seconds: float = Field(1.0, gt=0)
@@ -0,0 +1,128 @@
+"""
+Job runner throughput benchmark.
+
+Compares the legacy runner (a sync wrapper that builds and tears down a fresh
+event loop on an executor thread for every run) with the async-native runner
+in SupabaseJobScheduler._job_wrapper (awaited on the scheduler loop, sync jobs
+sent to the sized job executor).
+
+Status writes and lease claims are replaced with no-ops so only runner
+overhead is measured.
+
+Usage:
+    python benchmarks/bench_job_runner.py --jobs 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scheduler import SupabaseJobScheduler, JobSchedulerConfig, JobStatus  # noqa: E402
+from job_index import JobIndex  # noqa: E402
+from job_store import SQLiteJobStore  # noqa: E402
+from concurrent.futures import ThreadPoolExecutor  # noqa: E402
+
+
+async def async_job(**kwargs):
+    await asyncio.sleep(0)
+    return kwargs.get('job_id')
+
+
+def sync_job(**kwargs):
+    return kwargs.get('job_id')
+
+
+class FreeLeaseStore(SQLiteJobStore):
+    """In-memory store where every lease claim and renewal succeeds without a row"""
+
+    def __init__(self):
+        super().__init__(":memory:")
+
+    def claim_job(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        return True
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        return True
+
+
+def make_runner(workers: int) -> SupabaseJobScheduler:
+    """Build a scheduler shell with just what _job_wrapper needs"""
+    runner = SupabaseJobScheduler.__new__(SupabaseJobScheduler)
+    runner.config = JobSchedulerConfig(retry_failed_jobs=False, sync_job_workers=workers)
+    runner._job_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job-sync")
+    runner.store = FreeLeaseStore()
+    runner.owner_id = "bench"
+    runner.job_index = JobIndex(max_entries=runner.config.job_index_size)
+
+    async def _noop_status(job_id: str, status: JobStatus) -> None:
+        return None
+
+    runner._update_job_status = _noop_status
+    return runner
+
+
+def legacy_job_wrapper(runner: SupabaseJobScheduler, func):
+    """The pre-change runner: new event loop per job run"""
+    async def wrapped_func(**kwargs):
+        job_id = kwargs.get('job_id')
+        await runner._update_job_status(job_id, JobStatus.RUNNING)
+        if asyncio.iscoroutinefunction(func):
+            result = await func(**kwargs)
+        else:
+            result = await asyncio.get_event_loop().run_in_executor(None, lambda: func(**kwargs))
+        await runner._update_job_status(job_id, JobStatus.COMPLETED)
+        return result
+
+    def sync_wrapper(**kwargs):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            return loop.run_until_complete(wrapped_func(**kwargs))
+        finally:
+            try:
+                pending = asyncio.all_tasks(loop)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                loop.run_until_complete(loop.shutdown_asyncgens())
+            finally:
+                loop.close()
+
+    return sync_wrapper
+
+
+async def dispatch(wrapped, jobs: int) -> float:
+    """Fire jobs the way AsyncIOExecutor does and return jobs per second"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    if asyncio.iscoroutinefunction(wrapped):
+        await asyncio.gather(*(wrapped(job_id=f"job_{i}") for i in range(jobs)))
+    else:
+        await asyncio.gather(*(
+            loop.run_in_executor(None, lambda i=i: wrapped(job_id=f"job_{i}"))
+            for i in range(jobs)
+        ))
+    return jobs / (time.perf_counter() - start)
+
+
+async def main(jobs: int, workers: int) -> None:
+    runner = make_runner(workers)
+    print(f"{'runner':<10} {'job':<6} {'jobs/s':>12}")
+    for label, func in (("async", async_job), ("sync", sync_job)):
+        before = await dispatch(legacy_job_wrapper(runner, func), jobs)
+        after = await dispatch(runner._job_wrapper(func), jobs)
+        print(f"{'before':<10} {label:<6} {before:>12,.0f}")
+        print(f"{'after':<10} {label:<6} {after:>12,.0f}   ({after / before:.1f}x)")
+    runner._job_executor.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(main(args.jobs, args.workers))
@@ -0,0 +1,133 @@
+"""
+Multi-worker lease check against the embedded SQLite job store.
+
+Seeds a shared database with one-shot jobs, then starts several worker
+processes that each restore and arm every job, as uvicorn workers would.
+Leases decide which worker runs each job. With --crash-one, the first
+worker dies while holding a lease so the others have to take the job over
+once the lease expires.
+
+Reports runs per worker, duplicate runs and jobs that never ran.
+
+Usage:
+    python benchmarks/bench_lease_workers.py --workers 4 --jobs 500 --crash-one
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(db_path: str, jobs: int, start_in: float, spread: float) -> None:
+    from job_store import SQLiteJobStore
+
+    store = SQLiteJobStore(db_path)
+    now = datetime.now(pytz.UTC)
+    for i in range(jobs):
+        run_date = (now + timedelta(seconds=start_in + spread * i / jobs)).isoformat()
+        store.insert_job({
+            'job_id': f"job_{i}",
+            'job_type': 'custom',
+            'run_date': run_date,
+            'next_run': run_date,
+            'status': 'scheduled',
+            'metadata': {'n': i},
+            'created_at': now.isoformat(),
+            'retry_count': 0,
+            'max_retries': 0,
+            'handler': 'record_run'
+        })
+    store._conn.execute("create table if not exists runs (job_id text, worker text)")
+    store.close()
+
+
+def record_run(db_path: str, worker: str, crash: bool, job_id: str, **kwargs) -> None:
+    if crash and not getattr(record_run, "crashed", False):
+        record_run.crashed = True
+        os._exit(1)  # die while holding the lease
+    conn = sqlite3.connect(db_path, timeout=30)
+    with conn:
+        conn.execute("insert into runs values (?, ?)", (job_id, worker))
+    conn.close()
+
+
+async def worker_main(index: int, db_path: str, duration: float, lease_seconds: int, crash: bool) -> None:
+    import functools
+    from job_store import SQLiteJobStore
+    from scheduler import SupabaseJobScheduler, JobSchedulerConfig
+
+    worker = f"worker-{index}"
+    scheduler = SupabaseJobScheduler(
+        config=JobSchedulerConfig(
+            engine="timer",
+            lease_seconds=lease_seconds,
+            worker_id=worker,
+            retry_failed_jobs=False
+        ),
+        store=SQLiteJobStore(db_path)
+    )
+    scheduler.register_handler('record_run', functools.partial(record_run, db_path, worker, crash))
+    scheduler.start()
+    await asyncio.sleep(duration)
+    scheduler.shutdown(wait=False)
+
+
+def run_worker(index: int, db_path: str, duration: float, lease_seconds: int, crash: bool) -> None:
+    asyncio.run(worker_main(index, db_path, duration, lease_seconds, crash))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--spread", type=float, default=3.0, help="seconds over which jobs come due")
+    parser.add_argument("--lease-seconds", type=int, default=3)
+    parser.add_argument("--crash-one", action="store_true")
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), "jobs.db")
+    start_in = 2.0
+    seed(db_path, args.jobs, start_in, args.spread)
+    # Enough time for every job plus expiry and a sweep to take over a crashed lease
+    duration = start_in + args.spread + 3 * args.lease_seconds
+
+    started = time.perf_counter()
+    processes = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(i, db_path, duration, args.lease_seconds, args.crash_one and i == 0)
+        )
+        for i in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+
+    conn = sqlite3.connect(db_path)
+    runs = Counter(job_id for (job_id,) in conn.execute("select job_id from runs"))
+    per_worker = Counter(worker for (worker,) in conn.execute("select worker from runs"))
+    statuses = dict(conn.execute("select status, count(*) from scheduled_jobs group by status").fetchall())
+    conn.close()
+
+    duplicates = sum(1 for count in runs.values() if count > 1)
+    missing = args.jobs - len(runs)
+    print(f"workers={args.workers} jobs={args.jobs} elapsed={elapsed:.1f}s")
+    print(f"runs per worker: {dict(sorted(per_worker.items()))}")
+    print(f"job statuses:    {statuses}")
+    print(f"duplicates={duplicates} missing={missing}")
+
+
+if __name__ == "__main__":
+    main()
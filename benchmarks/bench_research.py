@@ -0,0 +1,113 @@
+"""
+Research graph wall-clock benchmark.
+
+Runs research.run_research sequentially (one plan item per step, each seeing
+the findings before it) and in parallel mode (plan items researched at once,
+RESEARCH_CONCURRENCY at a time) against a stub chat model that answers every
+prompt after a fixed delay, so the timings show model round trips saved
+rather than model speed. The stub streams its synthesis over the same delay,
+and the report shows when the first partial answer reached on_partial.
+
+Usage:
+    python benchmarks/bench_research.py --steps 6 --latency 0.5 --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# research.py builds its Anthropic client at import time; it is swapped out below
+os.environ.setdefault("ANTHROPIC_API_KEY", "bench")
+
+from langchain_core.language_models.chat_models import BaseChatModel  # noqa: E402
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage  # noqa: E402
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult  # noqa: E402
+import research  # noqa: E402
+
+SYNTHESIS_CHUNKS = 20
+
+
+class FixedLatencyChatModel(BaseChatModel):
+    """Chat model stub: answers from the prompt after latency seconds, streamed evenly over that time"""
+    latency: float = 0.5
+    plan_items: int = 6
+
+    @property
+    def _llm_type(self) -> str:
+        return "fixed-latency-stub"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        system = messages[0].content if messages else ""
+        if "planning" in system:
+            return "\n".join(f"{i + 1}. Sub-question {i + 1}" for i in range(self.plan_items))
+        if "synthesis" in system:
+            return "".join(f"Part {i + 1} of the synthesized answer. " for i in range(SYNTHESIS_CHUNKS))
+        return "Findings for " + messages[-1].content.split("\n")[0]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                  **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                         **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None,
+                       **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        reply = self._reply(messages)
+        size = -(-len(reply) // SYNTHESIS_CHUNKS)
+        for start in range(0, len(reply), size):
+            await asyncio.sleep(self.latency / SYNTHESIS_CHUNKS)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=reply[start:start + size]))
+
+
+async def run(parallel: bool, steps: int) -> tuple:
+    started = time.perf_counter()
+    first_partial: List[float] = []
+
+    def on_partial(answer: str) -> None:
+        if not first_partial:
+            first_partial.append(time.perf_counter() - started)
+
+    result = await research.run_research(
+        "How do reminders reach users?", parallel=parallel, max_steps=steps, on_partial=on_partial
+    )
+    return time.perf_counter() - started, first_partial[0] if first_partial else None, result
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=6, help="Plan items to research")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds per model call")
+    parser.add_argument("--concurrency", type=int, default=4, help="Model calls at once in parallel mode")
+    parser.add_argument("--partial-chars", type=int, default=200, help="Answer growth between partial answers")
+    args = parser.parse_args()
+
+    research.model = FixedLatencyChatModel(latency=args.latency, plan_items=args.steps)
+    research.RESEARCH_CONCURRENCY = args.concurrency
+    research.RESEARCH_PARTIAL_CHARS = args.partial_chars
+    # research.py prints its state; keep the report readable
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        rows = [(label, *await run(parallel, args.steps)) for label, parallel in (("sequential", False), ("parallel", True))]
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    print(f"{args.steps} plan items, {args.latency}s per model call, concurrency {args.concurrency}")
+    for label, elapsed, first_partial, result in rows:
+        partial = f"{first_partial:.2f}s" if first_partial is not None else "-"
+        print(f"{label:<12} {elapsed:7.2f}s  first partial {partial:>6}  "
+              f"findings={len(result['findings'])}  error={result.get('error')}")
+    sequential, parallel = rows[0][1], rows[1][1]
+    print(f"speedup      {sequential / parallel:7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
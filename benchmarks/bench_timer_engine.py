@@ -0,0 +1,109 @@
+"""
+Pending-job memory and scheduling cost: TimerEngine vs APScheduler.
+
+Fills each engine with one-shot reminder jobs shaped like the ones main.py
+creates and reports memory per pending job (tracemalloc), add cost and drain
+cost. APScheduler is measured at a smaller count by default because holding
+1M Job objects takes several GB; per-job figures are comparable.
+
+Usage:
+    python benchmarks/bench_timer_engine.py --jobs 1000000 --baseline-jobs 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from timer_engine import TimerEngine  # noqa: E402
+
+
+def reminder_job(**kwargs):
+    return None
+
+
+def job_ids(count: int):
+    for i in range(count):
+        kind = "call" if i % 2 else "sms"
+        yield f"task_reminder_{kind}_{uuid.UUID(int=i)}"
+
+
+def measure(label: str, count: int, fill) -> None:
+    ids = list(job_ids(count))  # ids exist either way; keep them out of the figure
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    drain = fill(ids)
+    add_seconds = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    drain()
+    drain_seconds = time.perf_counter() - start
+
+    print(f"{label:<12} {count:>10,} jobs  "
+          f"{current / count:>8,.0f} B/job  "
+          f"add {add_seconds / count * 1e6:>6.2f} us/job  "
+          f"drain {drain_seconds / count * 1e6:>6.2f} us/job")
+
+
+def fill_timer_engine(ids):
+    engine = TimerEngine()
+    base = time.time() + 86400
+    for i, job_id in enumerate(ids):
+        engine.add(job_id, base + (i * 7919) % 86400, "twilio_sms:send_sms")
+
+    def drain():
+        engine.pop_due(now=base + 86400)
+    return drain
+
+
+def fill_apscheduler(ids):
+    from apscheduler.schedulers.background import BackgroundScheduler
+
+    scheduler = BackgroundScheduler(timezone=pytz.UTC)
+    scheduler.start(paused=True)
+    base = datetime.now(pytz.UTC) + timedelta(days=1)
+    for i, job_id in enumerate(ids):
+        # Same shape as the kwargs _create_job hands to APScheduler
+        scheduler.add_job(
+            func=reminder_job,
+            trigger='date',
+            run_date=base + timedelta(seconds=(i * 7919) % 86400),
+            id=job_id,
+            kwargs={
+                'job_id': job_id,
+                'to_number': '+12045550100',
+                'message': "Reminder: Your task 'Submit quarterly report' is due at 05:00 PM",
+                'metadata': {
+                    'task_id': str(uuid.UUID(int=i)),
+                    'user_id': str(uuid.UUID(int=i // 4)),
+                    'reminder_type': 'SMS'
+                }
+            },
+            misfire_grace_time=None
+        )
+
+    def drain():
+        scheduler.remove_all_jobs()
+        scheduler.shutdown(wait=False)
+    return drain
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=1_000_000)
+    parser.add_argument("--baseline-jobs", type=int, default=100_000)
+    args = parser.parse_args()
+
+    measure("timer", args.jobs, fill_timer_engine)
+    if args.baseline_jobs:
+        measure("apscheduler", args.baseline_jobs, fill_apscheduler)
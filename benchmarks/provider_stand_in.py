@@ -0,0 +1,448 @@
+"""
+Local stand-in for Vapi and Twilio, for load and integration testing
+without live providers.
+
+serve
+    Runs an HTTP server that accepts Vapi's create-call request (POST /call)
+    and Twilio's create-message request
+    (POST /2010-04-01/Accounts/<sid>/Messages.json). Each endpoint has its
+    own latency, error rate and rate limit; requests over the limit get a
+    429 shaped like the real provider's. Accepted calls then play out: the
+    stand-in posts status-update (ringing, in-progress) and an
+    end-of-call-report, with an ended reason drawn from --call-outcomes, to
+    the call's assistant.serverUrl (or --app-url/callbacks/vapi). Messages
+    with a StatusCallback get signed sent and delivered/undelivered
+    callbacks. GET /stats returns request counts and peak concurrency.
+
+    Point the app at it with:
+        VAPI_API_OUTBOUND_CALL_URL=http://127.0.0.1:8100/call
+        TWILIO_API_BASE_URL=http://127.0.0.1:8100
+
+replay
+    Plays inbound Vapi webhook sequences against a running app at --rate
+    calls per second: status-update, tool-calls (to /1/process, calling
+    --tool) and end-of-call-report (to /callbacks/vapi). Reports response
+    time percentiles and failures per message type.
+
+Usage:
+    python benchmarks/provider_stand_in.py serve --port 8100 --vapi-rate-limit 5 --twilio-error-rate 0.02
+    python benchmarks/provider_stand_in.py replay --app-url http://127.0.0.1:8000 --rate 20 --calls 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl
+
+from aiohttp import ClientSession, ClientTimeout, web
+from twilio.request_validator import RequestValidator
+
+# Weights for the ended reason of each simulated call
+DEFAULT_CALL_OUTCOMES = {
+    "customer-ended-call": 0.6,
+    "assistant-ended-call": 0.1,
+    "customer-did-not-answer": 0.15,
+    "voicemail": 0.1,
+    "customer-busy": 0.05,
+}
+
+
+class EndpointBehaviour:
+    """How one simulated endpoint responds"""
+
+    def __init__(self, latency: float = 0.2, jitter: float = 0.0, error_rate: float = 0.0, rate_limit: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit  # Requests per second; 0 is unlimited
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.ok = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.started: List[float] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "ok": self.ok,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "peak_in_flight": self.peak_in_flight,
+        }
+
+
+class _RateLimit:
+    """Token bucket holding one second's worth of requests"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def allow(self) -> bool:
+        if self.rate <= 0:
+            return True
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class ProviderStandIn:
+    """Vapi and Twilio endpoints with configurable latency, errors and rate limits"""
+
+    def __init__(
+        self,
+        vapi: Optional[EndpointBehaviour] = None,
+        twilio: Optional[EndpointBehaviour] = None,
+        app_url: Optional[str] = None,
+        call_seconds: float = 5.0,
+        call_outcomes: Optional[Dict[str, float]] = None,
+        twilio_auth_token: Optional[str] = None,
+        vapi_secret: Optional[str] = None,
+        seed: int = 0
+    ):
+        self.behaviour = {"vapi": vapi or EndpointBehaviour(), "twilio": twilio or EndpointBehaviour(latency=0.1)}
+        self.stats = {name: EndpointStats() for name in self.behaviour}
+        self._limits = {name: _RateLimit(b.rate_limit) for name, b in self.behaviour.items()}
+        self.app_url = app_url.rstrip("/") if app_url else None
+        self.call_seconds = call_seconds
+        self.call_outcomes = call_outcomes or DEFAULT_CALL_OUTCOMES
+        self.twilio_auth_token = twilio_auth_token
+        self.vapi_secret = vapi_secret
+        self.random = random.Random(seed)
+        self.callbacks_sent = 0
+        self.callback_failures = 0
+        self._session: Optional[ClientSession] = None
+        self._followups: set = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> web.AppRunner:
+        app = web.Application()
+        app.router.add_post("/call", self.create_call)
+        app.router.add_post("/2010-04-01/Accounts/{account_sid}/Messages.json", self.create_message)
+        app.router.add_get("/stats", self.get_stats)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        self._session = ClientSession(timeout=ClientTimeout(total=10))
+        return runner
+
+    async def stop(self, runner: web.AppRunner) -> None:
+        for task in list(self._followups):
+            task.cancel()
+        await asyncio.gather(*self._followups, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+        await runner.cleanup()
+
+    # Provider endpoints
+
+    async def _admit(self, provider: str) -> Optional[web.Response]:
+        """Count the request, apply latency, and return an error response if it should fail"""
+        behaviour, stats = self.behaviour[provider], self.stats[provider]
+        stats.requests += 1
+        stats.started.append(time.monotonic())
+        if not self._limits[provider].allow():
+            stats.rate_limited += 1
+            if provider == "twilio":
+                body = {"code": 20429, "message": "Too Many Requests", "more_info": "", "status": 429}
+            else:
+                body = {"statusCode": 429, "message": "Too Many Requests", "error": "Too Many Requests"}
+            return web.json_response(body, status=429)
+        stats.in_flight += 1
+        stats.peak_in_flight = max(stats.peak_in_flight, stats.in_flight)
+        try:
+            await asyncio.sleep(max(0.0, behaviour.latency + self.random.uniform(-behaviour.jitter, behaviour.jitter)))
+        finally:
+            stats.in_flight -= 1
+        if self.random.random() < behaviour.error_rate:
+            stats.errors += 1
+            if provider == "twilio":
+                body = {"code": 20500, "message": "Internal Server Error", "more_info": "", "status": 500}
+            else:
+                body = {"statusCode": 500, "message": "stand-in failure"}
+            return web.json_response(body, status=500)
+        stats.ok += 1
+        return None
+
+    async def create_call(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        failure = await self._admit("vapi")
+        if failure is not None:
+            return failure
+        call = {
+            "id": str(uuid.uuid4()),
+            "type": body.get("type", "outboundPhoneCall"),
+            "status": "queued",
+            "customer": body.get("customer", {}),
+            "createdAt": _now_iso(),
+        }
+        assistant = body.get("assistant") or {}
+        if assistant.get("metadata"):
+            # Echoed back in server messages, like Vapi's transient assistant
+            call["assistant"] = {"metadata": assistant["metadata"]}
+        server_url = assistant.get("serverUrl")
+        if server_url is None and self.app_url:
+            server_url = f"{self.app_url}/callbacks/vapi"
+        if server_url:
+            self._follow_up(self._play_call(server_url, call))
+        return web.json_response(call, status=201)
+
+    async def create_message(self, request: web.Request) -> web.Response:
+        form = dict(parse_qsl((await request.read()).decode()))
+        failure = await self._admit("twilio")
+        if failure is not None:
+            return failure
+        account_sid = request.match_info["account_sid"]
+        sid = "SM" + uuid.uuid4().hex
+        message = {
+            "sid": sid,
+            "account_sid": account_sid,
+            "to": form.get("To"),
+            "from": form.get("From"),
+            "body": form.get("Body"),
+            "status": "queued",
+            "num_segments": "1",
+            "direction": "outbound-api",
+            "error_code": None,
+            "error_message": None,
+            "date_created": _now_rfc2822(),
+            "uri": f"/2010-04-01/Accounts/{account_sid}/Messages/{sid}.json",
+        }
+        if form.get("StatusCallback"):
+            self._follow_up(self._play_message(form["StatusCallback"], message))
+        return web.json_response(message, status=201)
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            **{name: stats.as_dict() for name, stats in self.stats.items()},
+            "callbacks_sent": self.callbacks_sent,
+            "callback_failures": self.callback_failures,
+        })
+
+    # Callbacks to the app
+
+    def _follow_up(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._followups.add(task)
+        task.add_done_callback(self._followups.discard)
+
+    async def _play_call(self, server_url: str, call: Dict[str, Any]) -> None:
+        reason = self.random.choices(list(self.call_outcomes), weights=list(self.call_outcomes.values()))[0]
+        answered = reason not in ("customer-did-not-answer", "customer-busy")
+        await asyncio.sleep(self.call_seconds * 0.1)
+        await self._post_vapi(server_url, {"type": "status-update", "status": "ringing", "call": call})
+        if answered:
+            await asyncio.sleep(self.call_seconds * 0.2)
+            await self._post_vapi(server_url, {"type": "status-update", "status": "in-progress", "call": call})
+        await asyncio.sleep(self.call_seconds * (0.7 if answered else 0.3))
+        await self._post_vapi(server_url, {"type": "status-update", "status": "ended", "endedReason": reason, "call": call})
+        await self._post_vapi(server_url, {
+            "type": "end-of-call-report",
+            "endedReason": reason,
+            "call": call,
+            "durationSeconds": round(self.call_seconds * 0.9, 1) if answered else 0,
+            "cost": 0.05,
+            "summary": "Simulated call" if answered else "",
+        })
+
+    async def _post_vapi(self, server_url: str, message: Dict[str, Any]) -> None:
+        headers = {"X-Vapi-Secret": self.vapi_secret} if self.vapi_secret else {}
+        await self._post(server_url, json={"message": message}, headers=headers)
+
+    async def _play_message(self, callback_url: str, message: Dict[str, Any]) -> None:
+        await asyncio.sleep(0.2)
+        await self._post_twilio(callback_url, message, "sent")
+        await asyncio.sleep(0.5)
+        failed = self.random.random() < self.behaviour["twilio"].error_rate
+        await self._post_twilio(callback_url, message, "undelivered" if failed else "delivered", failed)
+
+    async def _post_twilio(self, callback_url: str, message: Dict[str, Any], status: str, failed: bool = False) -> None:
+        form = {
+            "MessageSid": message["sid"],
+            "SmsSid": message["sid"],
+            "AccountSid": message["account_sid"],
+            "MessageStatus": status,
+            "SmsStatus": status,
+            "To": message["to"] or "",
+            "From": message["from"] or "",
+        }
+        if failed:
+            form["ErrorCode"] = "30003"
+        headers = {}
+        if self.twilio_auth_token:
+            headers["X-Twilio-Signature"] = RequestValidator(self.twilio_auth_token).compute_signature(callback_url, form)
+        await self._post(callback_url, data=form, headers=headers)
+
+    async def _post(self, url: str, **kwargs) -> None:
+        try:
+            async with self._session.post(url, **kwargs) as response:
+                self.callbacks_sent += 1
+                if response.status >= 400:
+                    self.callback_failures += 1
+        except Exception:
+            self.callback_failures += 1
+
+
+class WebhookReplayer:
+    """Plays inbound Vapi call webhook sequences against the app"""
+
+    def __init__(
+        self,
+        app_url: str,
+        tool: str,
+        tool_arguments: Dict[str, Any],
+        customer_number: str,
+        vapi_secret: Optional[str] = None
+    ):
+        self.app_url = app_url.rstrip("/")
+        self.tool = tool
+        self.tool_arguments = tool_arguments
+        self.customer_number = customer_number
+        self.vapi_secret = vapi_secret
+        self.timings: Dict[str, List[float]] = defaultdict(list)
+        self.failures: Dict[str, int] = defaultdict(int)
+
+    async def run(self, calls: int, rate: float) -> float:
+        began = time.monotonic()
+        async with ClientSession(timeout=ClientTimeout(total=60)) as session:
+            tasks = []
+            for index in range(calls):
+                # Start sequences on a fixed schedule so a slow app can't slow the offered load
+                await asyncio.sleep(max(0.0, began + index / rate - time.monotonic()))
+                tasks.append(asyncio.create_task(self._play(session)))
+            await asyncio.gather(*tasks)
+        return time.monotonic() - began
+
+    async def _play(self, session: ClientSession) -> None:
+        call = {"id": str(uuid.uuid4()), "type": "inboundPhoneCall", "customer": {"number": self.customer_number}}
+        customer = {"number": self.customer_number}
+        callback = f"{self.app_url}/callbacks/vapi"
+        await self._send(session, callback, "status-update",
+                         {"type": "status-update", "status": "in-progress", "call": call, "customer": customer})
+        await self._send(session, f"{self.app_url}/1/process", "tool-calls", {
+            "type": "tool-calls",
+            "call": call,
+            "customer": customer,
+            "toolCallList": [{
+                "id": f"call_{uuid.uuid4().hex[:12]}",
+                "type": "function",
+                "function": {"name": self.tool, "arguments": json.dumps(self.tool_arguments)},
+            }],
+        })
+        await self._send(session, callback, "end-of-call-report", {
+            "type": "end-of-call-report", "endedReason": "customer-ended-call", "call": call,
+            "customer": customer, "durationSeconds": 42.0,
+        })
+
+    async def _send(self, session: ClientSession, url: str, kind: str, message: Dict[str, Any]) -> None:
+        headers = {"X-Vapi-Secret": self.vapi_secret} if self.vapi_secret else {}
+        started = time.monotonic()
+        try:
+            async with session.post(url, json={"message": message}, headers=headers) as response:
+                await response.read()
+                if response.status >= 400:
+                    self.failures[kind] += 1
+        except Exception:
+            self.failures[kind] += 1
+        self.timings[kind].append(time.monotonic() - started)
+
+    def report(self, elapsed: float, calls: int) -> None:
+        print(f"replayed {calls} calls in {elapsed:.2f}s ({calls / elapsed:.1f} calls/s)")
+        for kind, samples in self.timings.items():
+            ordered = sorted(samples)
+            p = lambda q: ordered[min(len(ordered) - 1, int(q / 100 * len(ordered)))] * 1000  # noqa: E731
+            print(f"{kind:20s} n={len(ordered):5d} p50={p(50):7.1f}ms p95={p(95):7.1f}ms "
+                  f"p99={p(99):7.1f}ms failures={self.failures[kind]}")
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime())
+
+
+def _now_rfc2822() -> str:
+    return time.strftime("%a, %d %b %Y %H:%M:%S +0000", time.gmtime())
+
+
+async def serve(args: argparse.Namespace) -> None:
+    stand_in = ProviderStandIn(
+        vapi=EndpointBehaviour(args.vapi_latency, args.jitter, args.vapi_error_rate, args.vapi_rate_limit),
+        twilio=EndpointBehaviour(args.twilio_latency, args.jitter, args.twilio_error_rate, args.twilio_rate_limit),
+        app_url=args.app_url,
+        call_seconds=args.call_seconds,
+        call_outcomes=json.loads(args.call_outcomes) if args.call_outcomes else None,
+        twilio_auth_token=os.getenv("TWILIO_AUTH_TOKEN"),
+        vapi_secret=os.getenv("VAPI_SERVER_SECRET"),
+        seed=args.seed
+    )
+    runner = await stand_in.start(args.host, args.port)
+    print(f"Vapi and Twilio stand-in listening on http://{args.host}:{args.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        print(json.dumps({name: stats.as_dict() for name, stats in stand_in.stats.items()}))
+        await stand_in.stop(runner)
+
+
+async def replay(args: argparse.Namespace) -> None:
+    replayer = WebhookReplayer(
+        args.app_url,
+        args.tool,
+        json.loads(args.tool_arguments),
+        args.customer_number,
+        os.getenv("VAPI_SERVER_SECRET")
+    )
+    elapsed = await replayer.run(args.calls, args.rate)
+    replayer.report(elapsed, args.calls)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser("serve", help="run the provider stand-in")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8100)
+    serve_parser.add_argument("--vapi-latency", type=float, default=0.3, help="seconds")
+    serve_parser.add_argument("--vapi-error-rate", type=float, default=0.0, help="share of requests answered 500")
+    serve_parser.add_argument("--vapi-rate-limit", type=float, default=0.0, help="requests per second; 0 is unlimited")
+    serve_parser.add_argument("--twilio-latency", type=float, default=0.1)
+    serve_parser.add_argument("--twilio-error-rate", type=float, default=0.0)
+    serve_parser.add_argument("--twilio-rate-limit", type=float, default=0.0)
+    serve_parser.add_argument("--jitter", type=float, default=0.05, help="latency +/- this many seconds")
+    serve_parser.add_argument("--app-url", help="app to send call callbacks to when a call has no serverUrl")
+    serve_parser.add_argument("--call-seconds", type=float, default=5.0, help="simulated call length")
+    serve_parser.add_argument("--call-outcomes", help='JSON weights by ended reason, e.g. {"voicemail": 1}')
+    serve_parser.add_argument("--seed", type=int, default=0)
+
+    replay_parser = commands.add_parser("replay", help="play inbound Vapi webhooks against the app")
+    replay_parser.add_argument("--app-url", default="http://127.0.0.1:8000")
+    replay_parser.add_argument("--rate", type=float, default=10, help="calls started per second")
+    replay_parser.add_argument("--calls", type=int, default=100)
+    replay_parser.add_argument("--tool", default="get_tasks", help="tool function named in the tool-calls message")
+    replay_parser.add_argument("--tool-arguments", default="{}", help="JSON arguments for the tool")
+    replay_parser.add_argument("--customer-number", default="+12045550100")
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args) if args.command == "serve" else replay(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
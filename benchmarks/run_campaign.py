@@ -0,0 +1,123 @@
+"""
+End-to-end check of the call campaign engine against a local Vapi stand-in.
+
+Starts the provider stand-in (provider_stand_in.py) on 127.0.0.1, answering
+Vapi's create-call request after --latency seconds and failing a share
+--error-rate of calls with a 500. It then runs a campaign through the real
+OutboundCaller and CallCampaignEngine pointed at that server, pausing it
+part-way through.
+
+Reports:
+    results             recipients by final status
+    peak concurrency    most create-call requests open at once
+    peak pacing         most calls the engine started within any pacing
+                        window (arrival times at the stand-in also vary with
+                        connection setup, so they are not used here)
+    pause               calls started while the campaign was paused
+    elapsed             wall time for the whole campaign
+
+Usage:
+    python benchmarks/run_campaign.py --recipients 200 --concurrency 5 --calls-per-window 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from base_models import CallCampaignCreate, CampaignRecipient  # noqa: E402
+from call_campaigns import CallCampaignEngine, CampaignStatus  # noqa: E402
+from outbound_caller import OutboundCaller  # noqa: E402
+from provider_stand_in import EndpointBehaviour, ProviderStandIn  # noqa: E402
+
+
+def peak_per_window(started: List[float], window: float) -> int:
+    peak, left = 0, 0
+    for right, at in enumerate(started):
+        while at - started[left] >= window:
+            left += 1
+        peak = max(peak, right - left + 1)
+    return peak
+
+
+async def run(args: argparse.Namespace) -> None:
+    stand_in = ProviderStandIn(vapi=EndpointBehaviour(args.latency, error_rate=args.error_rate))
+    runner = await stand_in.start()
+    port = runner.addresses[0][1]
+    vapi = stand_in.stats["vapi"]
+
+    caller = OutboundCaller()
+    caller.api_url = f"http://127.0.0.1:{port}/call"
+    await caller.start()
+    dialed: List[float] = []
+    place_call = caller.place_call
+
+    async def timed_place_call(*call_args, **call_kwargs):
+        dialed.append(time.monotonic())
+        return await place_call(*call_args, **call_kwargs)
+
+    caller.place_call = timed_place_call
+    engine = CallCampaignEngine(caller)
+
+    began = time.monotonic()
+    state = engine.create(CallCampaignCreate(
+        name="benchmark",
+        template_id="appointment_confirmation",
+        recipients=[
+            CampaignRecipient(
+                to_number=f"+1204555{i:04d}",
+                variables={"name": f"Patient {i}", "office_name": "City Dental", "appointment_time": "Monday at 9 AM"}
+            )
+            for i in range(args.recipients)
+        ],
+        max_concurrency=args.concurrency,
+        calls_per_window=args.calls_per_window,
+        pacing_window_seconds=args.window
+    ))
+    campaign_id = state.campaign_id
+
+    await asyncio.sleep(args.pause_after)
+    engine.pause(campaign_id)
+    # Let calls already being placed finish before counting new ones
+    await asyncio.sleep(args.latency + 0.05)
+    paused_at = len(vapi.started)
+    await asyncio.sleep(args.pause_for)
+    during_pause = len(vapi.started) - paused_at
+    engine.resume(campaign_id)
+
+    while engine.get(campaign_id, include_results=False).status == CampaignStatus.RUNNING:
+        await asyncio.sleep(0.05)
+    elapsed = time.monotonic() - began
+
+    final = engine.get(campaign_id, include_results=False)
+    print(f"recipients={args.recipients} concurrency={args.concurrency} "
+          f"pacing={args.calls_per_window}/{args.window}s latency={args.latency}s")
+    print(f"results            {final.counts}")
+    print(f"peak concurrency   {vapi.peak_in_flight} (limit {args.concurrency})")
+    print(f"peak pacing        {peak_per_window(dialed, args.window)} calls per {args.window}s "
+          f"(limit {args.calls_per_window})")
+    print(f"pause              {during_pause} calls started during a {args.pause_for}s pause")
+    print(f"elapsed            {elapsed:.2f}s")
+
+    await caller.aclose()
+    await stand_in.stop(runner)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--calls-per-window", type=int, default=10)
+    parser.add_argument("--window", type=float, default=1.0, help="pacing window in seconds")
+    parser.add_argument("--latency", type=float, default=0.2, help="stand-in response time in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.04, help="share of calls the stand-in fails")
+    parser.add_argument("--pause-after", type=float, default=2.0)
+    parser.add_argument("--pause-for", type=float, default=1.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
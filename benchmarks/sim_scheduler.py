@@ -0,0 +1,228 @@
+"""
+Virtual-clock simulation of SupabaseJobScheduler.
+
+Schedules reminder jobs shaped like the ones main.py creates into an
+in-memory SQLite job store, restarts the scheduler over that store, then
+fires every job against fake send_sms / make_simple_call sinks. The timer
+engine runs on a virtual clock that jumps straight to the next due job
+whenever the scheduler is idle, while time spent doing work still passes, so
+firing lag reflects real scheduler cost and a day of reminders plays out in
+seconds. No network calls are made.
+
+Reports:
+    scheduling throughput   schedule_many, jobs/s
+    restore time            scheduler start-up over the populated store
+    memory per job          Python heap held per armed job after restore
+    firing lag              p50/p95/p99/max of (sink time - run_date)
+    firing throughput       jobs fired per second of real time
+
+Job times come from a seeded RNG, so runs are repeatable.
+
+Usage:
+    python benchmarks/sim_scheduler.py --jobs 100000 --horizon-hours 24 --peak-share 0.3
+"""
+import argparse
+import asyncio
+import gc
+import os
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import SQLiteJobStore  # noqa: E402
+from scheduler import SupabaseJobScheduler, JobSchedulerConfig, JobSpec, JobType  # noqa: E402
+
+
+class VirtualClock:
+    """Wall clock that can skip idle time: real elapsed time plus skipped gaps"""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.skipped = 0.0
+        self._origin = time.perf_counter()
+
+    def __call__(self) -> float:
+        return self.start + self.skipped + (time.perf_counter() - self._origin)
+
+    def advance_to(self, when: float) -> None:
+        now = self()
+        if when > now:
+            self.skipped += when - now
+
+
+class Sinks:
+    """Fake providers that record when each job reached them"""
+
+    def __init__(self, clock: VirtualClock, expected: Dict[str, float]):
+        self.clock = clock
+        self.expected = expected
+        self.lags: List[float] = []
+        self.sms = 0
+        self.calls = 0
+
+    def _record(self, job_id: str) -> None:
+        self.lags.append(self.clock() - self.expected[job_id])
+
+    def send_sms(self, to_number: str, message: str, job_id: str = None, **kwargs) -> dict:
+        self._record(job_id)
+        self.sms += 1
+        return {'sid': f"SM{job_id}", 'status': 'queued', 'error_message': None}
+
+    async def make_simple_call(self, to_number: str, message: str, job_id: str = None, **kwargs) -> str:
+        self._record(job_id)
+        self.calls += 1
+        return f"Call initiated - ID: {job_id}"
+
+
+def build_specs(count: int, start: datetime, horizon_hours: float, peak_share: float, seed: int,
+                sinks: Sinks) -> List[JobSpec]:
+    """Reminders spread over the horizon, with peak_share of them on the hour"""
+    rng = random.Random(seed)
+    horizon = horizon_hours * 3600
+    specs = []
+    for i in range(count):
+        if rng.random() < peak_share:
+            # Top-of-hour spike, e.g. "remind me at 9:00"
+            offset = 3600 * rng.randrange(1, max(int(horizon_hours), 1) + 1)
+        else:
+            offset = rng.uniform(60, horizon)
+        run_date = start + timedelta(seconds=offset)
+        kind = "call" if i % 4 == 0 else "sms"
+        job_id = f"task_reminder_{kind}_{i}"
+        sinks.expected[job_id] = run_date.timestamp()
+        specs.append(JobSpec(
+            job_id=job_id,
+            func=sinks.make_simple_call if kind == "call" else sinks.send_sms,
+            run_date=run_date,
+            job_type=JobType.CUSTOM,
+            metadata={
+                "to_number": f"+1204555{i % 10000:04d}",
+                "message": f"Reminder: Your task 'Task {i}' is due",
+                "metadata": {"task_id": str(i), "reminder_type": kind.upper()}
+            }
+        ))
+    return specs
+
+
+def new_scheduler(store: SQLiteJobStore, sinks: Sinks, args: argparse.Namespace) -> SupabaseJobScheduler:
+    scheduler = SupabaseJobScheduler(
+        config=JobSchedulerConfig(
+            engine="timer",
+            timer_fire_batch=args.fire_batch,
+            arm_window_seconds=args.arm_window,
+            worker_id="sim"
+        ),
+        store=store
+    )
+    scheduler.register_handler("sms", sinks.send_sms)
+    scheduler.register_handler("call", sinks.make_simple_call)
+    scheduler.start()
+    return scheduler
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))]
+
+
+async def run_until_drained(scheduler: SupabaseJobScheduler, clock: VirtualClock, fire_batch: int) -> None:
+    """Fire due jobs; when idle, jump the clock to the next job or arm-window load"""
+    engine = scheduler.timer_engine
+    load_every = max(scheduler.config.arm_window_seconds // 2, 1)
+    next_load = clock()
+    while True:
+        if clock() >= next_load:
+            # What the scheduler's window loader does on its interval
+            scheduler._arm_due_jobs(now=datetime.fromtimestamp(clock(), pytz.UTC))
+            next_load = clock() + load_every
+        due = engine.pop_due(limit=fire_batch)
+        if due:
+            await scheduler._fire_due_jobs(due)
+            await asyncio.sleep(0)
+            continue
+        if scheduler._running_tasks:
+            await asyncio.gather(*list(scheduler._running_tasks), return_exceptions=True)
+            continue
+        next_at = engine.next_run_at()
+        if next_at is None and not scheduler.store.get_jobs_due_before(
+                datetime.max.replace(tzinfo=pytz.UTC), columns='job_id'):
+            return
+        clock.advance_to(next_load if next_at is None else min(next_at, next_load))
+
+
+async def simulate(args: argparse.Namespace) -> None:
+    start = datetime.now(pytz.UTC)
+    clock = VirtualClock(start.timestamp())
+    sinks = Sinks(clock, {})
+    store = SQLiteJobStore(":memory:")
+    specs = build_specs(args.jobs, start, args.horizon_hours, args.peak_share, args.seed, sinks)
+
+    # Scheduling throughput
+    scheduler = new_scheduler(store, sinks, args)
+    began = time.perf_counter()
+    scheduled = 0
+    for i in range(0, len(specs), args.chunk):
+        scheduled += sum(result.scheduled for result in scheduler.schedule_many(specs[i:i + args.chunk]))
+    schedule_seconds = time.perf_counter() - began
+    scheduler.shutdown(wait=False)
+    del specs
+    gc.collect()
+
+    # Restore after a restart, timed without tracing
+    began = time.perf_counter()
+    timed = new_scheduler(store, sinks, args)
+    restore_seconds = time.perf_counter() - began
+    timed.shutdown(wait=False)
+    del timed
+    gc.collect()
+
+    # Same restore under tracemalloc for memory held per pending job
+    tracemalloc.start()
+    scheduler = new_scheduler(store, sinks, args)
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    pending = len(scheduler.timer_engine)
+
+    # Drive the engine by hand on the virtual clock
+    scheduler.timer_engine.stop()
+    scheduler.timer_engine.clock = clock
+    began = time.perf_counter()
+    await run_until_drained(scheduler, clock, args.fire_batch)
+    fire_seconds = time.perf_counter() - began
+    scheduler.shutdown(wait=False)
+
+    lags = sorted(sinks.lags)
+    print(f"jobs={args.jobs:,} horizon={args.horizon_hours}h peak_share={args.peak_share} seed={args.seed}")
+    print(f"scheduling   {scheduled:,} jobs in {schedule_seconds:.2f}s  ({scheduled / schedule_seconds:,.0f} jobs/s)")
+    print(f"restore      {pending:,} of {scheduled:,} jobs armed (next {args.arm_window}s) in {restore_seconds:.2f}s")
+    print(f"memory       {held / max(pending, 1):,.0f} B per armed job")
+    print(f"firing       {len(lags):,} jobs ({sinks.sms:,} sms, {sinks.calls:,} calls) "
+          f"in {fire_seconds:.2f}s  ({len(lags) / fire_seconds:,.0f} jobs/s)")
+    if lags:
+        print(f"firing lag   p50={percentile(lags, 50) * 1000:.1f}ms  p95={percentile(lags, 95) * 1000:.1f}ms  "
+              f"p99={percentile(lags, 99) * 1000:.1f}ms  max={lags[-1] * 1000:.1f}ms")
+    missing = args.jobs - len(lags)
+    if missing:
+        print(f"missing      {missing:,} jobs never reached a sink")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=100_000)
+    parser.add_argument("--horizon-hours", type=float, default=24)
+    parser.add_argument("--peak-share", type=float, default=0.3, help="share of jobs due exactly on the hour")
+    parser.add_argument("--chunk", type=int, default=1000, help="specs per schedule_many call")
+    parser.add_argument("--fire-batch", type=int, default=500, help="timer_fire_batch")
+    parser.add_argument("--arm-window", type=int, default=3600, help="arm_window_seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    asyncio.run(simulate(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
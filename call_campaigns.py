@@ -0,0 +1,272 @@
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+from pydantic import BaseModel
+from base_models import CallCampaignCreate, CallTemplate
+from outbound_caller import (
+    OutboundCaller,
+    caller,
+    APPOINTMENT_SYSTEM_PROMPT,
+    APPOINTMENT_END_CALL_MESSAGE
+)
+from metrics import registry
+from delivery_tracker import tracker
+import asyncio
+import logging
+import pytz
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+CAMPAIGN_CALLS = registry.counter("campaign_calls_total", "Campaign call attempts by outcome")
+CAMPAIGN_IN_FLIGHT = registry.gauge("campaign_calls_in_flight", "Campaign calls being placed")
+
+# Templates campaigns can refer to by id
+CALL_TEMPLATES: Dict[str, CallTemplate] = {
+    "appointment_confirmation": CallTemplate(
+        name="Appointment Confirmation Call",
+        first_message=(
+            "Hello {name}! This is Sarah calling from {office_name} to confirm your appointment "
+            "on {appointment_time}. Is this a convenient time to talk?"
+        ),
+        system_prompt=APPOINTMENT_SYSTEM_PROMPT,
+        voicemail_message=(
+            "Hi {name}, this is Sarah from {office_name} calling to confirm your appointment on "
+            "{appointment_time}. Please call us back at your convenience. Have a great day!"
+        ),
+        end_call_message=APPOINTMENT_END_CALL_MESSAGE,
+        assistant_name="Appointment Scheduler"
+    )
+}
+
+
+class CampaignStatus(Enum):
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    CANCELLED = "cancelled"
+
+
+class RecipientStatus(Enum):
+    PENDING = "pending"
+    DIALING = "dialing"
+    INITIATED = "initiated"  # Vapi accepted the call
+    FAILED = "failed"
+    SKIPPED = "skipped"  # Campaign cancelled before this recipient was dialed
+
+
+class RecipientResult(BaseModel):
+    to_number: str
+    status: RecipientStatus = RecipientStatus.PENDING
+    call_id: Optional[str] = None
+    error: Optional[str] = None
+    attempted_at: Optional[datetime] = None
+
+
+class CampaignState(BaseModel):
+    campaign_id: str
+    name: str
+    status: CampaignStatus
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+    counts: Dict[str, int]
+    results: Optional[List[RecipientResult]] = None
+
+
+class _Campaign:
+    """One campaign's recipients, results and dialing controls"""
+
+    def __init__(self, campaign_id: str, request: CallCampaignCreate, template: CallTemplate):
+        self.campaign_id = campaign_id
+        self.request = request
+        self.template = template
+        self.status = CampaignStatus.RUNNING
+        self.created_at = datetime.now(pytz.UTC)
+        self.finished_at: Optional[datetime] = None
+        self.results = [RecipientResult(to_number=recipient.to_number) for recipient in request.recipients]
+        self.resumed = asyncio.Event()
+        self.resumed.set()
+        self.task: Optional[asyncio.Task] = None
+
+    def state(self, include_results: bool = True) -> CampaignState:
+        counts = {status.value: 0 for status in RecipientStatus}
+        for result in self.results:
+            counts[result.status.value] += 1
+        return CampaignState(
+            campaign_id=self.campaign_id,
+            name=self.request.name,
+            status=self.status,
+            created_at=self.created_at,
+            finished_at=self.finished_at,
+            counts=counts,
+            results=list(self.results) if include_results else None
+        )
+
+
+class CallCampaignEngine:
+    """
+    Places outbound calls to a list of recipients from one call template.
+
+    Each campaign dials in recipient order with at most max_concurrency calls
+    being placed at once and at most calls_per_window calls started per
+    pacing window. Pausing stops new dials (calls already being placed
+    finish); resuming carries on from the next recipient. Results are kept
+    per recipient in memory for the life of the process; a call counts as
+    initiated once Vapi accepts it, and its call id is kept for matching
+    later status updates.
+    """
+
+    def __init__(self, outbound_caller: OutboundCaller, clock: Callable[[], float] = time.monotonic):
+        self.caller = outbound_caller
+        self.clock = clock
+        self._campaigns: Dict[str, _Campaign] = {}
+
+    def create(self, request: CallCampaignCreate) -> CampaignState:
+        """Register a campaign and start dialing; call from the event loop"""
+        template = request.template or CALL_TEMPLATES.get(request.template_id or "")
+        if template is None:
+            raise ValueError(f"Unknown call template: {request.template_id}")
+        campaign = _Campaign(uuid.uuid4().hex, request, template)
+        self._campaigns[campaign.campaign_id] = campaign
+        campaign.task = asyncio.get_running_loop().create_task(self._run(campaign))
+        logger.info(f"Started campaign {campaign.campaign_id} ({request.name}) to {len(request.recipients)} recipients")
+        return campaign.state(include_results=False)
+
+    def get(self, campaign_id: str, include_results: bool = True) -> Optional[CampaignState]:
+        campaign = self._campaigns.get(campaign_id)
+        return campaign.state(include_results) if campaign else None
+
+    def list(self) -> List[CampaignState]:
+        return [campaign.state(include_results=False) for campaign in self._campaigns.values()]
+
+    def pause(self, campaign_id: str) -> Optional[CampaignState]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+        if campaign.status == CampaignStatus.RUNNING:
+            campaign.status = CampaignStatus.PAUSED
+            campaign.resumed.clear()
+            logger.info(f"Paused campaign {campaign_id}")
+        return campaign.state(include_results=False)
+
+    def resume(self, campaign_id: str) -> Optional[CampaignState]:
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+        if campaign.status == CampaignStatus.PAUSED:
+            campaign.status = CampaignStatus.RUNNING
+            campaign.resumed.set()
+            logger.info(f"Resumed campaign {campaign_id}")
+        return campaign.state(include_results=False)
+
+    def cancel(self, campaign_id: str) -> Optional[CampaignState]:
+        """Stop dialing; recipients not yet dialed are marked skipped"""
+        campaign = self._campaigns.get(campaign_id)
+        if campaign is None:
+            return None
+        if campaign.status in (CampaignStatus.RUNNING, CampaignStatus.PAUSED):
+            campaign.status = CampaignStatus.CANCELLED
+            # Wake the dialer so it sees the cancellation
+            campaign.resumed.set()
+            logger.info(f"Cancelled campaign {campaign_id}")
+        return campaign.state(include_results=False)
+
+    async def stop(self) -> None:
+        """Cancel every campaign and wait for calls being placed; call at shutdown"""
+        tasks = []
+        for campaign_id, campaign in self._campaigns.items():
+            self.cancel(campaign_id)
+            if campaign.task is not None:
+                tasks.append(campaign.task)
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _run(self, campaign: _Campaign) -> None:
+        request = campaign.request
+        slots = asyncio.Semaphore(request.max_concurrency)
+        # Start times of the most recent calls, for a sliding pacing window.
+        # Each is a one-item list the dial task moves to when it really
+        # starts, since tasks created together can start some way apart.
+        recent = deque(maxlen=request.calls_per_window)
+        dials: set = set()
+        try:
+            for index, recipient in enumerate(request.recipients):
+                await campaign.resumed.wait()
+                while len(recent) == recent.maxlen:
+                    wait = recent[0][0] + request.pacing_window_seconds - self.clock()
+                    if wait <= 0:
+                        break
+                    await asyncio.sleep(wait)
+                await slots.acquire()
+                # Pausing can happen while waiting for a slot or token
+                await campaign.resumed.wait()
+                if campaign.status == CampaignStatus.CANCELLED:
+                    slots.release()
+                    break
+                started = [self.clock()]
+                recent.append(started)
+                task = asyncio.get_running_loop().create_task(
+                    self._dial(campaign, campaign.results[index], recipient.variables, started)
+                )
+                dials.add(task)
+                task.add_done_callback(dials.discard)
+                task.add_done_callback(lambda _: slots.release())
+            if dials:
+                await asyncio.gather(*dials, return_exceptions=True)
+        finally:
+            for result in campaign.results:
+                if result.status == RecipientStatus.PENDING:
+                    result.status = RecipientStatus.SKIPPED
+            if campaign.status != CampaignStatus.CANCELLED:
+                campaign.status = CampaignStatus.COMPLETED
+            campaign.finished_at = datetime.now(pytz.UTC)
+            state = campaign.state(include_results=False)
+            logger.info(f"Campaign {campaign.campaign_id} {campaign.status.value}: {state.counts}")
+
+    async def _dial(
+        self,
+        campaign: _Campaign,
+        result: RecipientResult,
+        variables: Dict[str, str],
+        started: List[float]
+    ) -> None:
+        started[0] = self.clock()
+        result.status = RecipientStatus.DIALING
+        result.attempted_at = datetime.now(pytz.UTC)
+        CAMPAIGN_IN_FLIGHT.inc()
+        try:
+            call = await self.caller.place_call(result.to_number, **render_template(campaign.template, variables))
+            result.call_id = call.get('id')
+            tracker.track(result.call_id, "vapi", "call", result.to_number, campaign_id=campaign.campaign_id)
+            result.status = RecipientStatus.INITIATED
+            CAMPAIGN_CALLS.inc(outcome="initiated")
+        except Exception as e:
+            result.status = RecipientStatus.FAILED
+            result.error = str(e)
+            CAMPAIGN_CALLS.inc(outcome="failed")
+            logger.warning(f"Campaign {campaign.campaign_id} call to {result.to_number} failed: {e}")
+        finally:
+            CAMPAIGN_IN_FLIGHT.dec()
+
+
+def render_template(template: CallTemplate, variables: Dict[str, str]) -> Dict[str, Any]:
+    """place_call arguments for one recipient"""
+    try:
+        rendered = {
+            "name": template.name,
+            "first_message": template.first_message.format(**variables),
+            "system_prompt": template.system_prompt.format(**variables),
+            "assistant_name": template.assistant_name
+        }
+        if template.voicemail_message:
+            rendered["voicemail_message"] = template.voicemail_message.format(**variables)
+        if template.end_call_message:
+            rendered["end_call_message"] = template.end_call_message.format(**variables)
+    except KeyError as e:
+        raise ValueError(f"Missing template variable: {e.args[0]}")
+    return rendered
+
+
+campaigns = CallCampaignEngine(caller)
@@ -0,0 +1,225 @@
+from enum import Enum
+from typing import Awaitable, Callable, Optional, TypeVar
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from metrics import registry
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+BREAKER_STATE = registry.gauge(
+    "circuit_breaker_state", "Provider circuit state by endpoint: 0 closed, 1 half-open, 2 open"
+)
+BREAKER_TRANSITIONS = registry.counter("circuit_breaker_transitions_total", "Circuit state changes by endpoint and new state")
+BREAKER_REJECTED = registry.counter("circuit_breaker_rejected_total", "Requests failed fast while a circuit was open")
+PROVIDER_RETRIES = registry.counter("provider_retries_total", "Provider requests retried after a transient failure")
+
+
+class BreakerState(Enum):
+    CLOSED = "closed"  # Requests go through
+    HALF_OPEN = "half_open"  # Letting a probe through to see if the provider is back
+    OPEN = "open"  # Failing fast
+
+
+STATE_VALUES = {BreakerState.CLOSED: 0, BreakerState.HALF_OPEN: 1, BreakerState.OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """A request was refused because its provider's circuit is open"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(f"{endpoint} circuit open; not retrying for {retry_after:.0f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class BreakerConfig(BaseModel):
+    """When a circuit opens and how long it stays open"""
+    failure_threshold: int = int(os.getenv("PROVIDER_BREAKER_FAILURES", "5"))  # Consecutive failures
+    reset_timeout_seconds: float = float(os.getenv("PROVIDER_BREAKER_RESET_SECONDS", "30"))
+    half_open_max_calls: int = 1
+
+
+class RetryBackoff(BaseModel):
+    """Capped exponential backoff with full jitter, for one provider request"""
+    max_attempts: int = int(os.getenv("PROVIDER_RETRY_ATTEMPTS", "3"))
+    base_delay_seconds: float = 0.2
+    max_delay_seconds: float = 2.0
+    multiplier: float = 2
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after failed attempt number attempt (from 1)"""
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * self.multiplier ** (attempt - 1))
+        return random.uniform(0, ceiling)
+
+
+def _never(error: Exception) -> bool:
+    return False
+
+
+class CircuitBreaker:
+    """
+    Fails requests to one provider endpoint fast while it is unhealthy.
+
+    is_failure decides which errors count against the provider (timeouts,
+    connection errors, 5xx); anything else, including 4xx and 429, means the
+    provider answered and counts as a success. After failure_threshold
+    failures in a row the circuit opens and requests raise CircuitOpenError
+    without touching the network. After reset_timeout_seconds one probe is
+    let through: success closes the circuit, failure opens it again.
+
+    call and call_blocking also retry with backoff. Which errors are retried
+    is up to the caller through retry_if: the failure predicate itself for
+    idempotent requests, and for creates (a call, a message) only errors
+    where the request never reached the provider, so nothing is sent twice.
+    State is shared between threads, so the sync and async clients for an
+    endpoint can use one breaker.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        is_failure: Callable[[Exception], bool],
+        config: Optional[BreakerConfig] = None,
+        backoff: Optional[RetryBackoff] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.endpoint = endpoint
+        self.is_failure = is_failure
+        self.config = config or BreakerConfig()
+        self.backoff = backoff or RetryBackoff()
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = BreakerState.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        BREAKER_STATE.set(0, endpoint=endpoint)
+
+    @property
+    def state(self) -> BreakerState:
+        with self._lock:
+            self._refresh()
+            return self._state
+
+    def before_call(self) -> None:
+        """Admit a request or raise CircuitOpenError"""
+        with self._lock:
+            self._refresh()
+            if self._state == BreakerState.CLOSED:
+                return
+            if self._state == BreakerState.HALF_OPEN and self._probes < self.config.half_open_max_calls:
+                self._probes += 1
+                return
+            retry_after = max(0.0, self._opened_at + self.config.reset_timeout_seconds - self.clock())
+        BREAKER_REJECTED.inc(endpoint=self.endpoint)
+        raise CircuitOpenError(self.endpoint, retry_after)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            if self._state != BreakerState.CLOSED:
+                self._transition(BreakerState.CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == BreakerState.HALF_OPEN or (
+                self._state == BreakerState.CLOSED and self._failures >= self.config.failure_threshold
+            ):
+                self._opened_at = self.clock()
+                self._transition(BreakerState.OPEN)
+
+    def record_abandoned(self) -> None:
+        """A request was cancelled before its outcome was known; free its probe slot"""
+        with self._lock:
+            if self._state == BreakerState.HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def record(self, error: Optional[Exception]) -> None:
+        if error is not None and self.is_failure(error):
+            self.record_failure()
+        else:
+            self.record_success()
+
+    async def call(
+        self,
+        request: Callable[[], Awaitable[T]],
+        retry_if: Callable[[Exception], bool] = _never
+    ) -> T:
+        """Await request() through the breaker, retrying errors retry_if accepts"""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_call()
+            try:
+                result = await request()
+            except Exception as e:
+                self.record(e)
+                if not self._should_retry(e, attempt, retry_if):
+                    raise
+            except BaseException:
+                self.record_abandoned()
+                raise
+            else:
+                self.record_success()
+                return result
+            await asyncio.sleep(self.backoff.delay(attempt))
+
+    def call_blocking(
+        self,
+        request: Callable[[], T],
+        retry_if: Callable[[Exception], bool] = _never
+    ) -> T:
+        """call() for synchronous clients"""
+        attempt = 0
+        while True:
+            attempt += 1
+            self.before_call()
+            try:
+                result = request()
+            except Exception as e:
+                self.record(e)
+                if not self._should_retry(e, attempt, retry_if):
+                    raise
+            except BaseException:
+                self.record_abandoned()
+                raise
+            else:
+                self.record_success()
+                return result
+            time.sleep(self.backoff.delay(attempt))
+
+    def _should_retry(self, error: Exception, attempt: int, retry_if: Callable[[Exception], bool]) -> bool:
+        if attempt >= self.backoff.max_attempts or not retry_if(error):
+            return False
+        PROVIDER_RETRIES.inc(endpoint=self.endpoint)
+        logger.warning(f"{self.endpoint} attempt {attempt} failed; retrying: {error!r}")
+        return True
+
+    def _refresh(self) -> None:
+        """Move an open circuit to half-open once its reset timeout has passed"""
+        if self._state == BreakerState.OPEN and self.clock() - self._opened_at >= self.config.reset_timeout_seconds:
+            self._transition(BreakerState.HALF_OPEN)
+
+    def _transition(self, state: BreakerState) -> None:
+        # Called with the lock held
+        if state == BreakerState.OPEN:
+            logger.error(f"{self.endpoint} circuit opened after {self._failures} failure(s); "
+                         f"failing fast for {self.config.reset_timeout_seconds:.0f}s")
+        elif state == BreakerState.CLOSED:
+            logger.info(f"{self.endpoint} circuit closed")
+        self._state = state
+        self._probes = 0
+        BREAKER_STATE.set(STATE_VALUES[state], endpoint=self.endpoint)
+        BREAKER_TRANSITIONS.inc(endpoint=self.endpoint, state=state.value)
@@ -0,0 +1,324 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from metrics import registry
+import asyncio
+import logging
+import os
+import re
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_EVENTS = registry.counter("delivery_events_total", "Provider status callbacks received, by provider and status")
+DELIVERY_PENDING = registry.gauge("delivery_pending_rows", "Delivery rows buffered for the next write")
+DELIVERY_BATCH = registry.histogram(
+    "delivery_batch_rows", "Rows per delivery write", buckets=(1, 10, 50, 100, 250, 500, 1000)
+)
+DELIVERY_WRITE_FAILURES = registry.counter("delivery_write_failures_total", "Delivery batches that failed to write")
+
+# Status -> (rank, final, failed). Callbacks can arrive out of order; a lower
+# rank never replaces a higher one.
+TWILIO_SMS_STATUSES = {
+    "accepted": (1, False, False),
+    "scheduled": (1, False, False),
+    "queued": (1, False, False),
+    "sending": (2, False, False),
+    "sent": (3, False, False),
+    "delivered": (4, True, False),
+    "undelivered": (4, True, True),
+    "failed": (4, True, True),
+    "canceled": (4, True, True),
+    "read": (5, True, False),
+}
+VAPI_CALL_STATUSES = {
+    "queued": (1, False, False),
+    "ringing": (2, False, False),
+    "in-progress": (3, False, False),
+    "forwarding": (3, False, False),
+    "ended": (4, True, False),
+}
+# Vapi ended reasons that mean nobody was reached
+VAPI_UNREACHED_REASONS = ("customer-did-not-answer", "customer-busy", "twilio-failed-to-connect-call")
+
+# Columns merged from tracking calls; status columns come from callbacks
+LINK_FIELDS = ("provider", "channel", "to_number", "reminder_id", "campaign_id")
+STATUS_FIELDS = ("status", "status_rank", "final", "failed", "error_code", "error_message")
+
+
+class DeliveryUpdate(BaseModel):
+    """One status callback from Twilio or Vapi"""
+    provider: str
+    external_id: str  # Twilio message SID or Vapi call id
+    status: str
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+    details: Dict[str, Any] = {}
+    send_key: Optional[str] = None  # Outbox send key echoed back with the callback
+
+    def ranking(self) -> tuple:
+        statuses = TWILIO_SMS_STATUSES if self.provider == "twilio" else VAPI_CALL_STATUSES
+        rank, final, failed = statuses.get(self.status, (0, False, False))
+        if self.provider == "vapi" and final:
+            reason = self.details.get("ended_reason") or ""
+            failed = reason in VAPI_UNREACHED_REASONS or "error" in reason or "failed" in reason
+        return rank, final, failed
+
+
+def twilio_sms_update(form: Dict[str, str]) -> Optional[DeliveryUpdate]:
+    """DeliveryUpdate from a Twilio message status callback's form fields"""
+    sid = form.get("MessageSid") or form.get("SmsSid")
+    status = form.get("MessageStatus") or form.get("SmsStatus")
+    if not sid or not status:
+        return None
+    return DeliveryUpdate(
+        provider="twilio",
+        external_id=sid,
+        status=status,
+        error_code=form.get("ErrorCode") or None,
+        error_message=form.get("ErrorMessage") or None
+    )
+
+
+def vapi_update(body: Dict[str, Any]) -> Optional[DeliveryUpdate]:
+    """DeliveryUpdate from a Vapi server message (status-update or end-of-call-report)"""
+    message = body.get("message") or {}
+    call = message.get("call") or {}
+    call_id = call.get("id")
+    message_type = message.get("type")
+    if not call_id or message_type not in ("status-update", "end-of-call-report"):
+        return None
+    details = {"ended_reason": message.get("endedReason")}
+    if message_type == "end-of-call-report":
+        status = "ended"
+        for key, column in (("durationSeconds", "duration_seconds"), ("cost", "cost"), ("summary", "summary")):
+            if message.get(key) is not None:
+                details[column] = message[key]
+    else:
+        status = message.get("status")
+        if not status:
+            return None
+    details = {key: value for key, value in details.items() if value is not None}
+    metadata = (message.get("assistant") or {}).get("metadata") \
+        or (call.get("assistant") or {}).get("metadata") \
+        or call.get("metadata") or {}
+    update = DeliveryUpdate(provider="vapi", external_id=call_id, status=status, details=details,
+                            send_key=metadata.get("send_key"))
+    if update.ranking()[2]:
+        update.error_message = details["ended_reason"]
+    return update
+
+
+def delivery_id(result: Any) -> Optional[str]:
+    """Provider id from a send result: SmsResult, Vapi call dict or make_simple_call text"""
+    if result is None:
+        return None
+    sid = getattr(result, "sid", None)
+    if sid:
+        return sid
+    if isinstance(result, dict):
+        return result.get("id") or result.get("sid")
+    if isinstance(result, str):
+        match = re.search(r"ID: (\S+)", result)
+        if match and match.group(1) != "unknown":
+            return match.group(1)
+    return None
+
+
+class DeliveryTracker:
+    """
+    Links provider message SIDs and call ids to the jobs, reminder or
+    campaign that sent them, and records the delivery status Twilio and Vapi
+    report back.
+
+    Links and status updates are merged per id in memory and written in
+    batches: a batch goes out when batch_size ids are pending or every
+    flush_seconds, as one write through writer (by default the
+    record_outbound_deliveries function, which also settles linked
+    reminders). A batch that fails to write is merged back and retried with
+    the next one.
+    """
+
+    def __init__(
+        self,
+        writer: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+        batch_size: int = 500,
+        flush_seconds: float = 1.0
+    ):
+        self.writer = writer or self._write_supabase
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._client: Optional[Client] = None
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[str, List[asyncio.Future]] = {}
+
+    def track(
+        self,
+        external_id: Optional[str],
+        provider: str,
+        channel: Optional[str] = None,
+        to_number: Optional[str] = None,
+        job_ids: Iterable[str] = (),
+        reminder_id: Optional[str] = None,
+        campaign_id: Optional[str] = None
+    ) -> None:
+        """Remember what sent a message or call; call from the event loop"""
+        if not external_id:
+            return
+        row = self._row(external_id)
+        link = {"provider": provider, "channel": channel, "to_number": to_number,
+                "reminder_id": str(reminder_id) if reminder_id else None, "campaign_id": campaign_id}
+        for field in LINK_FIELDS:
+            if link[field] is not None:
+                row[field] = link[field]
+        for job_id in job_ids:
+            if job_id and job_id not in row["job_ids"]:
+                row["job_ids"].append(job_id)
+        self._added()
+
+    def record(self, update: DeliveryUpdate) -> None:
+        """Buffer a status callback; call from the event loop"""
+        DELIVERY_EVENTS.inc(provider=update.provider, status=update.status)
+        rank, final, failed = update.ranking()
+        row = self._row(update.external_id)
+        row["provider"] = row.get("provider") or update.provider
+        if rank >= row.get("status_rank", 0):
+            row.update(status=update.status, status_rank=rank, final=final, failed=failed,
+                       error_code=update.error_code, error_message=update.error_message)
+        row["details"].update(update.details)
+        if row.get("final"):
+            for waiter in self._waiters.pop(update.external_id, []):
+                if not waiter.done():
+                    waiter.set_result(dict(row))
+        self._added()
+
+    async def wait_for_final(self, external_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        The delivery row once a callback reports a final status, or None if
+        none has after timeout. The callback may reach another worker, so on
+        timeout the stored row is checked before giving up.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(external_id, []).append(future)
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            waiters = self._waiters.get(external_id)
+            if waiters is not None and future in waiters:
+                waiters.remove(future)
+                if not waiters:
+                    del self._waiters[external_id]
+        return await asyncio.to_thread(self.lookup, external_id)
+
+    def lookup(self, external_id: str) -> Optional[Dict[str, Any]]:
+        """Buffered or stored delivery row for external_id if its status is final"""
+        row = self._pending.get(external_id)
+        if row is not None and row.get("final"):
+            return dict(row)
+        response = self.client.table("outbound_deliveries")\
+            .select("external_id,provider,status,final,failed,error_code,error_message,details")\
+            .eq("external_id", external_id)\
+            .execute()
+        if response.data and response.data[0].get("final"):
+            return response.data[0]
+        return None
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._flusher is not None and not self._flusher.done():
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._flusher = loop.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the background writer and write whatever is still buffered"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+        await self.flush()
+        self._loop = None
+
+    async def flush(self) -> int:
+        """Write everything buffered now; returns the number of rows written"""
+        if not self._pending:
+            return 0
+        rows = list(self._pending.values())
+        self._pending = {}
+        DELIVERY_PENDING.set(0)
+        try:
+            await asyncio.to_thread(self.writer, rows)
+        except Exception as e:
+            DELIVERY_WRITE_FAILURES.inc()
+            logger.error(f"Failed to write {len(rows)} delivery rows; will retry: {e}")
+            self._merge_back(rows)
+            return 0
+        DELIVERY_BATCH.observe(len(rows))
+        return len(rows)
+
+    # Buffering
+
+    def _row(self, external_id: str) -> Dict[str, Any]:
+        row = self._pending.get(external_id)
+        if row is None:
+            row = self._pending[external_id] = {"external_id": external_id, "job_ids": [], "details": {}}
+        return row
+
+    def _added(self) -> None:
+        DELIVERY_PENDING.set(len(self._pending))
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._loop is not loop or self._flusher is None or self._flusher.done():
+            # Not started by the app lifespan (scripts, tests); start on first use
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._flusher = loop.create_task(self._flush_loop())
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def _merge_back(self, rows: List[Dict[str, Any]]) -> None:
+        """Fold a failed batch into rows buffered since, keeping newer status"""
+        for old in rows:
+            row = self._row(old["external_id"])
+            for field in LINK_FIELDS:
+                if row.get(field) is None and old.get(field) is not None:
+                    row[field] = old[field]
+            row["job_ids"] = list(dict.fromkeys(old["job_ids"] + row["job_ids"]))
+            row["details"] = {**old["details"], **row["details"]}
+            if old.get("status_rank", 0) > row.get("status_rank", 0):
+                row.update({field: old.get(field) for field in STATUS_FIELDS})
+        DELIVERY_PENDING.set(len(self._pending))
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    # Storage
+
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            self._client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+        return self._client
+
+    def _write_supabase(self, rows: List[Dict[str, Any]]) -> None:
+        self.client.rpc("record_outbound_deliveries", {"p_rows": rows}).execute()
+
+
+tracker = DeliveryTracker()
@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class JobIndexEntry:
+    """What a status read needs about one job; no payload"""
+    __slots__ = ("job_id", "status", "job_type", "run_date", "retry_count", "last_error", "checked_at")
+
+    def __init__(self, job_id: str, status: str, checked_at: float):
+        self.job_id = job_id
+        self.status = status
+        self.job_type: Optional[str] = None
+        self.run_date: Optional[datetime] = None
+        self.retry_count = 0
+        self.last_error: Optional[str] = None
+        self.checked_at = checked_at
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "job_type": self.job_type,
+            "run_date": self.run_date,
+            "retry_count": self.retry_count,
+            "last_error": self.last_error
+        }
+
+
+class JobIndex:
+    """
+    Bounded in-memory map of job id to current status.
+
+    The scheduler records every transition it makes (scheduled, running,
+    completed, retried, dead-lettered, cancelled), so reads for jobs handled
+    by this process never touch storage. Other workers can move a job too;
+    an entry is trusted for max_age_seconds after it was last written or
+    read from storage, then the caller re-reads it. Least recently used
+    entries are dropped past max_entries.
+    """
+
+    FIELDS = ("job_type", "run_date", "retry_count", "last_error")
+
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        max_age_seconds: float = 5.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.clock = clock
+        self._entries: "OrderedDict[str, JobIndexEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def record(self, job_id: str, status: str, **fields) -> Dict[str, Any]:
+        """Record a transition; fields are any of job_type, run_date, retry_count, last_error"""
+        with self._lock:
+            entry = self._entries.get(job_id)
+            if entry is None:
+                entry = self._entries[job_id] = JobIndexEntry(job_id, status, self.clock())
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            else:
+                entry.status = status
+                entry.checked_at = self.clock()
+                self._entries.move_to_end(job_id)
+            for name, value in fields.items():
+                if name in self.FIELDS:
+                    setattr(entry, name, value)
+            return entry.to_dict()
+
+    def record_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Record a scheduled_jobs row read from storage"""
+        run_date = row.get("next_run") or row.get("run_date")
+        if isinstance(run_date, str):
+            run_date = datetime.fromisoformat(run_date)
+        return self.record(
+            row["job_id"],
+            row["status"],
+            job_type=row.get("job_type"),
+            run_date=run_date,
+            retry_count=row.get("retry_count") or 0,
+            last_error=row.get("last_error")
+        )
+
+    def mark_stale(self, job_id: str) -> None:
+        """Another worker may have changed this job; re-read it next time"""
+        entry = self._entries.get(job_id)
+        if entry is not None:
+            entry.checked_at = float("-inf")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status for job_id if the entry is fresh, else None"""
+        entry = self._entries.get(job_id)
+        if entry is None or self.clock() - entry.checked_at > self.max_age_seconds:
+            return None
+        return entry.to_dict()
+
+    def get_many(self, job_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Fresh entries among job_ids; the rest need a storage read"""
+        found = {}
+        for job_id in job_ids:
+            status = self.get(job_id)
+            if status is not None:
+                found[job_id] = status
+        return found
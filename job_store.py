@@ -0,0 +1,1030 @@
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from supabase import create_client, Client
+import json
+import logging
+import os
+import sqlite3
+import threading
+import pytz
+
+logger = logging.getLogger(__name__)
+
+# What misfire catch-up needs to decide a missed job's fate
+MISSED_JOB_COLUMNS = 'job_id,job_type,next_run,handler,metadata'
+
+def _utc_iso(value: datetime) -> str:
+    """ISO timestamp in UTC, so stored values compare correctly as text"""
+    if value.tzinfo is None:
+        value = pytz.UTC.localize(value)
+    return value.astimezone(pytz.UTC).isoformat()
+
+
+class JobStore(ABC):
+    """
+    Persistence for scheduled_jobs rows.
+
+    Rows are plain dicts shaped like the scheduled_jobs table. Claiming is the
+    only way a job moves to running: a claim atomically sets the lease owner
+    and expiry, and only succeeds for scheduled jobs or running jobs whose
+    lease has expired. That lets several processes arm the same jobs while
+    each job runs once.
+    """
+
+    @abstractmethod
+    def insert_job(self, job: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_jobs(self, jobs: List[Dict[str, Any]]) -> None:
+        """Insert several rows in one round-trip; all or nothing"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_job(self, job_id: str, fields: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_jobs(self, job_ids: List[str], columns: str = '*') -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_jobs_by_status(self, status: str, columns: str = '*') -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_archived_jobs(self, job_ids: List[str], columns: str = '*') -> Dict[str, Dict[str, Any]]:
+        """Latest archived copy of each job in job_ids"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_jobs_due_before(self, before: datetime, columns: str = '*') -> List[Dict[str, Any]]:
+        """Scheduled jobs whose next_run is at or before before, earliest first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_missed_jobs(
+        self,
+        missed_before: datetime,
+        after: Optional[Tuple[str, str]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        """
+        One page of scheduled jobs whose next_run passed before missed_before,
+        ordered by (next_run, job_id) and starting after the after key, with
+        the columns misfire handling needs. Rows without next_run use
+        run_date, returned as next_run.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_job(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def release_job(self, job_id: str, owner: str, status: str) -> bool:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_orphaned_jobs(self, overdue_before: datetime, limit: int) -> List[Dict[str, Any]]:
+        """Running jobs with an expired lease, and scheduled jobs nobody fired"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def reschedule_job(self, job_id: str, owner: str, run_date: datetime, retry_count: int, last_error: str) -> bool:
+        """Put a claimed job back to scheduled for a retry and release the lease"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def advance_recurring_job(self, job_id: str, owner: str, next_run: datetime, last_error: Optional[str] = None) -> bool:
+        """
+        Put a claimed recurring job back to scheduled for its next occurrence
+        with a fresh retry count, and release the lease
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def dead_letter_job(self, job_id: str, owner: str, last_error: str) -> bool:
+        """Mark a claimed job failed for good and copy it to the dead-letter table"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_dead_letters(self, limit: int, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def replay_dead_letters(self, job_ids: List[str], run_date: datetime) -> List[Dict[str, Any]]:
+        """
+        Reschedule dead-lettered jobs from their dead-letter copy with a fresh
+        retry count. Returns job_id and handler for each replayed job.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def archive_finished_jobs(self, finished_before: datetime, batch_size: int) -> int:
+        """
+        Move up to batch_size finished jobs last updated before finished_before
+        into scheduled_jobs_archive. Finished means completed, cancelled, or
+        failed (failed jobs are only left failed once dead-lettered).
+        Returns how many rows moved.
+        """
+        raise NotImplementedError
+
+    # Outbox: sends queued by jobs, drained by outbox.OutboxRelay. Messages
+    # are dicts with dedup_key, job_id, channel, to_number, body and
+    # available_at.
+
+    @abstractmethod
+    def complete_job_with_outbox(self, job_id: str, owner: str, messages: List[Dict[str, Any]]) -> bool:
+        """
+        Complete a claimed job, release its lease and queue its sends in one
+        transaction. False, with nothing queued, if owner no longer holds the lease
+        or the job was cancelled.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def enqueue_outbox(self, messages: List[Dict[str, Any]]) -> int:
+        """
+        Queue sends, skipping dedup_keys already queued. A send joins the
+        earliest pending send to the same recipient and channel. Returns how
+        many were new.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_outbox(self, owner: str, lease_seconds: int, limit: int) -> List[Dict[str, Any]]:
+        """
+        Lease up to limit due pending sends, and sends whose lease expired
+        while sending, earliest first
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def renew_outbox_leases(self, owner: str, dedup_keys: List[str], lease_seconds: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def settle_outbox(self, owner: str, results: List[Dict[str, Any]]) -> int:
+        """
+        Apply send outcomes (dedup_key, status, external_id, last_error,
+        available_at) to sends owner still holds
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def link_outbox_sends(self, links: Dict[str, str]) -> int:
+        """
+        Mark sent the sends claimed together with each send key (the group's
+        first dedup_key) that are still sending, with the provider id a
+        callback reported for it
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def purge_outbox(self, finished_before: datetime, batch_size: int) -> int:
+        """Delete up to batch_size sent or failed sends last updated before finished_before"""
+        raise NotImplementedError
+
+
+class SupabaseJobStore(JobStore):
+    """scheduled_jobs in Supabase; claims go through Postgres functions"""
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    @classmethod
+    def from_env(cls) -> "SupabaseJobStore":
+        supabase_url = os.getenv("SUPABASE_URL")
+        supabase_key = os.getenv("SUPABASE_ANON_KEY")
+        return cls(create_client(supabase_url, supabase_key))
+
+    def _table(self):
+        return self.client.table('scheduled_jobs')
+
+    def insert_job(self, job: Dict[str, Any]) -> None:
+        self._table().insert(job).execute()
+
+    def insert_jobs(self, jobs: List[Dict[str, Any]]) -> None:
+        if jobs:
+            self._table().insert(jobs).execute()
+
+    def update_job(self, job_id: str, fields: Dict[str, Any]) -> None:
+        self._table()\
+            .update({**fields, 'updated_at': _utc_iso(datetime.now(pytz.UTC))})\
+            .eq('job_id', job_id)\
+            .execute()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        response = self._table()\
+            .select('*')\
+            .eq('job_id', job_id)\
+            .limit(1)\
+            .execute()
+        return response.data[0] if response.data else None
+
+    def get_jobs(self, job_ids: List[str], columns: str = '*') -> Dict[str, Dict[str, Any]]:
+        response = self._table()\
+            .select(columns)\
+            .in_('job_id', job_ids)\
+            .execute()
+        return {row['job_id']: row for row in response.data}
+
+    def get_jobs_by_status(self, status: str, columns: str = '*') -> List[Dict[str, Any]]:
+        response = self._table()\
+            .select(columns)\
+            .eq('status', status)\
+            .execute()
+        return response.data
+
+    def get_archived_jobs(self, job_ids: List[str], columns: str = '*') -> Dict[str, Dict[str, Any]]:
+        response = self.client.table('scheduled_jobs_archive')\
+            .select(columns)\
+            .in_('job_id', job_ids)\
+            .order('archived_at')\
+            .execute()
+        # Later archive rows (a replayed job archived again) win
+        return {row['job_id']: row for row in response.data}
+
+    def get_jobs_due_before(self, before: datetime, columns: str = '*') -> List[Dict[str, Any]]:
+        response = self._table()\
+            .select(columns)\
+            .eq('status', 'scheduled')\
+            .lte('next_run', _utc_iso(before))\
+            .order('next_run')\
+            .execute()
+        return response.data
+
+    def get_missed_jobs(
+        self,
+        missed_before: datetime,
+        after: Optional[Tuple[str, str]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        # An RPC: PostgREST filters can't order or page on coalesce(next_run, run_date)
+        after_run, after_job_id = after or (None, None)
+        response = self.client.rpc('get_missed_scheduled_jobs', {
+            'p_missed_before': _utc_iso(missed_before),
+            'p_after_run': after_run,
+            'p_after_job_id': after_job_id,
+            'p_limit': limit
+        }).execute()
+        return response.data
+
+    def claim_job(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        response = self.client.rpc('claim_scheduled_job', {
+            'p_job_id': job_id,
+            'p_owner': owner,
+            'p_lease_seconds': lease_seconds
+        }).execute()
+        return bool(response.data)
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        response = self.client.rpc('renew_scheduled_job_lease', {
+            'p_job_id': job_id,
+            'p_owner': owner,
+            'p_lease_seconds': lease_seconds
+        }).execute()
+        return bool(response.data)
+
+    def release_job(self, job_id: str, owner: str, status: str) -> bool:
+        response = self._table()\
+            .update({
+                'status': status,
+                'lease_owner': None,
+                'lease_expires_at': None,
+                'updated_at': _utc_iso(datetime.now(pytz.UTC))
+            })\
+            .eq('job_id', job_id)\
+            .eq('lease_owner', owner)\
+            .eq('status', 'running')\
+            .execute()
+        return bool(response.data)
+
+    def get_orphaned_jobs(self, overdue_before: datetime, limit: int) -> List[Dict[str, Any]]:
+        now = _utc_iso(datetime.now(pytz.UTC))
+        overdue = _utc_iso(overdue_before)
+        response = self._table()\
+            .select('job_id,handler,status')\
+            .or_(
+                # Quoted: timestamps contain characters PostgREST's logic syntax reserves
+                f'and(status.eq.running,lease_expires_at.lt."{now}"),'
+                f'and(status.eq.scheduled,run_date.lt."{overdue}")'
+            )\
+            .order('run_date')\
+            .limit(limit)\
+            .execute()
+        return response.data
+
+    def reschedule_job(self, job_id: str, owner: str, run_date: datetime, retry_count: int, last_error: str) -> bool:
+        response = self._table()\
+            .update({
+                'status': 'scheduled',
+                'run_date': _utc_iso(run_date),
+                'next_run': _utc_iso(run_date),
+                'retry_count': retry_count,
+                'last_error': last_error,
+                'lease_owner': None,
+                'lease_expires_at': None,
+                'updated_at': _utc_iso(datetime.now(pytz.UTC))
+            })\
+            .eq('job_id', job_id)\
+            .eq('lease_owner', owner)\
+            .eq('status', 'running')\
+            .execute()
+        return bool(response.data)
+
+    def advance_recurring_job(self, job_id: str, owner: str, next_run: datetime, last_error: Optional[str] = None) -> bool:
+        response = self._table()\
+            .update({
+                'status': 'scheduled',
+                'run_date': _utc_iso(next_run),
+                'next_run': _utc_iso(next_run),
+                'retry_count': 0,
+                'last_error': last_error,
+                'lease_owner': None,
+                'lease_expires_at': None,
+                'updated_at': _utc_iso(datetime.now(pytz.UTC))
+            })\
+            .eq('job_id', job_id)\
+            .eq('lease_owner', owner)\
+            .eq('status', 'running')\
+            .execute()
+        return bool(response.data)
+
+    def dead_letter_job(self, job_id: str, owner: str, last_error: str) -> bool:
+        response = self.client.rpc('dead_letter_scheduled_job', {
+            'p_job_id': job_id,
+            'p_owner': owner,
+            'p_error': last_error
+        }).execute()
+        return bool(response.data)
+
+    def get_dead_letters(self, limit: int, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        query = self.client.table('scheduled_jobs_dead_letter')\
+            .select('*')\
+            .is_('replayed_at', 'null')
+        if job_type:
+            query = query.eq('job_type', job_type)
+        response = query.order('failed_at', desc=True).limit(limit).execute()
+        return response.data
+
+    def replay_dead_letters(self, job_ids: List[str], run_date: datetime) -> List[Dict[str, Any]]:
+        response = self.client.rpc('replay_dead_letter_jobs', {
+            'p_job_ids': job_ids,
+            'p_run_date': _utc_iso(run_date)
+        }).execute()
+        return response.data or []
+
+    def archive_finished_jobs(self, finished_before: datetime, batch_size: int) -> int:
+        response = self.client.rpc('archive_scheduled_jobs', {
+            'p_finished_before': _utc_iso(finished_before),
+            'p_batch_size': batch_size
+        }).execute()
+        return int(response.data or 0)
+
+    @staticmethod
+    def _outbox_rows(messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{**message, 'available_at': _utc_iso(message['available_at'])} for message in messages]
+
+    def complete_job_with_outbox(self, job_id: str, owner: str, messages: List[Dict[str, Any]]) -> bool:
+        response = self.client.rpc('complete_job_with_outbox', {
+            'p_job_id': job_id,
+            'p_owner': owner,
+            'p_rows': self._outbox_rows(messages)
+        }).execute()
+        return bool(response.data)
+
+    def enqueue_outbox(self, messages: List[Dict[str, Any]]) -> int:
+        if not messages:
+            return 0
+        response = self.client.rpc('enqueue_outbox_messages', {'p_rows': self._outbox_rows(messages)}).execute()
+        return int(response.data or 0)
+
+    def claim_outbox(self, owner: str, lease_seconds: int, limit: int) -> List[Dict[str, Any]]:
+        response = self.client.rpc('claim_outbox_messages', {
+            'p_owner': owner,
+            'p_lease_seconds': lease_seconds,
+            'p_limit': limit
+        }).execute()
+        return response.data or []
+
+    def renew_outbox_leases(self, owner: str, dedup_keys: List[str], lease_seconds: int) -> int:
+        if not dedup_keys:
+            return 0
+        response = self.client.rpc('renew_outbox_leases', {
+            'p_owner': owner,
+            'p_keys': dedup_keys,
+            'p_lease_seconds': lease_seconds
+        }).execute()
+        return int(response.data or 0)
+
+    def settle_outbox(self, owner: str, results: List[Dict[str, Any]]) -> int:
+        if not results:
+            return 0
+        rows = [
+            {**result, 'available_at': _utc_iso(result['available_at']) if result.get('available_at') else None}
+            for result in results
+        ]
+        response = self.client.rpc('settle_outbox_messages', {'p_owner': owner, 'p_rows': rows}).execute()
+        return int(response.data or 0)
+
+    def link_outbox_sends(self, links: Dict[str, str]) -> int:
+        if not links:
+            return 0
+        response = self.client.rpc('link_outbox_sends', {
+            'p_links': [{'send_key': key, 'external_id': external_id} for key, external_id in links.items()]
+        }).execute()
+        return int(response.data or 0)
+
+    def purge_outbox(self, finished_before: datetime, batch_size: int) -> int:
+        response = self.client.rpc('purge_outbox_messages', {
+            'p_finished_before': _utc_iso(finished_before),
+            'p_batch_size': batch_size
+        }).execute()
+        return int(response.data or 0)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    Embedded scheduled_jobs store for local runs, tests and simulations.
+
+    Several processes can share one database file; claims are single UPDATE
+    statements, so SQLite's write lock makes them atomic. Use ":memory:" for
+    a private in-process store.
+    """
+
+    SCHEMA = """
+        create table if not exists scheduled_jobs (
+            job_id text primary key,
+            job_type text not null,
+            run_date text not null,
+            status text not null,
+            metadata text not null,
+            created_at text not null,
+            updated_at text,
+            last_run text,
+            next_run text,
+            retry_count integer default 0,
+            max_retries integer default 3,
+            handler text,
+            lease_owner text,
+            lease_expires_at text,
+            last_error text
+        );
+        create index if not exists idx_scheduled_jobs_status on scheduled_jobs(status);
+        create index if not exists idx_scheduled_jobs_run_date on scheduled_jobs(run_date);
+        create index if not exists idx_scheduled_jobs_next_run on scheduled_jobs(status, next_run);
+        create table if not exists scheduled_jobs_archive as
+            select *, null as archived_at from scheduled_jobs where 0;
+        create table if not exists scheduled_jobs_dead_letter (
+            id integer primary key autoincrement,
+            job_id text not null,
+            job_type text not null,
+            handler text,
+            metadata text not null,
+            retry_count integer not null,
+            last_error text,
+            failed_at text not null,
+            replayed_at text
+        );
+        create index if not exists idx_dead_letter_pending on scheduled_jobs_dead_letter(replayed_at, failed_at);
+        create table if not exists outbound_outbox (
+            dedup_key text primary key,
+            job_id text,
+            channel text not null,
+            to_number text not null,
+            body text not null,
+            status text not null default 'pending',
+            attempts integer not null default 0,
+            available_at text not null,
+            claimed_at text,
+            lease_owner text,
+            lease_expires_at text,
+            external_id text,
+            last_error text,
+            created_at text not null,
+            updated_at text not null,
+            sent_at text
+        );
+        create index if not exists idx_outbound_outbox_due on outbound_outbox(status, available_at);
+        create index if not exists idx_outbound_outbox_recipient on outbound_outbox(channel, to_number, status);
+    """
+
+    # Jobs that will never run again and can leave the hot table
+    FINISHED_FILTER = "status in ('completed', 'cancelled', 'failed')"
+
+    JSON_COLUMNS = ("metadata",)
+
+    def __init__(self, path: str = ":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._conn.execute("pragma journal_mode=wal")
+        self._conn.executescript(self.SCHEMA)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def _row(self, row: sqlite3.Row) -> Dict[str, Any]:
+        data = dict(row)
+        for column in self.JSON_COLUMNS:
+            if isinstance(data.get(column), str):
+                data[column] = json.loads(data[column])
+        return data
+
+    def _encode(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        encoded = {}
+        for key, value in fields.items():
+            if key in self.JSON_COLUMNS and not isinstance(value, str):
+                value = json.dumps(value)
+            elif isinstance(value, datetime):
+                value = _utc_iso(value)
+            encoded[key] = value
+        return encoded
+
+    @staticmethod
+    def _columns(columns: str) -> str:
+        return '*' if columns == '*' else ', '.join(c.strip() for c in columns.split(','))
+
+    def _insert_row(self, job: Dict[str, Any]) -> None:
+        row = self._encode(job)
+        # Normalise timestamps so text comparisons in queries hold
+        for column in ('run_date', 'next_run'):
+            if row.get(column):
+                row[column] = _utc_iso(datetime.fromisoformat(row[column]))
+        names = ', '.join(row)
+        placeholders = ', '.join('?' for _ in row)
+        self._conn.execute(f"insert into scheduled_jobs ({names}) values ({placeholders})", tuple(row.values()))
+
+    def insert_job(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._insert_row(job)
+
+    def insert_jobs(self, jobs: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                for job in jobs:
+                    self._insert_row(job)
+                self._conn.execute("commit")
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def update_job(self, job_id: str, fields: Dict[str, Any]) -> None:
+        row = self._encode({**fields, 'updated_at': datetime.now(pytz.UTC)})
+        assignments = ', '.join(f"{name} = ?" for name in row)
+        self._execute(
+            f"update scheduled_jobs set {assignments} where job_id = ?",
+            (*row.values(), job_id)
+        )
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._execute("select * from scheduled_jobs where job_id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def get_jobs(self, job_ids: List[str], columns: str = '*') -> Dict[str, Dict[str, Any]]:
+        if not job_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in job_ids)
+        rows = self._execute(
+            f"select {self._columns(columns)} from scheduled_jobs where job_id in ({placeholders})",
+            tuple(job_ids)
+        ).fetchall()
+        return {row['job_id']: self._row(row) for row in rows}
+
+    def get_jobs_by_status(self, status: str, columns: str = '*') -> List[Dict[str, Any]]:
+        rows = self._execute(
+            f"select {self._columns(columns)} from scheduled_jobs where status = ?",
+            (status,)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def get_archived_jobs(self, job_ids: List[str], columns: str = '*') -> Dict[str, Dict[str, Any]]:
+        if not job_ids:
+            return {}
+        placeholders = ', '.join('?' for _ in job_ids)
+        rows = self._execute(
+            f"""
+            select {self._columns(columns)} from scheduled_jobs_archive
+             where job_id in ({placeholders})
+             order by archived_at
+            """,
+            tuple(job_ids)
+        ).fetchall()
+        # Later archive rows (a replayed job archived again) win
+        return {row['job_id']: self._row(row) for row in rows}
+
+    def get_jobs_due_before(self, before: datetime, columns: str = '*') -> List[Dict[str, Any]]:
+        rows = self._execute(
+            f"""
+            select {self._columns(columns)} from scheduled_jobs
+             where status = 'scheduled' and next_run <= ?
+             order by next_run
+            """,
+            (_utc_iso(before),)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def get_missed_jobs(
+        self,
+        missed_before: datetime,
+        after: Optional[Tuple[str, str]],
+        limit: int
+    ) -> List[Dict[str, Any]]:
+        columns = self._columns(MISSED_JOB_COLUMNS).replace('next_run', 'coalesce(next_run, run_date) as next_run')
+        sql = f"""
+            select {columns} from scheduled_jobs
+             where status = 'scheduled' and coalesce(next_run, run_date) < ?
+        """
+        params: tuple = (_utc_iso(missed_before),)
+        if after:
+            sql += """
+               and (coalesce(next_run, run_date) > ?
+                    or (coalesce(next_run, run_date) = ? and job_id > ?))
+            """
+            params += (after[0], after[0], after[1])
+        rows = self._execute(
+            sql + " order by coalesce(next_run, run_date), job_id limit ?", (*params, limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def claim_job(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        now = datetime.now(pytz.UTC)
+        cursor = self._execute(
+            """
+            update scheduled_jobs
+               set status = 'running', lease_owner = ?, lease_expires_at = ?,
+                   last_run = ?, updated_at = ?
+             where job_id = ?
+               and (status = 'scheduled' or (status = 'running' and lease_expires_at < ?))
+            """,
+            (owner, _utc_iso(now + timedelta(seconds=lease_seconds)),
+             _utc_iso(now), _utc_iso(now), job_id, _utc_iso(now))
+        )
+        return cursor.rowcount == 1
+
+    def renew_lease(self, job_id: str, owner: str, lease_seconds: int) -> bool:
+        now = datetime.now(pytz.UTC)
+        cursor = self._execute(
+            """
+            update scheduled_jobs set lease_expires_at = ?, updated_at = ?
+             where job_id = ? and status = 'running' and lease_owner = ?
+            """,
+            (_utc_iso(now + timedelta(seconds=lease_seconds)), _utc_iso(now), job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def release_job(self, job_id: str, owner: str, status: str) -> bool:
+        cursor = self._execute(
+            """
+            update scheduled_jobs
+               set status = ?, lease_owner = null, lease_expires_at = null, updated_at = ?
+             where job_id = ? and lease_owner = ? and status = 'running'
+            """,
+            (status, _utc_iso(datetime.now(pytz.UTC)), job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def get_orphaned_jobs(self, overdue_before: datetime, limit: int) -> List[Dict[str, Any]]:
+        rows = self._execute(
+            """
+            select job_id, handler, status from scheduled_jobs
+             where (status = 'running' and lease_expires_at < ?)
+                or (status = 'scheduled' and run_date < ?)
+             order by run_date
+             limit ?
+            """,
+            (_utc_iso(datetime.now(pytz.UTC)), _utc_iso(overdue_before), limit)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def reschedule_job(self, job_id: str, owner: str, run_date: datetime, retry_count: int, last_error: str) -> bool:
+        cursor = self._execute(
+            """
+            update scheduled_jobs
+               set status = 'scheduled', run_date = ?, next_run = ?, retry_count = ?, last_error = ?,
+                   lease_owner = null, lease_expires_at = null, updated_at = ?
+             where job_id = ? and lease_owner = ? and status = 'running'
+            """,
+            (_utc_iso(run_date), _utc_iso(run_date), retry_count, last_error,
+             _utc_iso(datetime.now(pytz.UTC)), job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def advance_recurring_job(self, job_id: str, owner: str, next_run: datetime, last_error: Optional[str] = None) -> bool:
+        cursor = self._execute(
+            """
+            update scheduled_jobs
+               set status = 'scheduled', run_date = ?, next_run = ?, retry_count = 0, last_error = ?,
+                   lease_owner = null, lease_expires_at = null, updated_at = ?
+             where job_id = ? and lease_owner = ? and status = 'running'
+            """,
+            (_utc_iso(next_run), _utc_iso(next_run), last_error,
+             _utc_iso(datetime.now(pytz.UTC)), job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def dead_letter_job(self, job_id: str, owner: str, last_error: str) -> bool:
+        now = _utc_iso(datetime.now(pytz.UTC))
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                failed = self._conn.execute(
+                    """
+                    update scheduled_jobs
+                       set status = 'failed', last_error = ?,
+                           lease_owner = null, lease_expires_at = null, updated_at = ?
+                     where job_id = ? and lease_owner = ? and status = 'running'
+                    """,
+                    (last_error, now, job_id, owner)
+                ).rowcount == 1
+                if failed:
+                    self._conn.execute(
+                        """
+                        insert into scheduled_jobs_dead_letter
+                            (job_id, job_type, handler, metadata, retry_count, last_error, failed_at)
+                        select job_id, job_type, handler, metadata, retry_count, last_error, ?
+                          from scheduled_jobs where job_id = ?
+                        """,
+                        (now, job_id)
+                    )
+                self._conn.execute("commit")
+                return failed
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def get_dead_letters(self, limit: int, job_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "select * from scheduled_jobs_dead_letter where replayed_at is null"
+        params: tuple = ()
+        if job_type:
+            sql += " and job_type = ?"
+            params = (job_type,)
+        rows = self._execute(sql + " order by failed_at desc limit ?", (*params, limit)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def replay_dead_letters(self, job_ids: List[str], run_date: datetime) -> List[Dict[str, Any]]:
+        if not job_ids:
+            return []
+        now = _utc_iso(datetime.now(pytz.UTC))
+        placeholders = ', '.join('?' for _ in job_ids)
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                letters = self._conn.execute(
+                    f"""
+                    select id, job_id, job_type, handler, metadata from scheduled_jobs_dead_letter
+                     where replayed_at is null and job_id in ({placeholders})
+                    """,
+                    tuple(job_ids)
+                ).fetchall()
+                replayed = {}
+                for letter in letters:
+                    self._conn.execute(
+                        "update scheduled_jobs_dead_letter set replayed_at = ? where id = ?",
+                        (now, letter['id'])
+                    )
+                    replayed[letter['job_id']] = letter
+                for job_id, letter in replayed.items():
+                    # Put the failed row back in place, or insert it again if it was archived
+                    self._conn.execute(
+                        """
+                        insert into scheduled_jobs
+                            (job_id, job_type, run_date, next_run, status, metadata, created_at, retry_count, handler)
+                        values (?, ?, ?, ?, 'scheduled', ?, ?, 0, ?)
+                        on conflict (job_id) do update
+                           set job_type = excluded.job_type, run_date = excluded.run_date,
+                               next_run = excluded.next_run, status = 'scheduled',
+                               metadata = excluded.metadata, retry_count = 0, handler = excluded.handler,
+                               lease_owner = null, lease_expires_at = null, last_error = null,
+                               updated_at = excluded.created_at
+                        """,
+                        (job_id, letter['job_type'], _utc_iso(run_date), _utc_iso(run_date),
+                         letter['metadata'], now, letter['handler'])
+                    )
+                self._conn.execute("commit")
+                return [{'job_id': job_id, 'handler': letter['handler']} for job_id, letter in replayed.items()]
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def archive_finished_jobs(self, finished_before: datetime, batch_size: int) -> int:
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                job_ids = [row['job_id'] for row in self._conn.execute(
+                    f"""
+                    select job_id from scheduled_jobs
+                     where {self.FINISHED_FILTER}
+                       and coalesce(updated_at, created_at) < ?
+                     order by coalesce(updated_at, created_at)
+                     limit ?
+                    """,
+                    (_utc_iso(finished_before), batch_size)
+                )]
+                if job_ids:
+                    placeholders = ', '.join('?' for _ in job_ids)
+                    self._conn.execute(
+                        f"insert into scheduled_jobs_archive select *, ? from scheduled_jobs where job_id in ({placeholders})",
+                        (_utc_iso(datetime.now(pytz.UTC)), *job_ids)
+                    )
+                    self._conn.execute(
+                        f"delete from scheduled_jobs where job_id in ({placeholders})",
+                        tuple(job_ids)
+                    )
+                self._conn.execute("commit")
+                return len(job_ids)
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def _enqueue_outbox_rows(self, messages: List[Dict[str, Any]]) -> int:
+        # Called with the lock held, inside a transaction
+        now = _utc_iso(datetime.now(pytz.UTC))
+        queued = 0
+        for message in messages:
+            available_at = _utc_iso(message['available_at'])
+            earliest = self._conn.execute(
+                """
+                select min(available_at) from outbound_outbox
+                 where status = 'pending' and channel = ? and to_number = ?
+                """,
+                (message['channel'], message['to_number'])
+            ).fetchone()[0]
+            queued += self._conn.execute(
+                """
+                insert or ignore into outbound_outbox
+                    (dedup_key, job_id, channel, to_number, body, available_at, created_at, updated_at)
+                values (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (message['dedup_key'], message.get('job_id'), message['channel'], message['to_number'],
+                 message['body'], min(available_at, earliest or available_at), now, now)
+            ).rowcount
+        return queued
+
+    def complete_job_with_outbox(self, job_id: str, owner: str, messages: List[Dict[str, Any]]) -> bool:
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                completed = self._conn.execute(
+                    """
+                    update scheduled_jobs
+                       set status = 'completed', lease_owner = null, lease_expires_at = null, updated_at = ?
+                     where job_id = ? and lease_owner = ? and status = 'running'
+                    """,
+                    (_utc_iso(datetime.now(pytz.UTC)), job_id, owner)
+                ).rowcount == 1
+                if completed:
+                    self._enqueue_outbox_rows(messages)
+                self._conn.execute("commit")
+                return completed
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def enqueue_outbox(self, messages: List[Dict[str, Any]]) -> int:
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                queued = self._enqueue_outbox_rows(messages)
+                self._conn.execute("commit")
+                return queued
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def claim_outbox(self, owner: str, lease_seconds: int, limit: int) -> List[Dict[str, Any]]:
+        now = datetime.now(pytz.UTC)
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                keys = [row['dedup_key'] for row in self._conn.execute(
+                    """
+                    select dedup_key from outbound_outbox
+                     where (status = 'pending' and available_at <= ?)
+                        or (status = 'sending' and lease_expires_at < ?)
+                     order by available_at
+                     limit ?
+                    """,
+                    (_utc_iso(now), _utc_iso(now), limit)
+                )]
+                rows = []
+                if keys:
+                    placeholders = ', '.join('?' for _ in keys)
+                    self._conn.execute(
+                        f"""
+                        update outbound_outbox
+                           set status = 'sending', attempts = attempts + 1, claimed_at = ?,
+                               lease_owner = ?, lease_expires_at = ?, updated_at = ?
+                         where dedup_key in ({placeholders})
+                        """,
+                        (_utc_iso(now), owner, _utc_iso(now + timedelta(seconds=lease_seconds)), _utc_iso(now), *keys)
+                    )
+                    rows = self._conn.execute(
+                        f"select * from outbound_outbox where dedup_key in ({placeholders}) order by available_at",
+                        tuple(keys)
+                    ).fetchall()
+                self._conn.execute("commit")
+                return [dict(row) for row in rows]
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def renew_outbox_leases(self, owner: str, dedup_keys: List[str], lease_seconds: int) -> int:
+        if not dedup_keys:
+            return 0
+        now = datetime.now(pytz.UTC)
+        placeholders = ', '.join('?' for _ in dedup_keys)
+        return self._execute(
+            f"""
+            update outbound_outbox set lease_expires_at = ?, updated_at = ?
+             where dedup_key in ({placeholders}) and status = 'sending' and lease_owner = ?
+            """,
+            (_utc_iso(now + timedelta(seconds=lease_seconds)), _utc_iso(now), *dedup_keys, owner)
+        ).rowcount
+
+    def settle_outbox(self, owner: str, results: List[Dict[str, Any]]) -> int:
+        if not results:
+            return 0
+        now = _utc_iso(datetime.now(pytz.UTC))
+        settled = 0
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                for result in results:
+                    available_at = result.get('available_at')
+                    settled += self._conn.execute(
+                        """
+                        update outbound_outbox
+                           set status = ?, external_id = coalesce(?, external_id), last_error = ?,
+                               available_at = coalesce(?, available_at),
+                               sent_at = case when ? = 'sent' then ? else sent_at end,
+                               lease_owner = null, lease_expires_at = null, updated_at = ?
+                         where dedup_key = ? and status = 'sending' and lease_owner = ?
+                        """,
+                        (result['status'], result.get('external_id'), result.get('last_error'),
+                         _utc_iso(available_at) if available_at else None,
+                         result['status'], now, now, result['dedup_key'], owner)
+                    ).rowcount
+                self._conn.execute("commit")
+                return settled
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def link_outbox_sends(self, links: Dict[str, str]) -> int:
+        if not links:
+            return 0
+        now = _utc_iso(datetime.now(pytz.UTC))
+        linked = 0
+        with self._lock:
+            self._conn.execute("begin immediate")
+            try:
+                for send_key, external_id in links.items():
+                    linked += self._conn.execute(
+                        """
+                        update outbound_outbox
+                           set status = 'sent', external_id = ?, sent_at = ?,
+                               lease_owner = null, lease_expires_at = null, updated_at = ?
+                         where status = 'sending'
+                           and (lease_owner, claimed_at, channel, to_number) = (
+                               select lease_owner, claimed_at, channel, to_number
+                                 from outbound_outbox where dedup_key = ?
+                           )
+                        """,
+                        (external_id, now, now, send_key)
+                    ).rowcount
+                self._conn.execute("commit")
+                return linked
+            except Exception:
+                self._conn.execute("rollback")
+                raise
+
+    def purge_outbox(self, finished_before: datetime, batch_size: int) -> int:
+        return self._execute(
+            """
+            delete from outbound_outbox where dedup_key in (
+                select dedup_key from outbound_outbox
+                 where status in ('sent', 'failed') and updated_at < ?
+                 limit ?
+            )
+            """,
+            (_utc_iso(finished_before), batch_size)
+        ).rowcount
@@ -8,7 +8,7 @@ from fastapi import FastAPI, HTTPException, Query, Depends
 from pathlib import Path
 from dotenv import load_dotenv
 from uuid import UUID
-from base_models import Task, Reminder, ReminderCreate, TaskBase, TaskCreate, User, UserCreate, ContactBase, ContactCreate, Contact, Event, EventCreate  # Remove EventCreate
+from base_models import Task, Reminder, ReminderCreate, TaskBase, TaskCreate, User, UserCreate, ContactBase, ContactCreate, Contact, Event, EventCreate, DeadLetterReplayRequest, JobStatusRequest, CallCampaignCreate  # Remove EventCreate
 import os
 from langchain_core.messages import AIMessage
 
@@ -27,12 +27,23 @@ import sys
 import requests
 from tool_registry import ArgumentType
 import os
-from typing import List, Dict, Any, Callable, TypeVar, Optional, Union, Type
-from scheduler import schedule_event_reminder, cancel_event_reminder, shutdown_scheduler, SupabaseJobScheduler, TriggerType
+from typing import List, Dict, Any, Callable, TypeVar, Optional, Union, Type, Literal
+from scheduler import scheduler, schedule_event_reminder, cancel_event_reminder, shutdown_scheduler, SupabaseJobScheduler, TriggerType, JobSpec, JobType
 import asyncio
 import pytz
-from outbound_caller import OutboundCaller
-from twilio_sms import send_sms
+from outbound_caller import caller
+from call_campaigns import campaigns
+from twilio_sms import send_sms, sms_sender, SEND_KEY_PARAM
+from reminder_dispatch import dispatch_reminder, send_reminder_group
+from outbox import OutboxRelay
+from reminder_templates import reminder_payload
+from reminder_escalation import escalate_reminder, escalation_payload
+from outbound_queue import outbound_queue
+from delivery_tracker import tracker as delivery_tracker, twilio_sms_update, vapi_update
+from twilio.request_validator import RequestValidator
+from urllib.parse import parse_qsl
+import hmac
+from metrics import registry as metrics_registry
 from contextlib import asynccontextmanager
 
 # Load environment variables from .env.local
@@ -54,7 +65,23 @@ async def lifespan(app):
     #     print(f"\n{role}: {msg.content}\n")
     #     if role == "AI":
     #         print("-" * 80)  # Separator line
+    # Runs jobs on the server's event loop and restores stored ones
+    scheduler.start()
+    # Pooled HTTP clients for Vapi calls and Twilio SMS, shared by every request and job
+    await caller.start()
+    await sms_sender.start()
+    await delivery_tracker.start()
+    await outbox_relay.start()
     yield
+    await campaigns.stop()
+    # Sends still in flight are left claimed and picked up again after their lease
+    await outbox_relay.stop()
+    await outbound_queue.stop()
+    await caller.aclose()
+    await sms_sender.aclose()
+    # Write out delivery updates still buffered
+    await delivery_tracker.stop()
+    shutdown_scheduler()
 
 app = FastAPI(
     title="Jarvoice API",
@@ -62,8 +89,14 @@ app = FastAPI(
     version="1.0.0",
     lifespan=lifespan
 )
-scheduler = SupabaseJobScheduler()
-caller = OutboundCaller()
+# One scheduler per process (shared with tool_functions); job leases keep
+# several workers from running the same job
+# Let stored call jobs find the caller again after a restart
+scheduler.register_handler("call", caller.make_simple_call_async)
+# Due call reminders go out through the rate-limited outbound queue
+outbound_queue.register_sender("call", caller.make_simple_call_async)
+# Sends reminder jobs queued in the outbox when they completed
+outbox_relay = OutboxRelay(scheduler.store, send_reminder_group, owner=scheduler.owner_id)
 
 # Configure CORS
 app.add_middleware(
@@ -162,36 +195,16 @@ async def create_task(
                 
                 if user_response.data:
                     user_phone = user_response.data['phone_number']
-                    reminder_message = f"Reminder: Your task '{created_task.title}' is due at {created_task.due_date.strftime('%I:%M %p')}"
-                    
-                    # Schedule both call and SMS reminders
-                    scheduler.schedule_one_time_job(
-                        func=caller.make_simple_call,
-                        run_at=task.reminder_time,
-                        job_id=f"task_reminder_call_{created_task.id}",
-                        to_number=user_phone,
-                        message=reminder_message,
-                        metadata={
-                            "task_id": str(created_task.id),
-                            "user_id": str(task.user_id),
-                            "reminder_type": "CALL"
-                        }
-                    )
-                    
-                    # Schedule SMS reminder (5 minutes after the call)
-                    sms_reminder_time = task.reminder_time + timedelta(minutes=0)
-                    scheduler.schedule_one_time_job(
-                        func=send_sms,
-                        run_at=sms_reminder_time,
-                        job_id=f"task_reminder_sms_{created_task.id}",
-                        to_number=user_phone,
-                        message=reminder_message,
-                        metadata={
-                            "task_id": str(created_task.id),
-                            "user_id": str(task.user_id),
-                            "reminder_type": "SMS"
-                        }
-                    )
+                    # One reminder: a call first, then an SMS only if the call doesn't reach them
+                    scheduler.schedule_many([
+                        JobSpec(
+                            job_id=f"task_reminder_{created_task.id}",
+                            job_type=JobType.NOTIFICATION,
+                            func=escalate_reminder,
+                            run_date=task.reminder_time,
+                            metadata=escalation_payload(user_phone, "task_due", task.user_id, task_id=created_task.id)
+                        )
+                    ])
             except Exception as e:
                 logger.error(f"Failed to schedule reminders: {e}")
                 # Don't fail the task creation if reminder scheduling fails
@@ -236,7 +249,7 @@ async def update_task(
     try:
         # If reminder time is updated, reschedule the reminders
         if task_update.reminder_time:
-            # Cancel existing reminder jobs if any
+            # Cancel separate call and SMS jobs from older versions; the current one is moved in place
             scheduler.cancel_job(f"task_reminder_call_{task_id}")
             scheduler.cancel_job(f"task_reminder_sms_{task_id}")
             
@@ -247,36 +260,21 @@ async def update_task(
                 user_response = supabase.table("users").select("phone_number").eq("id", user_id).execute()
                 if user_response.data:
                     user_phone = user_response.data[0]['phone_number']
-                    reminder_message = f"Reminder: Your task '{task_update.title}' is due soon"
-                    
-                    # Schedule new call reminder
-                    scheduler.schedule_one_time_job(
-                        func=caller.make_simple_call,
-                        run_at=task_update.reminder_time,
-                        job_id=f"task_reminder_call_{task_id}",
-                        to_number=user_phone,
-                        message=reminder_message,
-                        metadata={
-                            "task_id": str(task_id),
-                            "user_id": user_id,
-                            "reminder_type": "CALL"
-                        }
-                    )
-                    
-                    # Schedule new SMS reminder
-                    sms_reminder_time = task_update.reminder_time + timedelta(minutes=5)
-                    scheduler.schedule_one_time_job(
-                        func=send_sms,
-                        run_at=sms_reminder_time,
-                        job_id=f"task_reminder_sms_{task_id}",
-                        to_number=user_phone,
-                        message=reminder_message,
-                        metadata={
-                            "task_id": str(task_id),
-                            "user_id": user_id,
-                            "reminder_type": "SMS"
-                        }
+                    # Call first, SMS only if the call doesn't reach them
+                    rescheduled = scheduler.reschedule(
+                        JobSpec(
+                            job_id=f"task_reminder_{task_id}",
+                            job_type=JobType.NOTIFICATION,
+                            func=escalate_reminder,
+                            run_date=task_update.reminder_time,
+                            metadata=escalation_payload(user_phone, "task_due", user_id, task_id=task_id)
+                        )
                     )
+                    if not rescheduled.scheduled:
+                        raise HTTPException(
+                            status_code=409 if rescheduled.error == "job is running" else 500,
+                            detail=f"Failed to reschedule reminder: {rescheduled.error}"
+                        )
 
         # Update task
         response = supabase.table("tasks").update(
@@ -288,6 +286,8 @@ async def update_task(
             
         return Task(**response.data[0])
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to update task: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -446,16 +446,12 @@ async def schedule_hello_world():
         # Schedule for 30 seconds from now
         run_time = datetime.now(pytz.UTC) + timedelta(seconds=20)
         
-        metadata = {
-            "test_data": "This is a test job",
-            "scheduled_for": run_time.isoformat()
-        }
-        
+        # run_at is already stored on the job row; keep the payload to what the function needs
         job = scheduler.schedule_one_time_job(
             func=print_hello_world,  # Using the async function
             run_at=run_time,
             job_id=f"hello_world_{datetime.now().timestamp()}",
-            **metadata
+            test_data="This is a test job"
         )
         
         return {
@@ -468,27 +464,126 @@ async def schedule_hello_world():
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics")
+async def get_metrics():
+    """Outbound queue depth, wait times and send outcomes"""
+    return metrics_registry.snapshot()
+
+@app.get("/jobs/dead-letter")
+async def list_dead_letter_jobs(
+    limit: int = Query(100, ge=1, le=1000),
+    job_type: Optional[str] = None
+):
+    """List jobs that exhausted their retries"""
+    dead_letters = await asyncio.to_thread(scheduler.list_dead_letters, limit, job_type)
+    return {"data": dead_letters, "count": len(dead_letters)}
+
+@app.post("/jobs/dead-letter/replay")
+async def replay_dead_letter_jobs(request: DeadLetterReplayRequest):
+    """Reschedule dead-lettered jobs with a fresh retry budget"""
+    replayed = await asyncio.to_thread(scheduler.replay_dead_letters, request.job_ids, request.run_at)
+    return {
+        "replayed": replayed,
+        "not_found": [job_id for job_id in request.job_ids if job_id not in replayed]
+    }
+
+def _job_status_response(status: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": status["job_id"],
+        "status": status["status"],
+        "scheduled_for": status["run_date"],
+        "retry_count": status["retry_count"],
+        "last_error": status["last_error"]
+    }
+
+@app.post("/jobs/status")
+async def get_job_statuses(request: JobStatusRequest):
+    """Check the status of many jobs in one call"""
+    statuses = await scheduler.get_job_statuses(request.job_ids)
+    return {
+        "data": {job_id: _job_status_response(status) for job_id, status in statuses.items()},
+        "not_found": [job_id for job_id in request.job_ids if job_id not in statuses]
+    }
+
 @app.get("/jobs/{job_id}")
-async def get_job_status(job_id: str):
+async def get_job_status(job_id: str, include_metadata: bool = False):
     """Check the status of a scheduled job"""
-    job = scheduler.get_job(job_id)
-    if not job:
+    # Served from the scheduler's job index; storage is only read on a miss
+    status = await scheduler.get_job_status(job_id)
+    if not status:
         raise HTTPException(
             status_code=404,
             detail=f"Job {job_id} not found"
         )
     
-    return {
-        "job_id": job.job_id,
-        "status": job.status,
-        "scheduled_for": job.run_date,
-        "metadata": job.metadata
-    }
+    response = _job_status_response(status)
+    if include_metadata:
+        job = await asyncio.to_thread(scheduler.get_job, job_id)
+        response["metadata"] = job.metadata if job else None
+    return response
+
+@app.post("/campaigns")
+async def create_campaign(request: CallCampaignCreate):
+    """Start calling a list of recipients from one call template"""
+    try:
+        return campaigns.create(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/campaigns")
+async def list_campaigns():
+    return {"data": campaigns.list()}
+
+@app.get("/campaigns/{campaign_id}")
+async def get_campaign(campaign_id: str, include_results: bool = True):
+    """Campaign progress, with each recipient's result"""
+    state = campaigns.get(campaign_id, include_results)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+    return state
+
+@app.post("/campaigns/{campaign_id}/{action}")
+async def control_campaign(campaign_id: str, action: Literal["pause", "resume", "cancel"]):
+    """Pause, resume or cancel a campaign"""
+    state = getattr(campaigns, action)(campaign_id)
+    if state is None:
+        raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+    return state
+
+@app.post("/callbacks/twilio/sms", status_code=204)
+async def twilio_sms_status(request: Request):
+    """Twilio message status callback; buffered and written in batches"""
+    form = dict(parse_qsl((await request.body()).decode()))
+    send_key = request.query_params.get(SEND_KEY_PARAM)
+    if sms_sender.auth_token:
+        # Twilio signs the exact URL it was given, which may differ from ours behind a proxy
+        url = sms_sender.status_callback_url(send_key) or str(request.url)
+        signature = request.headers.get("X-Twilio-Signature", "")
+        if not RequestValidator(sms_sender.auth_token).validate(url, form, signature):
+            raise HTTPException(status_code=403, detail="Invalid Twilio signature")
+    update = twilio_sms_update(form)
+    if update is not None:
+        update.send_key = send_key
+        delivery_tracker.record(update)
+        if send_key:
+            outbox_relay.link(send_key, update.external_id)
+
+@app.post("/callbacks/vapi", status_code=204)
+async def vapi_call_status(request: Request):
+    """Vapi status-update and end-of-call-report messages for outbound calls"""
+    secret = caller.config.server_secret
+    if secret and not hmac.compare_digest(request.headers.get("X-Vapi-Secret", ""), secret):
+        raise HTTPException(status_code=403, detail="Invalid Vapi secret")
+    update = vapi_update(await request.json())
+    if update is not None:
+        delivery_tracker.record(update)
+        if update.send_key:
+            outbox_relay.link(update.send_key, update.external_id)
 
 @app.post("/test/call")
 async def test_call():
     try:
-        result = caller.make_simple_call(
+        result = await caller.make_simple_call_async(
             "+12045906645", 
             "Hello! This is a test message."
         )
@@ -503,24 +598,13 @@ async def schedule_test_call(delay_seconds: int = 20):
         # Schedule for specified seconds from now
         run_time = datetime.now(pytz.UTC) + timedelta(seconds=delay_seconds)
         
-        # Separate metadata from function arguments
-        metadata = {
-            "scheduled_for": run_time.isoformat(),
-            "job_type": "test_call"
-        }
-        
-        # Function-specific arguments
-        call_args = {
-            "to_number": "+12045906645",  # Hardcoded test number
-            "message": "Hello! This is a scheduled test call from your AI assistant."
-        }
-        
+        # Only the call's arguments are stored; the run time is on the job row
         job = scheduler.schedule_one_time_job(
-            func=caller.make_simple_call,
+            func=caller.make_simple_call_async,
             run_at=run_time,
             job_id=f"test_call_{datetime.now().timestamp()}",
-            **call_args,  # Function arguments
-            metadata=metadata  # Separate metadata
+            to_number="+12045906645",  # Hardcoded test number
+            message="Hello! This is a scheduled test call from your AI assistant."
         )
         
         return {
@@ -661,16 +745,22 @@ async def create_event(
         
         # Schedule reminders if specified
         if event.reminder_times:
-            for minutes in event.reminder_times:
-                reminder_time = event.start_time - timedelta(minutes=minutes)
-                scheduler.schedule_one_time_job(
-                    func=send_sms,
-                    run_at=reminder_time,
+            scheduler.schedule_many([
+                JobSpec(
                     job_id=f"event_reminder_{created_event.id}_{minutes}",
-                    to_number=event.attendees[0].phone_number,  # Primary attendee
-                    message=f"🎂 Reminder: {event.title} starts in {minutes} minutes!",
-                    metadata={"event_id": str(created_event.id)}
+                    job_type=JobType.EVENT_REMINDER,
+                    func=dispatch_reminder,
+                    run_date=event.start_time - timedelta(minutes=minutes),
+                    metadata=reminder_payload(
+                        "sms",
+                        event.attendees[0].phone_number,  # Primary attendee
+                        "event_starts",
+                        event_id=created_event.id,
+                        minutes=minutes
+                    )
                 )
+                for minutes in event.reminder_times
+            ])
         
         return created_event
     except Exception as e:
@@ -0,0 +1,186 @@
+import bisect
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; suits queue waits, firing lag and send latency alike
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str):
+        self.name = name
+        self.description = description
+        self._lock = threading.Lock()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            series = [{"labels": dict(key), **self._series_snapshot(value)} for key, value in self._series.items()]
+        return {"type": self.kind, "description": self.description, "series": series}
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. sends by outcome"""
+    kind = "counter"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._series: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._series.get(_label_key(labels), 0)
+
+    @staticmethod
+    def _series_snapshot(value: float) -> Dict[str, Any]:
+        return {"value": value}
+
+
+class Gauge(_Metric):
+    """Point-in-time value, e.g. queue depth"""
+    kind = "gauge"
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, description)
+        self._series: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._series[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._series.get(_label_key(labels), 0)
+
+    @staticmethod
+    def _series_snapshot(value: float) -> Dict[str, Any]:
+        return {"value": value}
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "count", "sum", "max", "recent")
+
+    def __init__(self, buckets: int, recent: int):
+        self.counts = [0] * (buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.recent: Deque[float] = deque(maxlen=recent)
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observations, e.g. wait times.
+
+    Keeps cumulative bucket counts plus a bounded window of recent samples so
+    snapshots can report current percentiles without unbounded memory.
+    """
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        recent: int = 1024
+    ):
+        super().__init__(name, description)
+        self.buckets = tuple(sorted(buckets))
+        self.recent = recent
+        self._series: Dict[LabelKey, _HistogramSeries] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets), self.recent)
+            series.counts[bisect.bisect_left(self.buckets, value)] += 1
+            series.count += 1
+            series.sum += value
+            series.max = max(series.max, value)
+            series.recent.append(value)
+
+    def percentile(self, q: float, **labels) -> Optional[float]:
+        """q-th percentile (0-100) of the recent samples for a label set"""
+        series = self._series.get(_label_key(labels))
+        if series is None or not series.recent:
+            return None
+        return _percentile(sorted(series.recent), q)
+
+    def _series_snapshot(self, series: _HistogramSeries) -> Dict[str, Any]:
+        recent = sorted(series.recent)
+        cumulative, buckets = 0, {}
+        for bound, count in zip(self.buckets, series.counts):
+            cumulative += count
+            buckets[str(bound)] = cumulative
+        buckets["+Inf"] = series.count
+        return {
+            "count": series.count,
+            "sum": series.sum,
+            "max": series.max,
+            "p50": _percentile(recent, 50),
+            "p95": _percentile(recent, 95),
+            "p99": _percentile(recent, 99),
+            "buckets": buckets
+        }
+
+
+def _percentile(ordered: List[float], q: float) -> Optional[float]:
+    if not ordered:
+        return None
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class MetricsRegistry:
+    """Named metrics for the process; get-or-create so modules can share them"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, description: str, **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, description, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, description: str = "") -> Counter:
+        return self._get(Counter, name, description)
+
+    def gauge(self, name: str, description: str = "") -> Gauge:
+        return self._get(Gauge, name, description)
+
+    def histogram(self, name: str, description: str = "", **kwargs) -> Histogram:
+        return self._get(Histogram, name, description, **kwargs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+
+registry = MetricsRegistry()
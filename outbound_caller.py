@@ -1,7 +1,10 @@
 import os
+from typing import Optional
 from loguru import logger
 from dotenv import load_dotenv
-import requests
+from pydantic import BaseModel
+from circuit_breaker import CircuitBreaker
+import httpx
 
 # Load environment variables from .env.local
 load_dotenv('.env.local')
@@ -64,11 +67,64 @@ DEFAULT_VOICEMAIL_CONFIG = {
     ]
 }
 
+SIMPLE_CALL_SYSTEM_PROMPT = "You are a professional assistant with a warm, caring personality. Speak naturally with brief pauses. Always acknowledge the person's responses and be helpful and courteous."
+
+APPOINTMENT_SYSTEM_PROMPT = "You are Sarah, a professional medical office scheduler. You have a warm, caring personality and speak naturally with brief pauses. Always acknowledge the person's responses. If they're busy, offer to call back later. Key tasks: 1) Confirm they're the right person 2) Briefly explain you're calling about their appointment 3) Work with their schedule to find a suitable time 4) Verify their information. Use conversational language like 'Great, let me check that for you' or 'I understand, would afternoon work better for you?'"
+
+APPOINTMENT_END_CALL_MESSAGE = "Perfect, I've got your appointment scheduled. You'll receive a confirmation shortly. Thank you for your time, and have a great rest of your day!"
+
+APPOINTMENT_END_CALL_PHRASES = [
+    "I'll send that confirmation right over. Have a great day!",
+    "You're all set for your appointment. Have a wonderful day!",
+    "Thank you for your time today, goodbye!"
+]
+
+def _vapi_unhealthy(error: Exception) -> bool:
+    """Timeouts, connection errors and 5xx count against Vapi's circuit; 4xx and 429 don't"""
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code >= 500
+    return isinstance(error, httpx.TransportError)
+
+def _vapi_not_sent(error: Exception) -> bool:
+    """Starting a call isn't idempotent, so only retry when the request never reached Vapi"""
+    return isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout))
+
+class OutboundCallerConfig(BaseModel):
+    """HTTP client settings for requests to Vapi"""
+    connect_timeout: float = float(os.getenv("VAPI_CONNECT_TIMEOUT", "3"))
+    read_timeout: float = float(os.getenv("VAPI_READ_TIMEOUT", "10"))
+    # Longest wait for a free pooled connection before giving up
+    pool_timeout: float = float(os.getenv("VAPI_POOL_TIMEOUT", "5"))
+    max_connections: int = int(os.getenv("VAPI_MAX_CONNECTIONS", "10"))
+    # Keep every pooled connection alive so bursts of calls reuse them
+    max_keepalive_connections: int = int(os.getenv("VAPI_MAX_CONNECTIONS", "10"))
+    keepalive_expiry: float = 30.0  # Seconds an idle connection is kept open
+    # Public URL of POST /callbacks/vapi; Vapi sends call status and end-of-call reports there
+    server_url: Optional[str] = os.getenv("VAPI_SERVER_URL")
+    server_secret: Optional[str] = os.getenv("VAPI_SERVER_SECRET")
+
 class OutboundCaller:
-    def __init__(self):
+    """
+    Starts outbound calls through Vapi.
+
+    Requests go through one pooled HTTP client per caller, so calls reuse
+    kept-alive TCP/TLS connections instead of opening one each time. The
+    async client is created by start() (in the app lifespan) or on first
+    use, and closed by aclose(). make_simple_call is a blocking shim for
+    code running outside the event loop, with its own small sync pool.
+
+    Both pools share one circuit breaker, so while Vapi is timing out or
+    returning 5xx, calls fail fast with CircuitOpenError instead of each
+    waiting out its timeouts.
+    """
+    def __init__(self, config: Optional[OutboundCallerConfig] = None):
+        self.config = config or OutboundCallerConfig()
         self.api_token = VAPI_BEARER_TOKEN
         self.api_url = VAPI_API_OUTBOUND_CALL_URL
         self.from_number = TWILIO_PHONE_NUMBER
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sync_client: Optional[httpx.Client] = None
+        self.breaker = CircuitBreaker("vapi_call", _vapi_unhealthy)
         
         # Default configuration parameters
         self.default_config = {
@@ -78,6 +134,56 @@ class OutboundCaller:
             "timing": DEFAULT_TIMING_CONFIG,
             "voicemail": DEFAULT_VOICEMAIL_CONFIG
         }
+
+    def _client_options(self) -> dict:
+        config = self.config
+        return {
+            "headers": {
+                "Authorization": f"Bearer {self.api_token}",
+                "Content-Type": "application/json"
+            },
+            "timeout": httpx.Timeout(config.read_timeout, connect=config.connect_timeout, pool=config.pool_timeout),
+            "limits": httpx.Limits(
+                max_connections=config.max_connections,
+                max_keepalive_connections=config.max_keepalive_connections,
+                keepalive_expiry=config.keepalive_expiry
+            )
+        }
+
+    async def start(self) -> None:
+        """Open the pooled async client; call once at startup"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(**self._client_options())
+
+    async def aclose(self) -> None:
+        """Close both pools; call once at shutdown"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        if self._sync_client is not None:
+            self._sync_client.close()
+            self._sync_client = None
+
+    async def _post_call(self, call_config: dict) -> dict:
+        await self.start()
+
+        async def post() -> dict:
+            response = await self._client.post(self.api_url, json=call_config)
+            response.raise_for_status()  # Raises an HTTPError for bad responses
+            return response.json()
+
+        return await self.breaker.call(post, retry_if=_vapi_not_sent)
+
+    def _post_call_sync(self, call_config: dict) -> dict:
+        if self._sync_client is None:
+            self._sync_client = httpx.Client(**self._client_options())
+
+        def post() -> dict:
+            response = self._sync_client.post(self.api_url, json=call_config)
+            response.raise_for_status()
+            return response.json()
+
+        return self.breaker.call_blocking(post, retry_if=_vapi_not_sent)
     
     def _create_call_config(self, 
                            to_number: str,
@@ -124,7 +230,8 @@ class OutboundCaller:
                 "voicemailDetection": kwargs.get("voicemail", self.default_config["voicemail"]),
                 "voicemailMessage": voicemail_message,
                 "endCallMessage": end_call_message,
-                "endCallPhrases": end_call_phrases
+                "endCallPhrases": end_call_phrases,
+                **self._server_options(kwargs.get("send_key"))
             },
             "phoneNumber": {
                 "twilioPhoneNumber": self.from_number,
@@ -136,29 +243,52 @@ class OutboundCaller:
             }
         }
 
-    def make_simple_call(self, to_number: str, message: str, **kwargs) -> str:
+    def _server_options(self, send_key: Optional[str] = None) -> dict:
+        if not self.config.server_url:
+            return {}
+        options = {
+            "serverUrl": self.config.server_url,
+            "serverMessages": ["status-update", "end-of-call-report"]
+        }
+        if self.config.server_secret:
+            options["serverUrlSecret"] = self.config.server_secret
+        if send_key:
+            # Comes back with the call in server messages (outbox send key)
+            options["metadata"] = {"send_key": send_key}
+        return options
+
+    def _simple_call_config(self, to_number: str, message: str, **kwargs) -> dict:
+        return self._create_call_config(
+            to_number=to_number,
+            name="Simple Outbound Call",
+            first_message=message,
+            system_prompt=SIMPLE_CALL_SYSTEM_PROMPT,
+            **kwargs
+        )
+
+    async def make_simple_call_async(self, to_number: str, message: str, **kwargs) -> str:
         """
-        Make a simple outbound call with a custom message
+        Make a simple outbound call with a custom message, without blocking the event loop
         """
         logger.info(f"Initiating simple call to {to_number}")
         try:
-            call_config = self._create_call_config(
-                to_number=to_number,
-                name="Simple Outbound Call",
-                first_message=message,
-                system_prompt="You are a professional assistant with a warm, caring personality. Speak naturally with brief pauses. Always acknowledge the person's responses and be helpful and courteous.",
-                **kwargs
-            )
-            
-            headers = {
-                "Authorization": f"Bearer {self.api_token}",
-                "Content-Type": "application/json"
-            }
-            
-            response = requests.post(self.api_url, json=call_config, headers=headers)
-            response.raise_for_status()  # Raises an HTTPError for bad responses
+            data = await self._post_call(self._simple_call_config(to_number, message, **kwargs))
+            call_id = data.get('id', 'unknown')
+            logger.info(f"Call successfully initiated - ID: {call_id}")
+            return f"Call initiated - ID: {call_id}"
             
-            data = response.json()
+        except Exception as e:
+            logger.error(f"Failed to make call to {to_number}: {str(e)}", exc_info=True)
+            return f"Failed to make call: {str(e)}"
+
+    def make_simple_call(self, to_number: str, message: str, **kwargs) -> str:
+        """
+        Make a simple outbound call with a custom message. Blocks until Vapi
+        answers; async code should await make_simple_call_async instead.
+        """
+        logger.info(f"Initiating simple call to {to_number}")
+        try:
+            data = self._post_call_sync(self._simple_call_config(to_number, message, **kwargs))
             call_id = data.get('id', 'unknown')
             logger.info(f"Call successfully initiated - ID: {call_id}")
             return f"Call initiated - ID: {call_id}"
@@ -167,6 +297,19 @@ class OutboundCaller:
             logger.error(f"Failed to make call to {to_number}: {str(e)}", exc_info=True)
             return f"Failed to make call: {str(e)}"
 
+    async def place_call(self, to_number: str, name: str, first_message: str, system_prompt: str, **kwargs) -> dict:
+        """
+        Start a call with a custom assistant and return Vapi's call object.
+        Unlike make_simple_call_async, failures raise instead of returning text.
+        """
+        return await self._post_call(self._create_call_config(
+            to_number=to_number,
+            name=name,
+            first_message=first_message,
+            system_prompt=system_prompt,
+            **kwargs
+        ))
+
     def make_appointment_call(self, to_number: str, office_name: str = "Dr. Johnson's office", **kwargs) -> str:
         """
         Make an appointment scheduling call with comprehensive configuration
@@ -179,27 +322,25 @@ class OutboundCaller:
                 to_number=to_number,
                 name="Professional Appointment Booking Call",
                 first_message=first_message,
-                system_prompt="You are Sarah, a professional medical office scheduler. You have a warm, caring personality and speak naturally with brief pauses. Always acknowledge the person's responses. If they're busy, offer to call back later. Key tasks: 1) Confirm they're the right person 2) Briefly explain you're calling about their appointment 3) Work with their schedule to find a suitable time 4) Verify their information. Use conversational language like 'Great, let me check that for you' or 'I understand, would afternoon work better for you?'",
+                system_prompt=APPOINTMENT_SYSTEM_PROMPT,
                 voicemail_message=voicemail_message,
-                end_call_message="Perfect, I've got your appointment scheduled. You'll receive a confirmation shortly. Thank you for your time, and have a great rest of your day!",
-                end_call_phrases=[
-                    "I'll send that confirmation right over. Have a great day!",
-                    "You're all set for your appointment. Have a wonderful day!",
-                    "Thank you for your time today, goodbye!"
-                ],
+                end_call_message=APPOINTMENT_END_CALL_MESSAGE,
+                end_call_phrases=APPOINTMENT_END_CALL_PHRASES,
                 assistant_name="Appointment Scheduler",
                 **kwargs
             )
             
-            response = self.vapi_client.create_call(call_config)
+            response = self._post_call_sync(call_config)
             return f"Appointment call initiated - ID: {response.get('id', 'unknown')}"
             
         except Exception as e:
             logger.error(f"Appointment call failed: {str(e)}")
             return f"Failed to make appointment call: {str(e)}"
 
+# Shared caller; the app opens and closes its connection pool in the lifespan
+caller = OutboundCaller()
+
 # # Example usage:
-# caller = OutboundCaller()
 
 # # Make a simple call
 # result = caller.make_simple_call(
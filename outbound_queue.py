@@ -0,0 +1,358 @@
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from pydantic import BaseModel, Field
+from dotenv import load_dotenv
+from twilio_sms import SmsResult, sms_sender
+from metrics import registry
+import asyncio
+import logging
+import os
+import time
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+# Provider responses that mean "slow down" rather than "this send is bad"
+RATE_LIMIT_MARKERS = ("429", "Too Many Requests")
+
+QUEUE_DEPTH = registry.gauge("outbound_queue_depth", "Sends waiting for a rate-limit token")
+IN_FLIGHT = registry.gauge("outbound_in_flight", "Sends currently talking to a provider")
+QUEUE_WAIT = registry.histogram("outbound_queue_wait_seconds", "Time from submit to send start")
+SEND_TIME = registry.histogram("outbound_send_seconds", "Provider call duration")
+SENDS = registry.counter("outbound_sends_total", "Send attempts by outcome")
+
+
+class OutboundSendError(Exception):
+    """A provider reported a failed send"""
+
+
+class ChannelLimits(BaseModel):
+    """Rate limits for one outbound channel"""
+    provider: str
+    provider_rate: float  # sends per second across every sender number
+    provider_burst: int
+    sender_rate: float  # sends per second from a single sender number
+    sender_burst: int = 1
+    max_concurrency: int = 5
+    max_rate_limit_retries: int = 3
+
+
+def _default_channels() -> Dict[str, ChannelLimits]:
+    return {
+        # Twilio long codes take about 1 message per second each
+        "sms": ChannelLimits(
+            provider="twilio",
+            provider_rate=30,
+            provider_burst=30,
+            sender_rate=float(os.getenv("OUTBOUND_SMS_PER_NUMBER_RATE", "1")),
+            max_concurrency=10
+        ),
+        # Calls start through Vapi on the Twilio number (1 call per second by default)
+        "call": ChannelLimits(
+            provider="vapi",
+            provider_rate=5,
+            provider_burst=5,
+            sender_rate=float(os.getenv("OUTBOUND_CALL_PER_NUMBER_RATE", "1")),
+            max_concurrency=5
+        )
+    }
+
+
+class OutboundQueueConfig(BaseModel):
+    channels: Dict[str, ChannelLimits] = Field(default_factory=_default_channels)
+    default_from_number: Optional[str] = Field(default_factory=lambda: os.getenv("TWILIO_PHONE_NUMBER"))
+
+
+class TokenBucket:
+    """Classic token bucket: rate tokens per second, holding at most capacity"""
+    __slots__ = ("rate", "capacity", "tokens", "updated", "clock")
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available; 0 if one is available now"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def penalize(self, seconds: float) -> None:
+        """Hold the bucket empty for seconds, e.g. after the provider pushed back"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class _OutboundRequest:
+    __slots__ = ("channel", "to_number", "message", "from_number", "user_key", "kwargs", "future", "enqueued_at", "attempts")
+
+    def __init__(self, channel, to_number, message, from_number, user_key, kwargs, future, enqueued_at):
+        self.channel = channel
+        self.to_number = to_number
+        self.message = message
+        self.from_number = from_number
+        self.user_key = user_key
+        self.kwargs = kwargs
+        self.future = future
+        self.enqueued_at = enqueued_at
+        self.attempts = 0
+
+
+class _ChannelState:
+    """Pending sends for one channel, one FIFO per user served round-robin"""
+
+    def __init__(self, limits: ChannelLimits):
+        self.limits = limits
+        self.users: "OrderedDict[str, Deque[_OutboundRequest]]" = OrderedDict()
+        self.depth = 0
+        self.wake = asyncio.Event()
+        self.slots = asyncio.Semaphore(limits.max_concurrency)
+        self.dispatcher: Optional[asyncio.Task] = None
+
+
+class OutboundDispatchQueue:
+    """
+    Throttled delivery for outbound SMS and calls.
+
+    Each channel has a token bucket for its provider and one per sender
+    number; a send starts only when both have a token. Pending sends are kept
+    per user and served round-robin, so one user with many reminders can't
+    hold up everyone else. At most max_concurrency sends per channel talk to
+    the provider at once. Rate-limit responses put the send back at the front
+    of its user's queue and pause that sender number with backoff.
+    """
+
+    def __init__(self, config: Optional[OutboundQueueConfig] = None, clock: Callable[[], float] = time.monotonic):
+        self.config = config or OutboundQueueConfig()
+        self.clock = clock
+        self._senders: Dict[str, Callable] = {}
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._channels: Dict[str, _ChannelState] = {}
+        self._deliveries: set = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def register_sender(self, channel: str, func: Callable) -> None:
+        """Set the provider function for a channel: func(to_number, message, **kwargs)"""
+        if channel not in self.config.channels:
+            raise ValueError(f"No rate limits configured for outbound channel: {channel}")
+        self._senders[channel] = func
+
+    def sender(self, channel: str) -> Callable:
+        """Async send function for channel that goes through the queue"""
+        async def send(to_number: str, message: str, **kwargs) -> Any:
+            return await self.submit(channel, to_number, message, **kwargs)
+        send.__name__ = f"queued_{channel}"
+        return send
+
+    async def submit(
+        self,
+        channel: str,
+        to_number: str,
+        message: str,
+        from_number: Optional[str] = None,
+        user_key: Optional[str] = None,
+        **kwargs
+    ) -> Any:
+        """Queue a send and wait for the provider's result"""
+        if channel not in self._senders:
+            raise ValueError(f"No sender registered for outbound channel: {channel}")
+        state = self._channel(channel)
+        request = _OutboundRequest(
+            channel,
+            to_number,
+            message,
+            from_number or self.config.default_from_number,
+            user_key or to_number,
+            kwargs,
+            asyncio.get_running_loop().create_future(),
+            self.clock()
+        )
+        queue = state.users.get(request.user_key)
+        if queue is None:
+            queue = state.users[request.user_key] = deque()
+        queue.append(request)
+        state.depth += 1
+        QUEUE_DEPTH.set(state.depth, channel=channel)
+        state.wake.set()
+        return await request.future
+
+    def depth(self, channel: str) -> int:
+        state = self._channels.get(channel)
+        return state.depth if state else 0
+
+    async def stop(self) -> None:
+        """Stop dispatching and fail anything still waiting"""
+        for channel, state in self._channels.items():
+            if state.dispatcher is not None:
+                state.dispatcher.cancel()
+            for queue in state.users.values():
+                for request in queue:
+                    if not request.future.done():
+                        request.future.set_exception(RuntimeError("Outbound queue stopped"))
+            state.users.clear()
+            state.depth = 0
+            QUEUE_DEPTH.set(0, channel=channel)
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+        self._channels.clear()
+        self._loop = None
+
+    # Dispatch
+
+    def _channel(self, channel: str) -> _ChannelState:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Events and semaphores belong to one loop; start over on a new one
+            self._channels.clear()
+            self._loop = loop
+        state = self._channels.get(channel)
+        if state is None:
+            state = self._channels[channel] = _ChannelState(self.config.channels[channel])
+            state.dispatcher = loop.create_task(self._dispatch(channel, state))
+        return state
+
+    def _bucket(self, kind: str, key: str, rate: float, burst: int) -> TokenBucket:
+        bucket = self._buckets.get((kind, key))
+        if bucket is None:
+            bucket = self._buckets[(kind, key)] = TokenBucket(rate, burst, self.clock)
+        return bucket
+
+    def _sender_bucket(self, state: _ChannelState, request: _OutboundRequest) -> TokenBucket:
+        limits = state.limits
+        return self._bucket(f"{request.channel}:sender", request.from_number or "", limits.sender_rate, limits.sender_burst)
+
+    def _next_ready(self, state: _ChannelState) -> Tuple[Optional[_OutboundRequest], Optional[float]]:
+        """Pop the next sendable request in round-robin user order, or the shortest wait"""
+        limits = state.limits
+        provider = self._bucket("provider", limits.provider, limits.provider_rate, limits.provider_burst)
+        provider_wait = provider.wait_time()
+        if provider_wait > 0:
+            return None, provider_wait
+
+        shortest = None
+        for user_key in list(state.users):
+            queue = state.users[user_key]
+            request = queue[0]
+            sender = self._sender_bucket(state, request)
+            wait = sender.wait_time()
+            if wait > 0:
+                shortest = wait if shortest is None else min(shortest, wait)
+                continue
+            provider.take()
+            sender.take()
+            queue.popleft()
+            if queue:
+                state.users.move_to_end(user_key)
+            else:
+                del state.users[user_key]
+            state.depth -= 1
+            QUEUE_DEPTH.set(state.depth, channel=request.channel)
+            return request, None
+        return None, shortest
+
+    async def _dispatch(self, channel: str, state: _ChannelState) -> None:
+        while True:
+            await state.slots.acquire()
+            state.wake.clear()
+            request, wait = self._next_ready(state)
+            if request is None:
+                state.slots.release()
+                try:
+                    await asyncio.wait_for(state.wake.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            task = asyncio.get_running_loop().create_task(self._deliver(state, request))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+            task.add_done_callback(lambda _: state.slots.release())
+
+    async def _deliver(self, state: _ChannelState, request: _OutboundRequest) -> None:
+        channel = request.channel
+        QUEUE_WAIT.observe(self.clock() - request.enqueued_at, channel=channel)
+        IN_FLIGHT.inc(channel=channel)
+        started = self.clock()
+        try:
+            result, error = await self._call_sender(request), None
+        except Exception as e:
+            result, error = None, e
+        finally:
+            IN_FLIGHT.dec(channel=channel)
+            SEND_TIME.observe(self.clock() - started, channel=channel)
+
+        outcome = error if error is not None else result
+        if _is_rate_limited(outcome) and request.attempts < state.limits.max_rate_limit_retries:
+            request.attempts += 1
+            backoff = 2 ** request.attempts
+            SENDS.inc(channel=channel, outcome="rate_limited")
+            logger.warning(f"{state.limits.provider} rate-limited {channel} from {request.from_number}; retrying in {backoff}s")
+            self._sender_bucket(state, request).penalize(backoff)
+            self._requeue(state, request)
+            return
+
+        failure = error or _failure_message(result)
+        if failure is not None:
+            SENDS.inc(channel=channel, outcome="failed")
+            if not request.future.done():
+                request.future.set_exception(
+                    failure if isinstance(failure, Exception) else OutboundSendError(failure)
+                )
+            return
+        SENDS.inc(channel=channel, outcome="sent")
+        if not request.future.done():
+            request.future.set_result(result)
+
+    def _requeue(self, state: _ChannelState, request: _OutboundRequest) -> None:
+        queue = state.users.get(request.user_key)
+        if queue is None:
+            queue = state.users[request.user_key] = deque()
+        queue.appendleft(request)
+        state.users.move_to_end(request.user_key, last=False)
+        state.depth += 1
+        QUEUE_DEPTH.set(state.depth, channel=request.channel)
+        state.wake.set()
+
+    async def _call_sender(self, request: _OutboundRequest) -> Any:
+        sender = self._senders[request.channel]
+        kwargs = dict(request.kwargs)
+        if request.channel == "sms" and request.from_number:
+            kwargs.setdefault("from_number", request.from_number)
+        if asyncio.iscoroutinefunction(sender):
+            return await sender(request.to_number, request.message, **kwargs)
+        return await asyncio.to_thread(sender, request.to_number, request.message, **kwargs)
+
+
+def _failure_message(result: Any) -> Optional[str]:
+    """SMS senders and make_simple_call report failures in their return value"""
+    if isinstance(result, SmsResult):
+        return None if result.ok else result.error_message or "send failed"
+    if isinstance(result, dict) and result.get("error"):
+        return str(result.get("message", "send failed"))
+    if isinstance(result, str) and result.startswith("Failed"):
+        return result
+    return None
+
+
+def _is_rate_limited(outcome: Any) -> bool:
+    text = str(outcome) if isinstance(outcome, Exception) else _failure_message(outcome)
+    return bool(text) and any(marker in text for marker in RATE_LIMIT_MARKERS)
+
+
+outbound_queue = OutboundDispatchQueue()
+# Calls need an OutboundCaller instance; main.py registers the "call" sender
+outbound_queue.register_sender("sms", sms_sender.send)
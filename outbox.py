@@ -0,0 +1,268 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from job_store import JobStore
+from metrics import registry
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+import pytz
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SENDS = registry.counter("outbox_sends_total", "Outbox sends by channel and outcome (sent, retry, failed)")
+OUTBOX_IN_FLIGHT = registry.gauge("outbox_in_flight", "Outbox sends claimed by this relay and not yet settled")
+OUTBOX_LAG = registry.histogram("outbox_lag_seconds", "Time from a send being queued to the provider accepting it")
+OUTBOX_LINKED = registry.counter("outbox_linked_total", "Sends marked sent from a provider callback's send key")
+
+# Sends the relay sends: (channel, to_number, bodies, send_key, job_ids) -> provider id
+OutboxSend = Callable[[str, str, List[str], str, List[str]], Awaitable[Optional[str]]]
+
+
+class OutboxMessage(BaseModel):
+    """
+    A send for a job to return instead of sending it itself. The scheduler
+    queues it in the same write that completes the job, and the outbox relay
+    sends it.
+    """
+    channel: str
+    to_number: str
+    body: str
+    # Hold the send back this long so others due for the same recipient join it
+    delay_seconds: float = 0
+
+
+def outbox_rows(job_id: str, result: Any, occurrence: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """
+    outbound_outbox rows for what a job returned; none unless it returned
+    OutboxMessages. Dedup keys come from the job id and the run it was
+    scheduled for (its next_run), so running the same occurrence again
+    queues nothing new, while a job id reused for a later run, such as a
+    rescheduled reminder or the next occurrence of a recurring job, does.
+    """
+    messages = result if isinstance(result, list) else [result]
+    messages = [message for message in messages if isinstance(message, OutboxMessage)]
+    prefix = job_id if occurrence is None else f"{job_id}@{occurrence.isoformat()}"
+    now = datetime.now(pytz.UTC)
+    return [
+        {
+            "dedup_key": f"{prefix}#{index}",
+            "job_id": job_id,
+            "channel": message.channel,
+            "to_number": message.to_number,
+            "body": message.body,
+            "available_at": now + timedelta(seconds=message.delay_seconds)
+        }
+        for index, message in enumerate(messages)
+    ]
+
+
+def _parse_timestamp(value: Any) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is None:
+        value = pytz.UTC.localize(value)
+    return value
+
+
+class OutboxRelay:
+    """
+    Sends what jobs queued in the outbox.
+
+    Due sends are claimed under a lease, at most max_in_flight at a time, and
+    grouped by recipient and channel; each group goes out as one message or
+    call through send(channel, to_number, bodies, send_key, job_ids), which
+    returns the provider id and raises on failure. Leases are renewed while
+    sends wait on rate limits, and outcomes are written back in batches. A
+    failed send is retried with backoff until max_attempts, then marked failed.
+
+    A relay that dies mid-send leaves its sends claimed; once the lease runs
+    out another relay claims them again. The group's send key (its first
+    dedup_key) goes to the provider with the request and comes back in status
+    callbacks, which call link(); linked sends are marked sent instead of
+    going out twice. Without status callbacks configured, a send caught in
+    that window can be sent twice.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        send: OutboxSend,
+        owner: Optional[str] = None,
+        batch_size: int = 200,
+        max_in_flight: int = int(os.getenv("OUTBOX_MAX_IN_FLIGHT", "500")),
+        poll_seconds: float = 1.0,
+        lease_seconds: int = 120,
+        max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5")),
+        retry_base_seconds: float = 30,
+        retry_max_seconds: float = 1800
+    ):
+        self.store = store
+        self.send = send
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.poll_seconds = poll_seconds
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        # dedup_key -> row, from claim until its outcome is written
+        self._claimed: Dict[str, Dict[str, Any]] = {}
+        self._outcomes: List[Dict[str, Any]] = []
+        self._links: Dict[str, str] = {}
+        self._linked: "OrderedDict[str, None]" = OrderedDict()
+        self._sends: set = set()
+        self._renewed_at = 0.0
+        self._wake: Optional[asyncio.Event] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    def link(self, send_key: str, external_id: str) -> None:
+        """Record a provider callback's send key; written on the next pass"""
+        if send_key in self._linked:
+            return
+        self._links[send_key] = external_id
+        self._linked[send_key] = None
+        if len(self._linked) > 10_000:
+            self._linked.popitem(last=False)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self) -> None:
+        if self._runner is not None and not self._runner.done():
+            return
+        self._wake = asyncio.Event()
+        self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """Stop claiming, give sends in progress timeout seconds, and write their outcomes"""
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+        if self._sends:
+            # Sends cut off here stay claimed and are picked up again once their lease runs out
+            _, pending = await asyncio.wait(set(self._sends), timeout=timeout)
+            for task in pending:
+                task.cancel()
+        await self._write_links()
+        await self._write_outcomes()
+
+    async def drain(self) -> int:
+        """One pass: write callback links and outcomes, renew leases, claim and start due sends"""
+        await self._write_links()
+        await self._write_outcomes()
+        await self._renew_leases()
+        claimed = 0
+        while len(self._claimed) < self.max_in_flight:
+            limit = min(self.batch_size, self.max_in_flight - len(self._claimed))
+            rows = await asyncio.to_thread(self.store.claim_outbox, self.owner, self.lease_seconds, limit)
+            for group in self._group(rows):
+                self._start(group)
+            claimed += len(rows)
+            if len(rows) < limit:
+                break
+        OUTBOX_IN_FLIGHT.set(len(self._claimed))
+        return claimed
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.drain()
+            except Exception as e:
+                logger.error(f"Outbox relay pass failed: {e}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def _group(self, rows: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+        for row in rows:
+            self._claimed[row["dedup_key"]] = row
+            groups.setdefault((row["channel"], row["to_number"]), []).append(row)
+        return list(groups.values())
+
+    def _start(self, group: List[Dict[str, Any]]) -> None:
+        task = asyncio.get_running_loop().create_task(self._send_group(group))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send_group(self, group: List[Dict[str, Any]]) -> None:
+        first = group[0]
+        channel, to_number = first["channel"], first["to_number"]
+        job_ids = list(dict.fromkeys(row["job_id"] for row in group if row.get("job_id")))
+        try:
+            external_id = await self.send(channel, to_number, [row["body"] for row in group], first["dedup_key"], job_ids)
+        except Exception as e:
+            for row in group:
+                self._outcomes.append(self._failure(row, e))
+        else:
+            now = datetime.now(pytz.UTC)
+            OUTBOX_SENDS.inc(len(group), channel=channel, outcome="sent")
+            for row in group:
+                created_at = _parse_timestamp(row.get("created_at"))
+                if created_at is not None:
+                    OUTBOX_LAG.observe(max((now - created_at).total_seconds(), 0.0))
+                self._outcomes.append({"dedup_key": row["dedup_key"], "status": "sent", "external_id": external_id})
+        if self._wake is not None:
+            self._wake.set()
+
+    def _failure(self, row: Dict[str, Any], error: Exception) -> Dict[str, Any]:
+        attempts = row.get("attempts") or 1
+        if attempts >= self.max_attempts:
+            OUTBOX_SENDS.inc(channel=row["channel"], outcome="failed")
+            logger.error(f"Outbox send {row['dedup_key']} to {row['to_number']} failed for good after {attempts} attempts: {error}")
+            return {"dedup_key": row["dedup_key"], "status": "failed", "last_error": str(error)}
+        OUTBOX_SENDS.inc(channel=row["channel"], outcome="retry")
+        ceiling = min(self.retry_max_seconds, self.retry_base_seconds * 2 ** (attempts - 1))
+        retry_at = datetime.now(pytz.UTC) + timedelta(seconds=random.uniform(0, ceiling))
+        logger.warning(f"Outbox send {row['dedup_key']} to {row['to_number']} failed (attempt {attempts}); "
+                       f"retrying at {retry_at.isoformat()}: {error}")
+        return {"dedup_key": row["dedup_key"], "status": "pending", "last_error": str(error), "available_at": retry_at}
+
+    async def _write_outcomes(self) -> None:
+        if not self._outcomes:
+            return
+        outcomes, self._outcomes = self._outcomes, []
+        try:
+            await asyncio.to_thread(self.store.settle_outbox, self.owner, outcomes)
+        except Exception as e:
+            logger.error(f"Failed to write {len(outcomes)} outbox outcomes; will retry: {e}")
+            self._outcomes = outcomes + self._outcomes
+            return
+        for outcome in outcomes:
+            self._claimed.pop(outcome["dedup_key"], None)
+        OUTBOX_IN_FLIGHT.set(len(self._claimed))
+
+    async def _write_links(self) -> None:
+        if not self._links:
+            return
+        links, self._links = self._links, {}
+        try:
+            linked = await asyncio.to_thread(self.store.link_outbox_sends, links)
+        except Exception as e:
+            logger.error(f"Failed to write {len(links)} outbox send links; will retry: {e}")
+            self._links = {**links, **self._links}
+            return
+        if linked:
+            OUTBOX_LINKED.inc(linked)
+
+    async def _renew_leases(self) -> None:
+        loop = asyncio.get_running_loop()
+        if not self._claimed or loop.time() - self._renewed_at < self.lease_seconds / 3:
+            return
+        self._renewed_at = loop.time()
+        try:
+            await asyncio.to_thread(self.store.renew_outbox_leases, self.owner, list(self._claimed), self.lease_seconds)
+        except Exception as e:
+            logger.error(f"Failed to renew {len(self._claimed)} outbox leases: {e}")
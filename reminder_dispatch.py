@@ -0,0 +1,194 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dotenv import load_dotenv
+from outbound_queue import outbound_queue
+from reminder_templates import renderer
+from delivery_tracker import delivery_id, tracker
+from outbox import OutboxMessage
+import asyncio
+import logging
+import os
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+# How long the first due reminder for a recipient waits for others to join it
+DEFAULT_COALESCE_SECONDS = float(os.getenv("REMINDER_COALESCE_SECONDS", "30"))
+# Reminder jobs queue their send in the outbox instead of sending it themselves
+OUTBOX_ENABLED = os.getenv("REMINDER_OUTBOX", "true").lower() in ("1", "true", "yes")
+
+
+class _PendingGroup:
+    __slots__ = ("messages", "result")
+
+    def __init__(self, result: asyncio.Future):
+        self.messages: List[str] = []
+        self.result = result
+
+
+def compose_message(channel: str, messages: List[str]) -> str:
+    """Combine several reminders for one recipient into one SMS or call script"""
+    # Keep order, drop exact repeats (e.g. the same reminder scheduled twice)
+    unique = list(dict.fromkeys(messages))
+    if len(unique) == 1:
+        return unique[0]
+    if channel == "call":
+        return f"Hi! I have {len(unique)} reminders for you. " + " Next, ".join(unique)
+    return f"You have {len(unique)} reminders:\n" + "\n".join(f"• {message}" for message in unique)
+
+
+def compose_digest(messages: List[str]) -> str:
+    """One message for reminders missed while the scheduler was down"""
+    unique = list(dict.fromkeys(messages))
+    if len(unique) == 1:
+        return unique[0]
+    return f"You missed {len(unique)} reminders while we were offline:\n" + "\n".join(f"• {message}" for message in unique)
+
+
+class ReminderCoalescer:
+    """
+    Groups due reminders by recipient and channel.
+
+    The first reminder for a (channel, recipient) pair opens a window; every
+    reminder for the same pair that comes due inside it joins the group. When
+    the window closes the group goes out as one composed SMS or one call, and
+    every submitter gets that send's result. A window of 0 sends immediately.
+    """
+
+    def __init__(self, window_seconds: float = DEFAULT_COALESCE_SECONDS):
+        self.window_seconds = window_seconds
+        self._senders: Dict[str, Callable] = {}
+        self._groups: Dict[Tuple[str, str], _PendingGroup] = {}
+        self._flushes: set = set()
+
+    def register_sender(self, channel: str, func: Callable) -> None:
+        """Set the function that delivers a channel: func(to_number, message)"""
+        self._senders[channel] = func
+
+    async def submit(self, channel: str, recipient: str, message: str) -> Any:
+        """Queue a due reminder and wait for the send that covers it"""
+        if self.window_seconds <= 0:
+            return await self._send(channel, recipient, message)
+
+        key = (channel, recipient)
+        group = self._groups.get(key)
+        if group is None:
+            loop = asyncio.get_running_loop()
+            group = _PendingGroup(loop.create_future())
+            self._groups[key] = group
+            loop.call_later(self.window_seconds, self._start_flush, key)
+        group.messages.append(message)
+        return await asyncio.shield(group.result)
+
+    def _start_flush(self, key: Tuple[str, str]) -> None:
+        task = asyncio.get_running_loop().create_task(self._flush(key))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, key: Tuple[str, str]) -> None:
+        group = self._groups.pop(key, None)
+        if group is None:
+            return
+        channel, recipient = key
+        if len(group.messages) > 1:
+            logger.info(f"Coalesced {len(group.messages)} {channel} reminders for {recipient}")
+        try:
+            result = await self._send(channel, recipient, compose_message(channel, group.messages))
+            group.result.set_result(result)
+        except Exception as e:
+            group.result.set_exception(e)
+            # Every submitter sees the error; don't also report it as unretrieved
+            group.result.exception()
+
+    async def _send(self, channel: str, recipient: str, message: str) -> Any:
+        sender = self._senders.get(channel)
+        if sender is None:
+            raise ValueError(f"No sender registered for reminder channel: {channel}")
+        if asyncio.iscoroutinefunction(sender):
+            return await sender(recipient, message)
+        return await asyncio.to_thread(sender, recipient, message)
+
+
+coalescer = ReminderCoalescer()
+# Composed reminders go out through the rate-limited outbound queue
+for _channel in ("sms", "call"):
+    coalescer.register_sender(_channel, outbound_queue.sender(_channel))
+
+
+async def render_reminder(
+    message: Optional[str] = None,
+    template: Optional[str] = None,
+    refs: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    **kwargs
+) -> Optional[str]:
+    """Text for a stored reminder payload; older jobs carry the rendered message"""
+    if template is None:
+        return message
+    return await asyncio.to_thread(renderer.render, template, refs, params)
+
+
+async def reminder_text(
+    message: Optional[str] = None,
+    digest: Optional[List[Dict[str, Any]]] = None,
+    **payload
+) -> Optional[str]:
+    """Text for a due reminder, or a digest of several; None if nothing is left to say"""
+    if digest:
+        texts = [await render_reminder(**item) for item in digest]
+        texts = [text for text in texts if text]
+        return compose_digest(texts) if texts else None
+    return await render_reminder(message, **payload)
+
+
+async def dispatch_reminder(
+    channel: str,
+    to_number: str,
+    message: Optional[str] = None,
+    digest: Optional[List[Dict[str, Any]]] = None,
+    **payload
+) -> Any:
+    """
+    Scheduler job for a due reminder ("sms" or "call"). The text is rendered
+    from its template now, then routed through the coalescer so reminders due
+    together reach the user as one message or call. digest holds the payloads
+    of reminders the misfire catch-up folded into this one. The provider
+    id of the send is linked to job_id for delivery tracking.
+
+    Run as a job with the outbox enabled, it returns an OutboxMessage
+    instead: the scheduler queues it as it completes the job, and the outbox
+    relay sends it through send_reminder_group, coalesced the same way.
+    """
+    text = await reminder_text(message, digest, **payload)
+    if not text:
+        logger.info(f"Nothing left to remind {to_number} about; skipping")
+        return None
+    if OUTBOX_ENABLED and payload.get("job_id"):
+        return OutboxMessage(channel=channel, to_number=to_number, body=text, delay_seconds=coalescer.window_seconds)
+    result = await coalescer.submit(channel, to_number, text)
+    # Link the SID or call id to this job so status callbacks can find it
+    provider = outbound_queue.config.channels[channel].provider
+    tracker.track(delivery_id(result), provider, channel, to_number, job_ids=[payload.get("job_id")])
+    return result
+
+
+async def send_reminder_group(
+    channel: str,
+    to_number: str,
+    messages: List[str],
+    send_key: str,
+    job_ids: List[str]
+) -> Optional[str]:
+    """
+    Outbox relay send for reminders: one composed message or call through the
+    outbound queue, carrying send_key so provider callbacks can report it.
+    Returns the provider id, linked to job_ids for delivery tracking.
+    """
+    if len(messages) > 1:
+        logger.info(f"Coalesced {len(messages)} {channel} reminders for {to_number}")
+    result = await outbound_queue.submit(channel, to_number, compose_message(channel, messages), send_key=send_key)
+    external_id = delivery_id(result)
+    provider = outbound_queue.config.channels[channel].provider
+    tracker.track(external_id, provider, channel, to_number, job_ids=job_ids)
+    return external_id
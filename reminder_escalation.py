@@ -0,0 +1,201 @@
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from dotenv import load_dotenv
+from delivery_tracker import delivery_id, tracker
+from outbound_caller import caller
+from reminder_dispatch import coalescer, reminder_text
+from reminder_templates import reminder_payload, renderer
+import asyncio
+import logging
+import os
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+# How long to wait for Vapi's end-of-call report before deciding on the SMS;
+# calls run for at most 5 minutes plus ringing time
+CALL_OUTCOME_TIMEOUT_SECONDS = float(os.getenv("REMINDER_CALL_OUTCOME_TIMEOUT", "420"))
+
+
+class CallOutcome(Enum):
+    ANSWERED = "answered"
+    UNANSWERED = "unanswered"  # No answer, busy, or never connected
+    VOICEMAIL = "voicemail"
+    FAILED = "failed"  # The call couldn't be placed or errored
+    UNKNOWN = "unknown"  # No final status before the timeout
+    SKIPPED = "skipped"  # The user doesn't take reminder calls
+
+
+# Vapi endedReason values
+UNANSWERED_REASONS = {
+    "customer-did-not-answer",
+    "customer-busy",
+    "silence-timed-out",
+    "twilio-failed-to-connect-call"
+}
+VOICEMAIL_REASONS = {"voicemail"}
+
+# Call outcomes after which the reminder also goes out by SMS
+SMS_FALLBACK_OUTCOMES = {
+    CallOutcome.UNANSWERED,
+    CallOutcome.VOICEMAIL,
+    CallOutcome.FAILED,
+    CallOutcome.UNKNOWN,
+    CallOutcome.SKIPPED
+}
+
+
+class EscalationResult(BaseModel):
+    call_outcome: CallOutcome
+    call_id: Optional[str] = None
+    sms_sent: bool = False
+    sms_id: Optional[str] = None
+    sms_error: Optional[str] = None
+
+
+def call_outcome(delivery: Optional[Dict[str, Any]]) -> CallOutcome:
+    """Outcome of a call from its final delivery row (see DeliveryTracker.wait_for_final)"""
+    if delivery is None:
+        return CallOutcome.UNKNOWN
+    reason = (delivery.get("details") or {}).get("ended_reason") or ""
+    if reason in VOICEMAIL_REASONS:
+        return CallOutcome.VOICEMAIL
+    if reason in UNANSWERED_REASONS:
+        return CallOutcome.UNANSWERED
+    if delivery.get("failed") or "error" in reason or "failed" in reason:
+        return CallOutcome.FAILED
+    return CallOutcome.ANSWERED
+
+
+def reminder_channels(preferences: Optional[Dict[str, bool]]) -> Tuple[bool, bool]:
+    """(call, sms) allowed by a user's notification_preferences; a missing key allows the channel"""
+    preferences = preferences or {}
+    return preferences.get("call", True), preferences.get("sms", True)
+
+
+def should_send_sms(outcome: CallOutcome, sms_allowed: bool) -> bool:
+    return sms_allowed and outcome in SMS_FALLBACK_OUTCOMES
+
+
+class ReminderEscalator:
+    """
+    Delivers a reminder by call first, and by SMS only if the call didn't
+    reach the user (unanswered, voicemail, failed, or no outcome in time).
+    Channels the user has turned off in notification_preferences are
+    skipped: without calls the SMS goes out straight away, and without SMS
+    there is no fallback.
+
+    The providers are passed in so the decisions can be exercised without
+    Twilio or Vapi: place_call(to_number, text) and send_sms(to_number, text)
+    return the provider's result and raise on failure, and
+    wait_for_outcome(call_id, timeout) returns the call's final delivery row
+    or None.
+    """
+
+    def __init__(
+        self,
+        place_call: Callable[[str, str], Awaitable[Any]],
+        send_sms: Callable[[str, str], Awaitable[Any]],
+        wait_for_outcome: Callable[[str, float], Awaitable[Optional[Dict[str, Any]]]],
+        outcome_timeout_seconds: float = CALL_OUTCOME_TIMEOUT_SECONDS
+    ):
+        self.place_call = place_call
+        self.send_sms = send_sms
+        self.wait_for_outcome = wait_for_outcome
+        self.outcome_timeout_seconds = outcome_timeout_seconds
+
+    async def deliver(
+        self,
+        to_number: str,
+        text: str,
+        preferences: Optional[Dict[str, bool]] = None
+    ) -> EscalationResult:
+        call_allowed, sms_allowed = reminder_channels(preferences)
+        call_id = None
+        if not call_allowed:
+            outcome = CallOutcome.SKIPPED
+        else:
+            try:
+                call_id = delivery_id(await self.place_call(to_number, text))
+            except Exception as e:
+                if not sms_allowed:
+                    raise
+                logger.warning(f"Reminder call to {to_number} failed; falling back to SMS: {e}")
+                outcome = CallOutcome.FAILED
+            else:
+                delivery = await self.wait_for_outcome(call_id, self.outcome_timeout_seconds) if call_id else None
+                outcome = call_outcome(delivery)
+
+        result = EscalationResult(call_outcome=outcome, call_id=call_id)
+        if not should_send_sms(outcome, sms_allowed):
+            logger.info(f"Reminder to {to_number}: call {outcome.value}, no SMS needed")
+            return result
+        try:
+            result.sms_id = delivery_id(await self.send_sms(to_number, text))
+            result.sms_sent = True
+        except Exception as e:
+            if outcome in (CallOutcome.FAILED, CallOutcome.SKIPPED):
+                # Nothing reached the user; let the job retry
+                raise
+            # The call did ring through; don't call again over a failed SMS
+            logger.error(f"Fallback SMS to {to_number} failed after a {outcome.value} call: {e}")
+            result.sms_error = str(e)
+        logger.info(f"Reminder to {to_number}: call {outcome.value}, SMS {'sent' if result.sms_sent else 'failed'}")
+        return result
+
+
+async def _wait_for_call_outcome(call_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+    if not caller.config.server_url:
+        # Vapi isn't reporting call outcomes to us; don't hold the SMS back for nothing
+        return None
+    return await tracker.wait_for_final(call_id, timeout)
+
+
+escalator = ReminderEscalator(
+    place_call=lambda to_number, text: coalescer.submit("call", to_number, text),
+    send_sms=lambda to_number, text: coalescer.submit("sms", to_number, text),
+    wait_for_outcome=_wait_for_call_outcome
+)
+
+
+def escalation_payload(to_number: str, template: str, user_id: str, **refs_and_params) -> Dict[str, Any]:
+    """Job metadata for escalate_reminder; like reminder_payload, plus whose preferences apply"""
+    payload = reminder_payload("call", to_number, template, **refs_and_params)
+    del payload["channel"]
+    payload["user_id"] = str(user_id)
+    return payload
+
+
+def load_preferences(user_id: str) -> Optional[Dict[str, bool]]:
+    response = renderer.client.table("users")\
+        .select("notification_preferences")\
+        .eq("id", user_id)\
+        .execute()
+    return response.data[0].get("notification_preferences") if response.data else None
+
+
+async def escalate_reminder(
+    to_number: str,
+    user_id: Optional[str] = None,
+    message: Optional[str] = None,
+    digest: Optional[List[Dict[str, Any]]] = None,
+    job_id: Optional[str] = None,
+    **payload
+) -> Optional[EscalationResult]:
+    """
+    Scheduler job for a call-then-SMS reminder. The user's
+    notification_preferences are read when it fires, so changes made after
+    scheduling apply.
+    """
+    text = await reminder_text(message, digest, **payload)
+    if not text:
+        logger.info(f"Nothing left to remind {to_number} about; skipping")
+        return None
+    preferences = await asyncio.to_thread(load_preferences, user_id) if user_id else None
+    result = await escalator.deliver(to_number, text, preferences)
+    tracker.track(result.call_id, "vapi", "call", to_number, job_ids=[job_id])
+    tracker.track(result.sms_id, "twilio", "sms", to_number, job_ids=[job_id])
+    return result
@@ -4,6 +4,7 @@ from typing import Optional, Union
 from base_models import Task, Event, Reminder, ReminderCreate
 from scheduler import scheduler
 from outbound_caller import caller
+from delivery_tracker import delivery_id, tracker
 from supabase import Client
 import logging
 
@@ -83,7 +84,10 @@ class ReminderService:
     async def _send_reminder(self, reminder_id: str, to_number: str, message: str):
         try:
             # Send the SMS
-            result = await self.caller.make_simple_call(to_number, message)
+            result = await self.caller.make_simple_call_async(to_number, message)
+            # Delivery callbacks settle the reminder once the call ends
+            tracker.track(delivery_id(result), "vapi", "call", to_number,
+                          job_ids=[f"reminder_{reminder_id}"], reminder_id=reminder_id)
             
             # Update reminder status
             self.supabase.table("reminders").update({
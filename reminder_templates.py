@@ -0,0 +1,126 @@
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import OrderedDict
+from dotenv import load_dotenv
+from supabase import create_client, Client
+import logging
+import os
+import threading
+import time
+
+# Load environment variables from .env.local
+load_dotenv('.env.local')
+
+logger = logging.getLogger(__name__)
+
+# Reminder text, keyed by template id. Fields come from the referenced
+# entity (see ENTITY_SOURCES) plus the job's params.
+TEMPLATES: Dict[str, str] = {
+    "task_due": "Reminder: Your task '{title}' is due {due}",
+    "event_starts": "🎂 Reminder: {title} starts in {minutes} minutes!",
+}
+
+# Reference key -> (table, columns a template may use)
+ENTITY_SOURCES: Dict[str, Tuple[str, str]] = {
+    "task_id": ("tasks", "title,due_date,status"),
+    "event_id": ("events", "title,start_time"),
+}
+
+# Tasks in these states no longer need reminding
+CLOSED_TASK_STATUSES = ("COMPLETED", "CANCELED")
+
+
+def reminder_payload(channel: str, to_number: str, template: str, **refs_and_params) -> Dict[str, Any]:
+    """
+    Compact job metadata for a reminder: recipient, template id and entity
+    references. Keys ending in _id are references; the rest are params.
+    """
+    if template not in TEMPLATES:
+        raise ValueError(f"Unknown reminder template: {template}")
+    refs = {key: str(value) for key, value in refs_and_params.items() if key in ENTITY_SOURCES}
+    params = {key: value for key, value in refs_and_params.items() if key not in ENTITY_SOURCES}
+    payload = {"channel": channel, "to_number": to_number, "template": template, "refs": refs}
+    if params:
+        payload["params"] = params
+    return payload
+
+
+class ReminderRenderer:
+    """
+    Turns a template id and entity references into reminder text when the
+    reminder fires, so stored jobs hold ids instead of rendered messages and
+    the text reflects any edits made since scheduling.
+
+    Rendered text is cached per (template, refs, params) for cache_seconds,
+    so the call and SMS reminders for one task, or a burst of reminders for
+    one event, read the entity once.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Client],
+        cache_seconds: float = 60.0,
+        max_entries: int = 10_000
+    ):
+        self._client_factory = client_factory
+        self._client: Optional[Client] = None
+        self.cache_seconds = cache_seconds
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[tuple, Tuple[float, Optional[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> Client:
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def render(
+        self,
+        template: str,
+        refs: Optional[Dict[str, str]] = None,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """Reminder text, or None if the entity is gone or no longer needs a reminder"""
+        refs = refs or {}
+        params = params or {}
+        key = (template, tuple(sorted(refs.items())), tuple(sorted((k, str(v)) for k, v in params.items())))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and now - cached[0] <= self.cache_seconds:
+                self._cache.move_to_end(key)
+                return cached[1]
+
+        text = self._render(template, refs, params)
+        with self._lock:
+            self._cache[key] = (now, text)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return text
+
+    def _render(self, template: str, refs: Dict[str, str], params: Dict[str, Any]) -> Optional[str]:
+        fields: Dict[str, Any] = {}
+        for ref, entity_id in refs.items():
+            table, columns = ENTITY_SOURCES[ref]
+            response = self.client.table(table).select(columns).eq("id", entity_id).execute()
+            if not response.data:
+                logger.info(f"Reminder source {table}/{entity_id} no longer exists; skipping")
+                return None
+            row = response.data[0]
+            if ref == "task_id":
+                if row.get("status") in CLOSED_TASK_STATUSES:
+                    logger.info(f"Task {entity_id} is {row['status']}; skipping reminder")
+                    return None
+                due_date = row.get("due_date")
+                row["due"] = f"at {datetime.fromisoformat(due_date).strftime('%I:%M %p')}" if due_date else "soon"
+            fields.update(row)
+        return TEMPLATES[template].format(**fields, **params)
+
+
+def _supabase_client() -> Client:
+    return create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+
+
+renderer = ReminderRenderer(_supabase_client)
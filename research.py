@@ -1,10 +1,12 @@
 import os
-from typing import Annotated, Any, Dict, List, TypedDict, Optional
+import asyncio
+from typing import Annotated, Any, Awaitable, Callable, Dict, List, TypedDict, Optional, Union
 import uuid
 from langgraph.graph import Graph, StateGraph
 from langchain_anthropic import ChatAnthropic
 from langchain.prompts import ChatPromptTemplate
 from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.runnables import RunnableConfig
 from datetime import datetime
 from pydantic import BaseModel
 from fastapi import HTTPException, Query
@@ -22,6 +24,8 @@ class ResearchState(TypedDict):
     error: str | None
     iteration_count: int
     steps_taken: int  # Add step counter
+    max_steps: int  # Plan items to research before synthesizing
+    parallel: bool  # Research plan items at the same time instead of one after another
 
 class ResearchResult(BaseModel):
     id: str
@@ -40,15 +44,25 @@ model = ChatAnthropic(
   model="claude-3-sonnet-20240229"
 )
 
+# Plan items researched per question, and how many go to the model at once in parallel mode
+RESEARCH_MAX_STEPS = int(os.getenv("RESEARCH_MAX_STEPS", "2"))
+RESEARCH_PARALLEL = os.getenv("RESEARCH_PARALLEL", "false").lower() in ("1", "true", "yes")
+RESEARCH_CONCURRENCY = int(os.getenv("RESEARCH_CONCURRENCY", "4"))
+# Characters the streamed answer grows by between on_partial calls
+RESEARCH_PARTIAL_CHARS = int(os.getenv("RESEARCH_PARTIAL_CHARS", "300"))
+
+# Called with the answer so far while synthesis streams; may be a coroutine function
+PartialAnswerCallback = Callable[[str], Union[None, Awaitable[None]]]
+
 # Create the research planner agent
-def create_research_plan(state: ResearchState) -> ResearchState:
+async def create_research_plan(state: ResearchState) -> ResearchState:
     try:
         planner_prompt = ChatPromptTemplate.from_messages([
             ("system", "You are a research planning assistant. Break down complex questions into smaller research tasks."),
             ("human", "Create a research plan for the following question: {question}")
         ])
         
-        response = model.invoke(planner_prompt.format_messages(question=state["question"]))
+        response = await model.ainvoke(planner_prompt.format_messages(question=state["question"]))
         research_plan = [task.strip() for task in response.content.split('\n') if task.strip()]
         
         if not research_plan:
@@ -70,25 +84,25 @@ def create_research_plan(state: ResearchState) -> ResearchState:
             "should_continue": False
         }
 
+researcher_prompt = ChatPromptTemplate.from_messages([
+    ("system", """You are a thorough researcher. Provide concise but comprehensive findings for the current task.
+    Focus on key information and avoid redundancy."""),
+    ("human", """Research task: {current_task}
+    
+    Context:
+    Main Question: {question}
+    Previous Findings: {findings}
+    
+    Provide a focused response addressing this specific task.""")
+])
+
 # Create the researcher agent
-def conduct_research(state: ResearchState) -> ResearchState:
+async def conduct_research(state: ResearchState) -> ResearchState:
     try:
         # Increment step counter
         steps_taken = state["steps_taken"] + 1
         
-        researcher_prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a thorough researcher. Provide concise but comprehensive findings for the current task.
-            Focus on key information and avoid redundancy."""),
-            ("human", """Research task: {current_task}
-            
-            Context:
-            Main Question: {question}
-            Previous Findings: {findings}
-            
-            Provide a focused response addressing this specific task.""")
-        ])
-        
-        response = model.invoke(researcher_prompt.format_messages(
+        response = await model.ainvoke(researcher_prompt.format_messages(
             current_task=state["current_task"],
             question=state["question"],
             findings="\n".join(state["findings"])
@@ -102,7 +116,7 @@ def conduct_research(state: ResearchState) -> ResearchState:
             "findings": findings,
             "research_plan": remaining_tasks,
             "current_task": remaining_tasks[0] if remaining_tasks else "",
-            "should_continue": bool(remaining_tasks) and steps_taken < 2,
+            "should_continue": bool(remaining_tasks) and steps_taken < state["max_steps"],
             "steps_taken": steps_taken,
             "messages": state["messages"] + [HumanMessage(content=state["current_task"]), AIMessage(content=response.content)],
             "error": None  # Clear any previous errors
@@ -115,7 +129,54 @@ def conduct_research(state: ResearchState) -> ResearchState:
             "should_continue": False
         }
 
-def synthesize_findings(state: ResearchState) -> ResearchState:
+async def conduct_research_parallel(state: ResearchState) -> ResearchState:
+    """
+    Research up to max_steps plan items at once, RESEARCH_CONCURRENCY at a
+    time. Items don't see each other's findings; the findings are merged in
+    plan order for synthesis. Items that fail are left out.
+    """
+    tasks = state["research_plan"][:state["max_steps"]]
+    prompts = [
+        researcher_prompt.format_messages(current_task=task, question=state["question"], findings="")
+        for task in tasks
+    ]
+    responses = await model.abatch(prompts, config={"max_concurrency": RESEARCH_CONCURRENCY}, return_exceptions=True)
+
+    findings, messages, errors = list(state["findings"]), list(state["messages"]), []
+    for task, response in zip(tasks, responses):
+        if isinstance(response, Exception):
+            print(f"Error researching '{task}': {str(response)}")
+            errors.append(str(response))
+            continue
+        findings.append(response.content)
+        messages += [HumanMessage(content=task), AIMessage(content=response.content)]
+    remaining_tasks = state["research_plan"][len(tasks):]
+    return {
+        **state,
+        "findings": findings,
+        "research_plan": remaining_tasks,
+        "current_task": remaining_tasks[0] if remaining_tasks else "",
+        "should_continue": False,
+        "steps_taken": state["steps_taken"] + len(tasks),
+        "messages": messages,
+        # Synthesize from what came back unless nothing did
+        "error": f"Research failed: {errors[0]}" if errors and len(errors) == len(tasks) else None
+    }
+
+def _chunk_text(content: Any) -> str:
+    """Text of a streamed message chunk; Anthropic chunks may be lists of content blocks"""
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+async def synthesize_findings(state: ResearchState, config: RunnableConfig) -> ResearchState:
+    """
+    Stream the answer. If run_research was given on_partial, it gets the
+    answer so far every RESEARCH_PARTIAL_CHARS characters, so the start of
+    it can be saved or sent before the model finishes.
+    """
+    on_partial = (config.get("configurable") or {}).get("on_partial")
+    answer, reported = "", 0
     try:
         synthesizer_prompt = ChatPromptTemplate.from_messages([
             ("system", "You are a synthesis expert. Create a concise but comprehensive summary of the research findings."),
@@ -128,15 +189,19 @@ def synthesize_findings(state: ResearchState) -> ResearchState:
             Provide a clear, well-structured answer.""")
         ])
         
-        response = model.invoke(synthesizer_prompt.format_messages(
+        async for chunk in model.astream(synthesizer_prompt.format_messages(
             question=state["question"],
             findings="\n\n".join(state["findings"])
-        ))
+        )):
+            answer += _chunk_text(chunk.content)
+            if on_partial is not None and len(answer) - reported >= RESEARCH_PARTIAL_CHARS:
+                reported = len(answer)
+                await _report_partial(on_partial, answer)
         
         return {
             **state,
-            "final_answer": response.content,
-            "messages": state["messages"] + [AIMessage(content=response.content)],
+            "final_answer": answer,
+            "messages": state["messages"] + [AIMessage(content=answer)],
             "error": None
         }
     except Exception as e:
@@ -144,17 +209,32 @@ def synthesize_findings(state: ResearchState) -> ResearchState:
         return {
             **state,
             "error": f"Synthesis failed: {str(e)}",
-            "final_answer": "Failed to synthesize findings due to an error."
+            # Keep whatever streamed before the failure
+            "final_answer": answer or "Failed to synthesize findings due to an error."
         }
 
+async def _report_partial(on_partial: PartialAnswerCallback, answer: str) -> None:
+    try:
+        result = on_partial(answer)
+        if asyncio.iscoroutine(result):
+            await result
+    except Exception as e:
+        # A failed save or text shouldn't stop the answer
+        print(f"Error in on_partial: {str(e)}")
+
 def should_continue(state: ResearchState) -> str:
     # Add error check
     if state.get("error"):
         return "synthesize"
-    if state["should_continue"] and state["steps_taken"] < 2:
+    if state["should_continue"] and state["steps_taken"] < state["max_steps"]:
         return "continue_research"
     return "synthesize"
 
+def research_mode(state: ResearchState) -> str:
+    if state.get("error"):
+        return "synthesize"
+    return "research_parallel" if state["parallel"] else "research"
+
 async def fetch_research_results(
     supabase: Client,
     page: int = 1,
@@ -205,10 +285,20 @@ workflow = StateGraph(ResearchState)
 # Add nodes
 workflow.add_node("create_plan", create_research_plan)
 workflow.add_node("research", conduct_research)
+workflow.add_node("research_parallel", conduct_research_parallel)
 workflow.add_node("synthesize", synthesize_findings)
 
 # Add edges
-workflow.add_edge("create_plan", "research")
+workflow.add_conditional_edges(
+    "create_plan",
+    research_mode,
+    {
+        "research": "research",
+        "research_parallel": "research_parallel",
+        "synthesize": "synthesize"
+    }
+)
+workflow.add_edge("research_parallel", "synthesize")
 workflow.add_conditional_edges(
     "research",
     should_continue,
@@ -224,7 +314,18 @@ workflow.set_finish_point("synthesize")
 graph = workflow.compile()
 
 # Function to run the research workflow
-def run_research(question: str) -> Dict:
+async def run_research(
+    question: str,
+    parallel: Optional[bool] = None,
+    max_steps: Optional[int] = None,
+    on_partial: Optional[PartialAnswerCallback] = None
+) -> Dict:
+    """
+    Plan, research and answer a question without blocking the event loop.
+    parallel and max_steps default to RESEARCH_PARALLEL and
+    RESEARCH_MAX_STEPS; on_partial receives the answer so far as synthesis
+    streams (see synthesize_findings).
+    """
     print(question)
     initial_state = {
         "question": question,
@@ -235,9 +336,17 @@ def run_research(question: str) -> Dict:
         "messages": [],
         "should_continue": True,
         "error": None,
-        "iteration_count": 0
+        "iteration_count": 0,
+        "steps_taken": 0,
+        "max_steps": RESEARCH_MAX_STEPS if max_steps is None else max_steps,
+        "parallel": RESEARCH_PARALLEL if parallel is None else parallel
     }
     print(initial_state)
-    result = graph.invoke(initial_state, config={"recursion_limit": 15})
+    # Each sequential step is a graph step; leave room for planning and synthesis
+    recursion_limit = max(15, initial_state["max_steps"] + 5)
+    result = await graph.ainvoke(
+        initial_state,
+        config={"recursion_limit": recursion_limit, "configurable": {"on_partial": on_partial}}
+    )
 
     return result
\ No newline at end of file
@@ -3,19 +3,30 @@ from apscheduler.executors.asyncio import AsyncIOExecutor
 from datetime import datetime, timedelta
 from enum import Enum
 from typing import Callable, Any, Dict, List, Optional, Union
-from supabase import create_client, Client
 from pydantic import BaseModel, UUID4
 import logging
 import json
 import os
+import random
+import socket
+import time
+import uuid
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
 import pytz
 from dotenv import load_dotenv
 import asyncio
+import functools
+import importlib
+import inspect
 import traceback
-from twilio_sms import send_sms
+from concurrent.futures import ThreadPoolExecutor
+from timer_engine import TimerEngine, TimerRecord
+from job_store import JobStore, SupabaseJobStore
+from job_index import JobIndex
+from metrics import registry
+from outbox import outbox_rows
 
 
 # Load environment variables from .env.local
@@ -23,6 +34,20 @@ load_dotenv('.env.local')
 
 logger = logging.getLogger(__name__)
 
+# Metadata keys schedule_recurring uses to describe the recurrence; they are
+# not passed on to the job function
+RECURRENCE_KEYS = ('trigger_type', 'trigger_args')
+
+# Columns a status read needs; no payload
+STATUS_COLUMNS = 'job_id,status,job_type,run_date,next_run,retry_count,last_error'
+
+FIRE_LAG = registry.histogram("scheduler_fire_lag_seconds", "Planned run time to job start, by job type")
+EXECUTOR_WAIT = registry.histogram("scheduler_executor_wait_seconds", "Sync jobs waiting for a job thread")
+RUN_TIME = registry.histogram("scheduler_run_seconds", "Job function duration, by job type and outcome")
+JOB_RUNS = registry.counter("scheduler_job_runs_total", "Job runs by job type and outcome")
+PENDING_JOBS = registry.gauge("scheduler_pending_jobs", "Scheduled jobs due within the arm window, by job type")
+RUNNING_JOBS = registry.gauge("scheduler_running_jobs", "Jobs currently running in this worker, by job type")
+
 class JobStatus(Enum):
     SCHEDULED = "scheduled"
     RUNNING = "running"
@@ -37,6 +62,11 @@ class JobType(Enum):
     SMS = "sms"
     CUSTOM = "custom"
 
+class MisfirePolicy(Enum):
+    DROP = "drop"            # Skip the missed run; recurring jobs move on to their next occurrence
+    FIRE_ONCE = "fire_once"  # Run each missed job once, late
+    COALESCE = "coalesce"    # Merge missed reminders for the same recipient into one digest
+
 class TriggerType(Enum):
     ONCE = "once"          # Run once at specific time
     DAILY = "daily"        # Run daily at specific time
@@ -57,6 +87,8 @@ class ScheduledJob(BaseModel):
     next_run: Optional[datetime] = None
     retry_count: int = 0
     max_retries: int = 3
+    handler: Optional[str] = None
+    last_error: Optional[str] = None
 
     class Config:
         from_attributes = True
@@ -73,36 +105,186 @@ class ScheduledJob(BaseModel):
         d['job_type'] = self.job_type.value
         return d
 
+class RetryPolicy(BaseModel):
+    """Exponential backoff with full jitter, capped at max_delay_seconds"""
+    max_retries: int = 3
+    base_delay_seconds: float = 30
+    max_delay_seconds: float = 1800
+    multiplier: float = 2
+
+    def next_delay(self, retry_count: int) -> float:
+        """Seconds to wait before retry number retry_count + 1"""
+        ceiling = min(self.max_delay_seconds, self.base_delay_seconds * self.multiplier ** retry_count)
+        return random.uniform(0, ceiling)
+
+class DeadLetter(BaseModel):
+    job_id: str
+    job_type: str
+    handler: Optional[str] = None
+    metadata: Dict[str, Any]
+    retry_count: int
+    last_error: Optional[str] = None
+    failed_at: datetime
+    replayed_at: Optional[datetime] = None
+
+class JobSpec(BaseModel):
+    """One job for schedule_many; metadata becomes the function's kwargs"""
+    job_id: str
+    func: Callable
+    run_date: datetime
+    job_type: JobType = JobType.CUSTOM
+    metadata: Dict[str, Any] = {}
+    retry_count: int = 0
+
+class JobScheduleResult(BaseModel):
+    job_id: str
+    scheduled: bool
+    job: Optional[ScheduledJob] = None
+    error: Optional[str] = None
+
 class JobSchedulerConfig(BaseModel):
     retry_failed_jobs: bool = True
     max_retries: int = 3
+    # Per job type overrides, keyed by JobType value; others use max_retries
+    retry_policies: Dict[str, RetryPolicy] = {}
     store_job_results: bool = True
     cleanup_after_days: int = 7
+    sync_job_workers: int = 8  # Threads available to synchronous job functions
+    engine: str = "apscheduler"  # "apscheduler" or "timer" for high job volumes
+    timer_fire_batch: int = 500  # Payloads loaded per storage round-trip when timers fire
+    lease_seconds: int = 60  # How long a claimed job is owned before others may take it over
+    worker_id: Optional[str] = None  # Lease owner name; defaults to host:pid:random
+    cleanup_batch_size: int = 1000  # Finished jobs archived per batch
+    cleanup_max_batches: int = 50  # Upper bound on batches per cleanup pass
+    arm_window_seconds: int = 3600  # Only jobs due this soon are armed in memory
+    job_index_size: int = 100_000  # Job statuses kept in memory for status reads
+    job_index_max_age_seconds: float = 5.0  # How long a status is trusted before re-reading storage
+    # What to do with jobs missed while no worker was running, keyed by JobType value
+    misfire_policies: Dict[str, MisfirePolicy] = {
+        JobType.EVENT_REMINDER.value: MisfirePolicy.DROP,
+        JobType.NOTIFICATION.value: MisfirePolicy.COALESCE,
+        JobType.SMS.value: MisfirePolicy.COALESCE
+    }
+    default_misfire_policy: MisfirePolicy = MisfirePolicy.FIRE_ONCE
+    misfire_grace_seconds: int = 300  # Jobs missed by less than this run normally
+    catchup_batch_size: int = 100  # Missed jobs handled per catch-up batch
+    catchup_interval_seconds: float = 5.0  # Pause between catch-up batches
+    slow_job_seconds: float = 30.0  # Runs finishing this long after their planned time are logged as slow
+
+class _JobRun:
+    """Timings of one job run"""
+    __slots__ = ("job_id", "job_type", "planned_at", "lag", "started", "executor_wait")
+
+    def __init__(self, job_id: str, job_type: str, planned_at: Optional[datetime]):
+        now = datetime.now(pytz.UTC)
+        self.job_id = job_id
+        self.job_type = job_type
+        self.planned_at = planned_at or now
+        self.lag = max((now - self.planned_at).total_seconds(), 0.0)
+        self.started = time.perf_counter()
+        self.executor_wait: Optional[float] = None
+
+    def in_thread(self, func: Callable, **kwargs) -> Any:
+        """Run a sync job function, noting how long it queued for a thread"""
+        self.executor_wait = time.perf_counter() - self.started
+        return func(**kwargs)
+
+    def finish(self) -> float:
+        return time.perf_counter() - self.started
+
+
+def _parse_timestamp(value: Union[str, datetime, None]) -> Optional[datetime]:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is None:
+        value = pytz.UTC.localize(value)
+    return value
+
+
+class RetentionReport(BaseModel):
+    archived: int
+    batches: int
+    duration_seconds: float
+    outbox_purged: int = 0
     
 class SupabaseJobScheduler:
-    def __init__(self, config: Optional[JobSchedulerConfig] = None, timezone: str = "UTC"):
+    def __init__(
+        self,
+        config: Optional[JobSchedulerConfig] = None,
+        timezone: str = "UTC",
+        store: Optional[JobStore] = None
+    ):
         self.config = config or JobSchedulerConfig()
+        self.owner_id = self.config.worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.timezone = pytz.timezone(timezone)
+        # Set by start(); jobs added before then wait for it
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
         
-        # Use AsyncIOScheduler instead of BackgroundScheduler
+        # Use AsyncIOScheduler instead of BackgroundScheduler; it takes the
+        # event loop when started
         executors = {
             'default': AsyncIOExecutor()
         }
         
         self.scheduler = AsyncIOScheduler(
             executors=executors,
-            timezone=pytz.timezone(timezone)
+            timezone=self.timezone
+        )
+        
+        # Sync job functions run here instead of the loop's default executor
+        self._job_executor = ThreadPoolExecutor(
+            max_workers=self.config.sync_job_workers,
+            thread_name_prefix="job-sync"
         )
         
-        # Initialize Supabase
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_ANON_KEY")
-        self.supabase: Client = create_client(supabase_url, supabase_key)
+        # Job persistence; Supabase unless an embedded store is passed in.
+        # The Supabase store is built on first use
+        self._store: Optional[JobStore] = store
+        
+        # Named job handlers, so stored jobs can be run without a live closure
+        self._handlers: Dict[str, Callable] = {}
+        self._running_tasks: set = set()
+        self._catching_up = False
+        self._catch_up_task: Optional[asyncio.Task] = None
+        self._pending_job_types: set = set()
         
-        # Start scheduler and restore jobs
+        # Current status of recently seen jobs, kept up to date by every transition
+        self.job_index = JobIndex(
+            max_entries=self.config.job_index_size,
+            max_age_seconds=self.config.job_index_max_age_seconds
+        )
+        
+        # Optional compact timer engine for large numbers of pending jobs
+        self.timer_engine: Optional[TimerEngine] = None
+        if self.config.engine == "timer":
+            self.timer_engine = TimerEngine()
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = SupabaseJobStore.from_env()
+        return self._store
+
+    @store.setter
+    def store(self, store: JobStore) -> None:
+        self._store = store
+
+    def start(self) -> None:
+        """
+        Start running jobs on the current event loop, restore stored jobs and
+        schedule the maintenance jobs. Does nothing if already started.
+        """
+        if self.scheduler.running:
+            return
+        self.loop = asyncio.get_event_loop()
         self.scheduler.start()
+        if self.timer_engine is not None:
+            self.timer_engine.start(self.loop, self._fire_due_jobs)
         self._restore_jobs()
+        self._schedule_catch_up()
         self._schedule_cleanup_job()
-        self.timezone = pytz.timezone(timezone)
+        self._schedule_lease_sweep()
+        self._schedule_window_loader()
 
     def schedule_reminder(
         self,
@@ -162,170 +344,571 @@ class SupabaseJobScheduler:
         Cancel a scheduled job
         """
         try:
-            self.scheduler.remove_job(job_id)
-            self._update_job_status(job_id, JobStatus.CANCELLED)
+            # Jobs outside the arm window are only in storage
+            if self.timer_engine is not None:
+                self.timer_engine.cancel(job_id)
+            elif self.scheduler.get_job(job_id):
+                self.scheduler.remove_job(job_id)
+            self.store.update_job(job_id, {'status': JobStatus.CANCELLED.value})
+            self.job_index.record(job_id, JobStatus.CANCELLED.value)
             return True
         except Exception as e:
             logger.error(f"Failed to cancel job {job_id}: {e}")
             return False
 
+    def register_handler(self, name: str, func: Callable) -> None:
+        """
+        Register a job function under a stable name.
+
+        Stored jobs reference their function by name. Module-level functions
+        are found by import path automatically; bound methods such as
+        caller.make_simple_call_async must be registered so jobs restored after a
+        restart can find them.
+        """
+        self._handlers[name] = func
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the scheduler and the sync job executor
+        """
+        if self.timer_engine is not None:
+            self.timer_engine.stop()
+        if self._catch_up_task is not None:
+            # Whatever it hasn't reached is caught up on at the next start
+            self._catch_up_task.cancel()
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=wait)
+        self._job_executor.shutdown(wait=wait)
+
     def get_job(self, job_id: str) -> Optional[ScheduledJob]:
         """
         Get a specific job's details
         """
         try:
-            response = self.supabase.table('scheduled_jobs')\
-                .select('*')\
-                .eq('job_id', job_id)\
-                .single()\
-                .execute()
-            return ScheduledJob(**response.data) if response.data else None
+            row = self.store.get_job(job_id)
+            return ScheduledJob(**row) if row else None
         except Exception as e:
             logger.error(f"Failed to get job {job_id}: {e}")
             return None
 
+    async def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Status of one job without its payload. Served from the job index when
+        fresh; otherwise read from storage, including the archive.
+        """
+        status = self.job_index.get(job_id)
+        if status is not None:
+            return status
+        return (await self.get_job_statuses([job_id])).get(job_id)
+
+    async def get_job_statuses(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Statuses for many jobs, with one storage round-trip for any not in the index"""
+        found = self.job_index.get_many(job_ids)
+        missing = [job_id for job_id in dict.fromkeys(job_ids) if job_id not in found]
+        if missing:
+            found.update(await asyncio.get_running_loop().run_in_executor(
+                None,
+                self._load_job_statuses,
+                missing
+            ))
+        return found
+
+    def _load_job_statuses(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        rows = self.store.get_jobs(job_ids, columns=STATUS_COLUMNS)
+        archived = [job_id for job_id in job_ids if job_id not in rows]
+        if archived:
+            rows.update(self.store.get_archived_jobs(archived, columns=STATUS_COLUMNS))
+        return {job_id: self.job_index.record_row(row) for job_id, row in rows.items()}
+
     def get_jobs_by_status(self, status: JobStatus) -> List[ScheduledJob]:
         """
         Get all jobs with a specific status
         """
         try:
-            response = self.supabase.table('scheduled_jobs')\
-                .select('*')\
-                .eq('status', status.value)\
-                .execute()
-            return [ScheduledJob(**job) for job in response.data]
+            rows = self.store.get_jobs_by_status(status.value)
+            return [ScheduledJob(**job) for job in rows]
         except Exception as e:
             logger.error(f"Failed to get jobs with status {status}: {e}")
             return []
 
     def retry_job(self, job_id: str) -> Optional[ScheduledJob]:
         """
-        Retry a failed job
+        Manually retry a job that ended in the dead-letter queue
         """
-        job = self.get_job(job_id)
-        if not job or job.status != JobStatus.FAILED:
+        if not self.replay_dead_letters([job_id]):
             return None
-            
-        if job.retry_count >= job.max_retries:
-            logger.warning(f"Job {job_id} has exceeded max retries")
-            return None
-            
-        return self._create_job(
-            job_id=f"{job_id}_retry_{job.retry_count + 1}",
-            job_type=job.job_type,
-            run_date=datetime.now() + timedelta(minutes=5),
-            func=self._get_function_for_job_type(job.job_type),
-            metadata=job.metadata,
-            retry_count=job.retry_count + 1
-        )
+        return self.get_job(job_id)
+
+    def retry_policy(self, job_type: Union[JobType, str]) -> RetryPolicy:
+        """
+        Retry policy for a job type
+        """
+        key = job_type.value if isinstance(job_type, JobType) else job_type
+        return self.config.retry_policies.get(key) or RetryPolicy(max_retries=self.config.max_retries)
+
+    def misfire_policy(self, job_type: Union[JobType, str]) -> MisfirePolicy:
+        """
+        Misfire policy for a job type
+        """
+        key = job_type.value if isinstance(job_type, JobType) else job_type
+        return self.config.misfire_policies.get(key) or self.config.default_misfire_policy
+
+    def list_dead_letters(self, limit: int = 100, job_type: Optional[str] = None) -> List[DeadLetter]:
+        """
+        Jobs that exhausted their retries and have not been replayed
+        """
+        try:
+            rows = self.store.get_dead_letters(limit, job_type)
+            return [DeadLetter(**row) for row in rows]
+        except Exception as e:
+            logger.error(f"Failed to list dead-lettered jobs: {e}")
+            return []
 
-    def _job_wrapper(self, func: Callable) -> Callable:
+    def replay_dead_letters(self, job_ids: List[str], run_at: Optional[datetime] = None) -> List[str]:
         """
-        Wrapper for job execution with error handling and status updates
+        Put dead-lettered jobs back on the schedule with a fresh retry budget.
+        Returns the job ids that were replayed.
         """
+        run_date = run_at or datetime.now(pytz.UTC)
+        if run_date.tzinfo is None:
+            run_date = pytz.UTC.localize(run_date)
+        try:
+            rows = self.store.replay_dead_letters(job_ids, run_date)
+        except Exception as e:
+            logger.error(f"Failed to replay dead-lettered jobs: {e}")
+            return []
+        
+        for row in rows:
+            self._reschedule_job(row['job_id'], run_date, row['handler'])
+            self.job_index.record(row['job_id'], JobStatus.SCHEDULED.value, run_date=run_date, retry_count=0)
+        logger.info(f"Replayed {len(rows)} of {len(job_ids)} dead-lettered jobs")
+        return [row['job_id'] for row in rows]
+
+    def _job_wrapper(
+        self,
+        func: Callable,
+        job_type: Optional[str] = None,
+        planned_at: Optional[datetime] = None
+    ) -> Callable:
+        """
+        Wrapper for job execution with error handling and status updates.
+
+        Returns a coroutine function so AsyncIOExecutor awaits it on the
+        scheduler's own event loop. Coroutine jobs are awaited in place and
+        sync jobs are handed to the sized job executor, so no per-run event
+        loop is created.
+
+        The job only runs if this process wins the lease claim for it, and the
+        lease is renewed while it runs, so a job armed in several workers is
+        executed once. Recurring jobs go back to scheduled for their next
+        occurrence instead of completing.
+
+        Each run records its firing lag (planned_at to start), executor wait
+        and duration under job_type, and runs that finish later than
+        slow_job_seconds after planned_at are logged with that breakdown.
+
+        A job that returns OutboxMessages doesn't send anything itself: its
+        sends are queued for the outbox relay in the same write that
+        completes it, so a crash can't send a reminder and leave its job to
+        run again, or finish the job without the send.
+        """
+        job_type = job_type or JobType.CUSTOM.value
+
         async def wrapped_func(**kwargs):
             job_id = kwargs.get('job_id')
+            recurrence = {key: kwargs.pop(key) for key in RECURRENCE_KEYS if key in kwargs}
+            loop = asyncio.get_running_loop()
+            claimed = await loop.run_in_executor(
+                None,
+                self.store.claim_job,
+                job_id,
+                self.owner_id,
+                self.config.lease_seconds
+            )
+            if not claimed:
+                logger.info(f"Job {job_id} is claimed elsewhere or finished; skipping")
+                self.job_index.mark_stale(job_id)
+                return None
+            self.job_index.record(job_id, JobStatus.RUNNING.value)
+            
+            run = _JobRun(job_id, job_type, planned_at)
+            RUNNING_JOBS.inc(job_type=job_type)
+            heartbeat = loop.create_task(self._heartbeat(job_id))
             try:
-                await self._update_job_status(job_id, JobStatus.RUNNING)
-                print(f"Starting job {job_id}...")
+                logger.info(f"Starting job {job_id} ({job_type}), {run.lag:.3f}s after its planned time")
                 
                 if asyncio.iscoroutinefunction(func):
-                    print(f"Executing async function for job {job_id}")
                     result = await func(**kwargs)
                 else:
-                    print(f"Executing sync function for job {job_id}")
-                    result = await asyncio.get_event_loop().run_in_executor(
-                        None, 
-                        lambda: func(**kwargs)
+                    result = await loop.run_in_executor(
+                        self._job_executor,
+                        functools.partial(run.in_thread, func, **kwargs)
                     )
                 
-                print(f"Completed job {job_id}")
-                await self._update_job_status(job_id, JobStatus.COMPLETED)
+                # Keyed by the run's planned time, so a job id reused for a later run still sends
+                outbox = outbox_rows(job_id, result, run.planned_at)
+                if outbox and not recurrence:
+                    completed = await loop.run_in_executor(
+                        None,
+                        self.store.complete_job_with_outbox,
+                        job_id,
+                        self.owner_id,
+                        outbox
+                    )
+                    if completed:
+                        self.job_index.record(job_id, JobStatus.COMPLETED.value)
+                    else:
+                        logger.warning(f"Job {job_id} lease no longer held by {self.owner_id} or job was cancelled; its sends were not queued")
+                elif outbox:
+                    # Keyed by occurrence, so queueing again before the advance lands is a no-op
+                    await loop.run_in_executor(None, self.store.enqueue_outbox, outbox)
+                
+                self._record_run(run, "completed")
+                if recurrence:
+                    await self._advance_recurring_job(job_id, recurrence, self._handler_name(func))
+                elif not outbox:
+                    await self._update_job_status(job_id, JobStatus.COMPLETED)
                 return result
             except Exception as e:
-                logger.error(f"Job {job_id} failed: {e}")
-                await self._update_job_status(job_id, JobStatus.FAILED)
-                if self.config.retry_failed_jobs:
-                    await self.retry_job(job_id)
+                self._record_run(run, "failed", e)
+                await self._handle_job_failure(job_id, e)
                 raise
+            finally:
+                RUNNING_JOBS.dec(job_type=job_type)
+                heartbeat.cancel()
+
+        return wrapped_func
 
-        def sync_wrapper(**kwargs):
-            """Synchronous wrapper that runs the async function"""
-            # Always create a new event loop for the job
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
+    def _record_run(self, run: "_JobRun", outcome: str, error: Optional[Exception] = None) -> None:
+        """Record a finished run's timings and flag it if it went out late"""
+        duration = run.finish()
+        FIRE_LAG.observe(run.lag, job_type=run.job_type)
+        if run.executor_wait is not None:
+            EXECUTOR_WAIT.observe(run.executor_wait, job_type=run.job_type)
+        RUN_TIME.observe(duration, job_type=run.job_type, outcome=outcome)
+        JOB_RUNS.inc(job_type=run.job_type, outcome=outcome)
+        
+        summary = (
+            f"planned {run.planned_at.isoformat()}, started after {run.lag:.3f}s, "
+            f"executor wait {run.executor_wait or 0:.3f}s, ran {duration:.3f}s"
+        )
+        if error is not None:
+            logger.error(f"Job {run.job_id} ({run.job_type}) failed: {error}; {summary}")
+        else:
+            logger.info(f"Completed job {run.job_id} ({run.job_type}); {summary}")
+        if run.lag + duration > self.config.slow_job_seconds:
+            logger.warning(f"Slow job {run.job_id} ({run.job_type}, {outcome}): {summary}")
+
+    async def _handle_job_failure(self, job_id: str, error: Exception) -> None:
+        """Reschedule a failed job with backoff, or dead-letter it once retries run out"""
+        loop = asyncio.get_running_loop()
+        try:
+            row = await loop.run_in_executor(None, self.store.get_job, job_id)
+            if not row:
+                return
+            policy = self.retry_policy(row['job_type'])
+            retry_count = row.get('retry_count') or 0
+            
+            if self.config.retry_failed_jobs and retry_count < policy.max_retries:
+                run_date = datetime.now(pytz.UTC) + timedelta(seconds=policy.next_delay(retry_count))
+                rescheduled = await loop.run_in_executor(
+                    None,
+                    self.store.reschedule_job,
+                    job_id,
+                    self.owner_id,
+                    run_date,
+                    retry_count + 1,
+                    str(error)
+                )
+                if rescheduled:
+                    self._reschedule_job(job_id, run_date, row['handler'])
+                    self.job_index.record(
+                        job_id,
+                        JobStatus.SCHEDULED.value,
+                        run_date=run_date,
+                        retry_count=retry_count + 1,
+                        last_error=str(error)
+                    )
+                    logger.info(f"Retry {retry_count + 1}/{policy.max_retries} for job {job_id} at {run_date.isoformat()}")
+                return
             
+            metadata = self._decode_metadata(row['metadata'])
+            if metadata.get('trigger_type'):
+                # A failed occurrence shouldn't end the whole recurring schedule
+                logger.warning(f"Recurring job {job_id} failed after {retry_count} retries; moving to its next occurrence")
+                await self._advance_recurring_job(job_id, metadata, row['handler'], str(error))
+                return
+            
+            dead_lettered = await loop.run_in_executor(
+                None,
+                self.store.dead_letter_job,
+                job_id,
+                self.owner_id,
+                str(error)
+            )
+            if dead_lettered:
+                self.job_index.record(job_id, JobStatus.FAILED.value, last_error=str(error))
+                logger.warning(f"Job {job_id} failed after {retry_count} retries; moved to dead-letter queue")
+        except Exception as e:
+            logger.error(f"Failed to record failure of job {job_id}: {str(e)}")
+
+    async def _heartbeat(self, job_id: str) -> None:
+        """Keep renewing this worker's lease on a running job"""
+        loop = asyncio.get_running_loop()
+        interval = max(self.config.lease_seconds / 3, 1)
+        while True:
+            await asyncio.sleep(interval)
             try:
-                return loop.run_until_complete(wrapped_func(**kwargs))
+                renewed = await loop.run_in_executor(
+                    None,
+                    self.store.renew_lease,
+                    job_id,
+                    self.owner_id,
+                    self.config.lease_seconds
+                )
+                if not renewed:
+                    logger.warning(f"Lost lease on job {job_id}; another worker may take it over")
+                    return
             except Exception as e:
-                logger.error(f"Error in sync_wrapper: {str(e)}")
-                raise
-            finally:
-                try:
-                    # Cancel all running tasks
-                    pending = asyncio.all_tasks(loop)
-                    for task in pending:
-                        task.cancel()
-                    
-                    # Run the event loop one last time to clean up
-                    if pending:
-                        loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                    
-                    loop.run_until_complete(loop.shutdown_asyncgens())
-                finally:
-                    loop.close()
-
-        return sync_wrapper
+                logger.error(f"Failed to renew lease for {job_id}: {str(e)}")
 
     async def _update_job_status(self, job_id: str, status: JobStatus) -> None:
-        """Update job status in Supabase"""
+        """Record the outcome of a claimed job and release its lease"""
         try:
-            await asyncio.get_event_loop().run_in_executor(
+            released = await asyncio.get_running_loop().run_in_executor(
                 None,
-                lambda: self.supabase.table('scheduled_jobs')
-                    .update({'status': status.value})
-                    .eq('job_id', job_id)
-                    .execute()
+                self.store.release_job,
+                job_id,
+                self.owner_id,
+                status.value
             )
-            logger.info(f"Updated job status for {job_id} to {status.value}")
+            if released:
+                self.job_index.record(job_id, status.value)
+                logger.info(f"Updated job status for {job_id} to {status.value}")
+            else:
+                logger.warning(f"Job {job_id} lease no longer held by {self.owner_id} or job was cancelled; status {status.value} not recorded")
         except Exception as e:
             logger.error(f"Failed to update job status for {job_id}: {str(e)}")
 
+    async def _advance_recurring_job(
+        self,
+        job_id: str,
+        recurrence: Dict[str, Any],
+        handler: str,
+        last_error: Optional[str] = None
+    ) -> None:
+        """Persist a recurring job's next occurrence and release its lease"""
+        try:
+            next_run = self._next_fire_time(
+                recurrence['trigger_type'],
+                recurrence.get('trigger_args') or {},
+                datetime.now(pytz.UTC) + timedelta(microseconds=1)
+            )
+            if next_run is None:
+                await self._update_job_status(job_id, JobStatus.COMPLETED)
+                return
+            advanced = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.store.advance_recurring_job,
+                job_id,
+                self.owner_id,
+                next_run,
+                last_error
+            )
+            if not advanced:
+                logger.warning(f"Job {job_id} lease no longer held by {self.owner_id} or job was cancelled; next run not recorded")
+                return
+            self.job_index.record(
+                job_id,
+                JobStatus.SCHEDULED.value,
+                run_date=next_run,
+                retry_count=0,
+                last_error=last_error
+            )
+            if self._in_arm_window(next_run):
+                self._reschedule_job(job_id, next_run, handler)
+            logger.info(f"Recurring job {job_id} next runs at {next_run.isoformat()}")
+        except Exception as e:
+            logger.error(f"Failed to schedule next run of {job_id}: {str(e)}")
+
+    def _next_fire_time(self, trigger_type: str, trigger_args: Dict[str, Any], after: datetime) -> Optional[datetime]:
+        """Next occurrence of a stored recurrence at or after after"""
+        trigger_type = TriggerType(trigger_type)
+        if trigger_type == TriggerType.ONCE:
+            return None
+        trigger = self._create_trigger(trigger_type, **trigger_args)
+        return trigger.get_next_fire_time(None, after.astimezone(self.timezone))
+
+    def _in_arm_window(self, run_date: datetime, now: Optional[datetime] = None) -> bool:
+        now = now or datetime.now(pytz.UTC)
+        return run_date <= now + timedelta(seconds=self.config.arm_window_seconds)
+
+    def _is_armed(self, job_id: str) -> bool:
+        if self.timer_engine is not None:
+            return job_id in self.timer_engine
+        return self.scheduler.get_job(job_id) is not None
+
     def _restore_jobs(self) -> None:
-        """Restore jobs from Supabase on startup"""
+        """Arm the jobs due within the arm window on startup"""
         try:
-            response = self.supabase.table('scheduled_jobs')\
-                .select('*')\
-                .eq('status', 'scheduled')\
-                .execute()
-            
-            now = datetime.now(pytz.UTC)  # Get current time in UTC
-            
-            for job in response.data:
-                # Parse the stored datetime and ensure it's timezone aware
-                run_date = datetime.fromisoformat(job['run_date'])
-                if run_date.tzinfo is None:
-                    run_date = pytz.UTC.localize(run_date)
-                
-                # Only restore future jobs
-                if run_date > now:
-                    metadata = json.loads(job['metadata'])
-                    self._reschedule_job(job['job_id'], run_date, metadata)
-                    
-            logger.info("Restored scheduled jobs from Supabase")
+            armed = self._arm_due_jobs()
+            logger.info(f"Restored {armed} scheduled jobs due in the next {self.config.arm_window_seconds}s")
         except Exception as e:
             logger.error(f"Failed to restore jobs from Supabase: {str(e)}")
             logger.error(traceback.format_exc())  # Add stack trace for debugging
 
-    def _reschedule_job(self, job_id: str, run_date: datetime, metadata: Dict[str, Any]) -> None:
-        """Reschedule a job from stored metadata"""
+    def _arm_due_jobs(self, now: Optional[datetime] = None) -> int:
+        """
+        Arm stored jobs whose next_run falls inside the arm window, using the
+        next_run index. Jobs further out stay in storage until a later pass,
+        so memory holds only the due-soon window rather than every pending or
+        recurring job.
+        """
+        now = now or datetime.now(pytz.UTC)
+        # Payloads are loaded when each job fires, not here
+        rows = self.store.get_jobs_due_before(
+            now + timedelta(seconds=self.config.arm_window_seconds),
+            columns='job_id,status,job_type,next_run,retry_count,last_error,handler'
+        )
+        armed = 0
+        pending: Dict[str, int] = {}
+        for job in rows:
+            self.job_index.record_row(job)
+            pending[job['job_type']] = pending.get(job['job_type'], 0) + 1
+            # Parse the stored datetime and ensure it's timezone aware
+            next_run = datetime.fromisoformat(job['next_run'])
+            if next_run.tzinfo is None:
+                next_run = pytz.UTC.localize(next_run)
+            
+            # Overdue jobs are left to the lease sweep; skip ones already armed
+            if next_run > now and job.get('handler') and not self._is_armed(job['job_id']):
+                self._reschedule_job(job['job_id'], next_run, job['handler'])
+                armed += 1
+        # Zero out types that no longer have pending jobs
+        self._pending_job_types |= pending.keys()
+        for job_type in self._pending_job_types:
+            PENDING_JOBS.set(pending.get(job_type, 0), job_type=job_type)
+        return armed
+
+    def _schedule_window_loader(self) -> None:
+        """Arm upcoming jobs twice per window so each is armed well before it is due"""
+        try:
+            self.scheduler.add_job(
+                func=self._load_arm_window,
+                trigger='interval',
+                seconds=max(self.config.arm_window_seconds // 2, 1),
+                id='load_arm_window',
+                replace_existing=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to schedule arm window loader: {str(e)}")
+
+    async def _load_arm_window(self) -> None:
         try:
-            # Your logic to recreate the job based on metadata
-            # This will depend on how you store function references
-            pass
+            armed = await asyncio.get_running_loop().run_in_executor(None, self._arm_due_jobs)
+            if armed:
+                logger.info(f"Armed {armed} jobs entering the arm window")
+        except Exception as e:
+            logger.error(f"Failed to load arm window: {str(e)}")
+
+    def _reschedule_job(self, job_id: str, run_date: datetime, handler: str) -> None:
+        """Re-arm a stored job; its payload is loaded when it fires"""
+        try:
+            if self.timer_engine is not None:
+                self.timer_engine.add(job_id, run_date, handler)
+            else:
+                self._arm_stored_job(job_id, run_date, handler)
         except Exception as e:
             logger.error(f"Failed to reschedule job {job_id}: {str(e)}")
 
+    def _arm_stored_job(self, job_id: str, run_date: datetime, handler: str) -> None:
+        """APScheduler date job that loads the stored payload when it fires"""
+        self.scheduler.add_job(
+            func=self._run_stored_job,
+            trigger='date',
+            run_date=run_date,
+            id=job_id,
+            kwargs={'job_id': job_id, 'handler': handler},
+            misfire_grace_time=None,
+            replace_existing=True
+        )
+
+    async def _run_stored_job(self, job_id: str, handler: str) -> None:
+        """Load a stored job's payload and run it"""
+        await self._fire_due_jobs([TimerRecord(0.0, 0, job_id, handler)])
+
+    async def _fire_due_jobs(self, records: List[TimerRecord]) -> None:
+        """Load payloads for due records in batches and start their jobs"""
+        loop = asyncio.get_running_loop()
+        batch_size = self.config.timer_fire_batch
+        for start in range(0, len(records), batch_size):
+            batch = records[start:start + batch_size]
+            try:
+                rows = await loop.run_in_executor(
+                    None,
+                    self._load_job_rows,
+                    [record.job_id for record in batch]
+                )
+            except Exception as e:
+                logger.error(f"Failed to load payloads for {len(batch)} due jobs: {str(e)}")
+                continue
+            
+            for record in batch:
+                row = rows.get(record.job_id)
+                # Skip jobs cancelled or finished since they were armed;
+                # the lease claim settles running ones
+                if not row or row['status'] not in (JobStatus.SCHEDULED.value, JobStatus.RUNNING.value):
+                    continue
+                try:
+                    func = self._resolve_handler(record.handler)
+                except Exception as e:
+                    logger.error(f"Cannot resolve handler {record.handler} for job {record.job_id}: {e}")
+                    continue
+                metadata = self._decode_metadata(row['metadata'])
+                wrapped = self._job_wrapper(func, row.get('job_type'), _parse_timestamp(row.get('next_run')))
+                task = loop.create_task(wrapped(job_id=record.job_id, **metadata))
+                self._running_tasks.add(task)
+                task.add_done_callback(self._job_task_done)
+
+    def _job_task_done(self, task: asyncio.Task) -> None:
+        self._running_tasks.discard(task)
+        # Failures are already logged and recorded by _job_wrapper
+        if not task.cancelled():
+            task.exception()
+
+    def _load_job_rows(self, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Fetch status and payload for many jobs in one query"""
+        return self.store.get_jobs(job_ids, columns='job_id,status,job_type,next_run,metadata')
+
+    @staticmethod
+    def _decode_metadata(metadata: Union[str, Dict[str, Any], None]) -> Dict[str, Any]:
+        """jsonb comes back as a dict; older rows stored a JSON string"""
+        if isinstance(metadata, str):
+            return json.loads(metadata)
+        return metadata or {}
+
+    def _handler_name(self, func: Callable) -> str:
+        """Stable name used to find func again when a stored job fires"""
+        for name, registered in self._handlers.items():
+            if registered == func:
+                return name
+        name = f"{func.__module__}:{func.__qualname__}"
+        if inspect.ismethod(func) or '<' in func.__qualname__:
+            # Bound methods, closures and lambdas can't be imported back;
+            # remember this one in-process
+            self._handlers[name] = func
+        return name
+
+    def _resolve_handler(self, name: str) -> Callable:
+        """Find a job function by registered name or module:qualname path"""
+        if name in self._handlers:
+            return self._handlers[name]
+        module_name, _, qualname = name.partition(':')
+        target = importlib.import_module(module_name)
+        for attr in qualname.split('.'):
+            target = getattr(target, attr)
+        return target
+
     def _store_job_metadata(self, job_id: str, run_date: datetime, metadata: Dict[str, Any]) -> None:
         """Store job metadata in Supabase"""
         try:
@@ -337,7 +920,7 @@ class SupabaseJobScheduler:
                 'created_at': datetime.now().isoformat()
             }
             
-            self.supabase.table('scheduled_jobs').insert(job_data).execute()
+            self.store.insert_job(job_data)
             logger.info(f"Stored job metadata for {job_id} in Supabase")
         except Exception as e:
             logger.error(f"Failed to store job metadata in Supabase: {str(e)}")
@@ -355,15 +938,254 @@ class SupabaseJobScheduler:
         except Exception as e:
             logger.error(f"Failed to schedule job to clean up old jobs: {str(e)}")
 
-    def _cleanup_jobs(self) -> None:
-        """Clean up old jobs"""
+    def _schedule_lease_sweep(self) -> None:
+        """Schedule the takeover sweep for jobs abandoned by dead workers"""
         try:
-            # Your logic to clean up old jobs
-            # This will depend on how you store job metadata
-            pass
-            logger.info("Cleaned up old jobs")
+            self.scheduler.add_job(
+                func=self._sweep_orphaned_jobs,
+                trigger='interval',
+                seconds=self.config.lease_seconds,
+                id='sweep_orphaned_jobs',
+                replace_existing=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to schedule lease sweep: {str(e)}")
+
+    async def _sweep_orphaned_jobs(self) -> None:
+        """
+        Take over running jobs whose lease expired. Scheduled jobs overdue by
+        more than a lease period (their worker died before firing them) are
+        handed to the misfire catch-up. The lease claim decides which worker
+        gets each one.
+        """
+        try:
+            overdue_before = datetime.now(pytz.UTC) - timedelta(seconds=self.config.lease_seconds)
+            rows = await asyncio.get_running_loop().run_in_executor(
+                None,
+                self.store.get_orphaned_jobs,
+                overdue_before,
+                self.config.timer_fire_batch
+            )
+            records = [
+                TimerRecord(0.0, 0, row['job_id'], row['handler'])
+                for row in rows if row.get('handler') and row['status'] == JobStatus.RUNNING.value
+            ]
+            if records:
+                logger.info(f"Taking over {len(records)} orphaned jobs")
+                await self._fire_due_jobs(records)
+            if len(records) < len(rows) and not self._catching_up:
+                self._schedule_catch_up()
+        except Exception as e:
+            logger.error(f"Failed to sweep orphaned jobs: {str(e)}")
+
+    def _schedule_catch_up(self) -> None:
+        """
+        Run the misfire catch-up once, as soon as the loop is free. It runs
+        as a task of its own rather than an APScheduler job, so shutdown can
+        stop it without APScheduler reporting the cancellation as an error.
+        """
+        if self._catch_up_task is not None and not self._catch_up_task.done():
+            return
+        try:
+            self._catch_up_task = self.loop.create_task(self._catch_up_missed_jobs())
+        except Exception as e:
+            logger.error(f"Failed to schedule misfire catch-up: {str(e)}")
+
+    async def _catch_up_missed_jobs(self) -> None:
+        """
+        Work through scheduled jobs whose run time passed while no worker was
+        running, in batches of catchup_batch_size with catchup_interval_seconds
+        between them, so recovery doesn't swamp live jobs or provider limits.
+        Each job's type decides its misfire policy. Reminders to coalesce are
+        collected over the whole backlog first, so every missed reminder for
+        a recipient lands in one digest.
+        """
+        if self._catching_up:
+            return
+        self._catching_up = True
+        loop = asyncio.get_running_loop()
+        now = datetime.now(pytz.UTC)
+        missed_before = now - timedelta(seconds=self.config.lease_seconds)
+        groups: Dict[tuple, List[tuple]] = {}
+        after = None
+        handled = 0
+        try:
+            while True:
+                rows = await loop.run_in_executor(
+                    None,
+                    self.store.get_missed_jobs,
+                    missed_before,
+                    after,
+                    self.config.catchup_batch_size
+                )
+                if not rows:
+                    break
+                after = (rows[-1]['next_run'], rows[-1]['job_id'])
+                for key, item in await self._apply_misfire_policies(rows, now):
+                    groups.setdefault(key, []).append(item)
+                handled += len(rows)
+                if len(rows) < self.config.catchup_batch_size:
+                    break
+                await asyncio.sleep(self.config.catchup_interval_seconds)
+            
+            pending = list(groups.values())
+            for start in range(0, len(pending), self.config.catchup_batch_size):
+                if start:
+                    await asyncio.sleep(self.config.catchup_interval_seconds)
+                primaries = []
+                for group in pending[start:start + self.config.catchup_batch_size]:
+                    primary = await loop.run_in_executor(None, self._coalesce_missed_jobs, group)
+                    if primary:
+                        primaries.append(primary)
+                await self._fire_due_jobs([TimerRecord(0.0, 0, row['job_id'], row['handler']) for row in primaries])
+            if handled:
+                logger.info(f"Caught up on {handled} missed jobs ({len(pending)} reminder digests)")
+        except asyncio.CancelledError:
+            logger.info(f"Misfire catch-up stopped by shutdown after {handled} missed jobs")
+            raise
+        except Exception as e:
+            logger.error(f"Failed to catch up on missed jobs: {str(e)}")
+        finally:
+            self._catching_up = False
+
+    async def _apply_misfire_policies(self, rows: List[Dict[str, Any]], now: datetime) -> List[tuple]:
+        """
+        Fire or drop one batch of missed jobs. Returns (group key, (row,
+        metadata)) pairs for the jobs whose policy is to coalesce.
+        """
+        grace = timedelta(seconds=self.config.misfire_grace_seconds)
+        fire: List[Dict[str, Any]] = []
+        to_coalesce = []
+        for row in rows:
+            if not row.get('handler'):
+                continue
+            missed_at = datetime.fromisoformat(row['next_run'])
+            policy = self.misfire_policy(row['job_type'])
+            if now - missed_at <= grace or policy == MisfirePolicy.FIRE_ONCE:
+                fire.append(row)
+                continue
+            metadata = self._decode_metadata(row['metadata'])
+            if policy == MisfirePolicy.DROP:
+                await self._drop_missed_job(row, metadata)
+            elif self._can_coalesce(row['handler'], metadata):
+                key = (row['handler'], metadata['to_number'], metadata.get('channel'))
+                to_coalesce.append((key, (row, metadata)))
+            else:
+                # Nothing to merge on; run it once
+                fire.append(row)
+        
+        if fire:
+            await self._fire_due_jobs([TimerRecord(0.0, 0, row['job_id'], row['handler']) for row in fire])
+        return to_coalesce
+
+    def _can_coalesce(self, handler: str, metadata: Dict[str, Any]) -> bool:
+        """One-shot reminders whose handler takes the digest of a coalesced group"""
+        if not metadata.get('to_number') or metadata.get('trigger_type'):
+            return False
+        if not (metadata.get('message') or metadata.get('template')):
+            return False
+        try:
+            return 'digest' in inspect.signature(self._resolve_handler(handler)).parameters
+        except Exception:
+            return False
+
+    async def _drop_missed_job(self, row: Dict[str, Any], metadata: Dict[str, Any]) -> None:
+        job_id = row['job_id']
+        loop = asyncio.get_running_loop()
+        claimed = await loop.run_in_executor(
+            None,
+            self.store.claim_job,
+            job_id,
+            self.owner_id,
+            self.config.lease_seconds
+        )
+        if not claimed:
+            return
+        note = f"Missed run at {row['next_run']} dropped by misfire policy"
+        if metadata.get('trigger_type'):
+            await self._advance_recurring_job(job_id, metadata, row['handler'], note)
+            return
+        await loop.run_in_executor(None, self.store.update_job, job_id, {
+            'status': JobStatus.CANCELLED.value,
+            'last_error': note,
+            'lease_owner': None,
+            'lease_expires_at': None
+        })
+        self.job_index.record(job_id, JobStatus.CANCELLED.value, last_error=note)
+        logger.info(f"Dropped missed job {job_id}")
+
+    def _coalesce_missed_jobs(self, group: List[tuple]) -> Optional[Dict[str, Any]]:
+        """
+        Fold missed reminders for one recipient into the earliest of them.
+        The others are claimed and completed; the earliest gets every
+        group member's payload stored on its row as digest (so retries resend
+        the whole digest) and is returned to be fired. The handler renders
+        the digest. Holding the earliest job's lease meanwhile
+        keeps a second worker from building its own digest for the group.
+        """
+        (primary, primary_metadata), followers = group[0], group[1:]
+        if not self.store.claim_job(primary['job_id'], self.owner_id, self.config.lease_seconds):
+            return None
+        digest = [{k: v for k, v in primary_metadata.items() if k != 'digest'}]
+        for row, metadata in followers:
+            if not self.store.claim_job(row['job_id'], self.owner_id, self.config.lease_seconds):
+                continue
+            if self.store.release_job(row['job_id'], self.owner_id, JobStatus.COMPLETED.value):
+                self.job_index.record(row['job_id'], JobStatus.COMPLETED.value)
+                digest.append(metadata)
+        # Hand the earliest job back to scheduled so the normal claim runs it
+        self.store.update_job(primary['job_id'], {
+            'metadata': {**primary_metadata, 'digest': digest},
+            'status': JobStatus.SCHEDULED.value,
+            'lease_owner': None,
+            'lease_expires_at': None
+        })
+        if len(digest) > 1:
+            logger.info(f"Coalesced {len(digest)} missed reminders into job {primary['job_id']}")
+        return primary
+
+    def _cleanup_jobs(self) -> RetentionReport:
+        """
+        Move finished jobs older than cleanup_after_days into
+        scheduled_jobs_archive, one bounded batch at a time, so the hot
+        table and its status/run_date indexes stay small.
+        """
+        started = time.perf_counter()
+        cutoff = datetime.now(pytz.UTC) - timedelta(days=self.config.cleanup_after_days)
+        archived = 0
+        batches = 0
+        try:
+            while batches < self.config.cleanup_max_batches:
+                moved = self.store.archive_finished_jobs(cutoff, self.config.cleanup_batch_size)
+                batches += 1
+                archived += moved
+                if moved < self.config.cleanup_batch_size:
+                    break
         except Exception as e:
             logger.error(f"Failed to clean up old jobs: {str(e)}")
+        
+        # Settled outbox sends age out on the same schedule
+        purged = 0
+        try:
+            for _ in range(self.config.cleanup_max_batches):
+                deleted = self.store.purge_outbox(cutoff, self.config.cleanup_batch_size)
+                purged += deleted
+                if deleted < self.config.cleanup_batch_size:
+                    break
+        except Exception as e:
+            logger.error(f"Failed to purge old outbox sends: {str(e)}")
+        
+        report = RetentionReport(
+            archived=archived,
+            batches=batches,
+            duration_seconds=round(time.perf_counter() - started, 3),
+            outbox_purged=purged
+        )
+        logger.info(
+            f"Archived {report.archived} finished jobs older than {cutoff.isoformat()} "
+            f"in {report.batches} batches ({report.duration_seconds}s); purged {report.outbox_purged} settled outbox sends"
+        )
+        return report
 
     def schedule_recurring(
         self,
@@ -374,8 +1196,16 @@ class SupabaseJobScheduler:
         **trigger_args
     ) -> ScheduledJob:
         """
-        Schedule a function to run on a recurring basis
+        Schedule a function to run on a recurring basis, starting no earlier
+        than run_date. Only the next occurrence is stored (as next_run); each
+        firing computes and persists the one after it.
         """
+        if run_date.tzinfo is None:
+            run_date = self.timezone.localize(run_date)
+        if trigger_type == TriggerType.INTERVAL:
+            # Anchor intervals on run_date so later occurrences don't drift
+            trigger_args.setdefault('start_date', run_date)
+        
         # Convert datetime to ISO format string for JSON serialization
         metadata = {
             "trigger_type": trigger_type.value,
@@ -385,10 +1215,20 @@ class SupabaseJobScheduler:
             }
         }
         
+        first_run = run_date
+        if trigger_type != TriggerType.ONCE:
+            first_run = self._next_fire_time(
+                trigger_type.value,
+                metadata["trigger_args"],
+                max(run_date, datetime.now(pytz.UTC))
+            )
+            if first_run is None:
+                raise ValueError(f"Trigger for job {job_id} never fires after {run_date.isoformat()}")
+        
         return self._create_job(
             job_id=job_id,
             job_type=JobType.CUSTOM,
-            run_date=run_date,
+            run_date=first_run,
             func=func,
             metadata=metadata
         )
@@ -429,6 +1269,7 @@ class SupabaseJobScheduler:
                 hours=kwargs.get('hours', 0),
                 minutes=kwargs.get('minutes', 0),
                 seconds=kwargs.get('seconds', 0),
+                start_date=kwargs.get('start_date'),
                 timezone=self.timezone
             )
             
@@ -456,6 +1297,150 @@ class SupabaseJobScheduler:
             metadata=kwargs
         )
 
+    def schedule_many(self, specs: List[JobSpec]) -> List[JobScheduleResult]:
+        """
+        Schedule several jobs at once.
+
+        All rows are persisted with one multi-row insert, and those due within
+        the arm window are registered with the in-memory scheduler in one pass. If the batch insert is rejected,
+        rows are retried one by one so each spec gets its own result.
+        """
+        now = datetime.now(pytz.UTC)
+        prepared = []
+        for spec in specs:
+            # Ensure run_date is timezone-aware
+            run_date = spec.run_date
+            if run_date.tzinfo is None:
+                run_date = pytz.UTC.localize(run_date)
+            prepared.append((spec, run_date, {
+                'job_id': spec.job_id,
+                'job_type': spec.job_type.value,
+                'run_date': run_date.isoformat(),
+                'next_run': run_date.isoformat(),
+                'status': JobStatus.SCHEDULED.value,
+                'metadata': spec.metadata,
+                'created_at': now.isoformat(),
+                'retry_count': spec.retry_count,
+                'max_retries': self.retry_policy(spec.job_type).max_retries,
+                'handler': self._handler_name(spec.func)
+            }))
+        
+        errors: Dict[str, str] = {}
+        try:
+            self.store.insert_jobs([job_dict for _, _, job_dict in prepared])
+        except Exception as e:
+            logger.warning(f"Batch insert of {len(prepared)} jobs failed ({e}); inserting individually")
+            for _, _, job_dict in prepared:
+                try:
+                    self.store.insert_job(job_dict)
+                except Exception as row_error:
+                    errors[job_dict['job_id']] = str(row_error)
+        
+        # Jobs beyond the arm window stay in storage until the window loader reaches them
+        stored = [
+            item for item in prepared
+            if item[2]['job_id'] not in errors and self._in_arm_window(item[1], now)
+        ]
+        # Either way only the job id and handler stay in memory; the payload
+        # lives in storage and is loaded when the job fires
+        if self.timer_engine is not None:
+            self.timer_engine.add_many(
+                (job_dict['job_id'], run_date, job_dict['handler'])
+                for _, run_date, job_dict in stored
+            )
+        else:
+            for spec, run_date, job_dict in stored:
+                try:
+                    self._arm_stored_job(spec.job_id, run_date, job_dict['handler'])
+                except Exception as e:
+                    errors[spec.job_id] = str(e)
+        
+        results = []
+        for _, run_date, job_dict in prepared:
+            job_id = job_dict['job_id']
+            if job_id not in errors:
+                self.job_index.record(
+                    job_id,
+                    JobStatus.SCHEDULED.value,
+                    job_type=job_dict['job_type'],
+                    run_date=run_date,
+                    retry_count=job_dict['retry_count']
+                )
+            if job_id in errors:
+                logger.error(f"Failed to schedule job {job_id}: {errors[job_id]}")
+                results.append(JobScheduleResult(job_id=job_id, scheduled=False, error=errors[job_id]))
+            else:
+                results.append(JobScheduleResult(job_id=job_id, scheduled=True, job=ScheduledJob(**job_dict)))
+        return results
+
+    def reschedule(self, spec: JobSpec) -> JobScheduleResult:
+        """
+        Move a job to spec's run date and payload, keeping its job id.
+
+        An existing row is updated in place and set back to scheduled, so a
+        one-shot job such as a task's reminder can be moved after it was
+        cancelled or ran; job ids stay unique. Without a row this is
+        schedule_many for the one spec. A running job is left alone.
+        """
+        try:
+            row = self.store.get_job(spec.job_id)
+        except Exception as e:
+            logger.error(f"Failed to reschedule job {spec.job_id}: {str(e)}")
+            return JobScheduleResult(job_id=spec.job_id, scheduled=False, error=str(e))
+        if row is None:
+            return self.schedule_many([spec])[0]
+        if row['status'] == JobStatus.RUNNING.value:
+            error = "job is running"
+            logger.error(f"Failed to reschedule job {spec.job_id}: {error}")
+            return JobScheduleResult(job_id=spec.job_id, scheduled=False, error=error)
+
+        now = datetime.now(pytz.UTC)
+        run_date = spec.run_date
+        if run_date.tzinfo is None:
+            run_date = pytz.UTC.localize(run_date)
+        job_dict = {
+            'job_id': spec.job_id,
+            'job_type': spec.job_type.value,
+            'run_date': run_date.isoformat(),
+            'next_run': run_date.isoformat(),
+            'status': JobStatus.SCHEDULED.value,
+            'metadata': spec.metadata,
+            'retry_count': spec.retry_count,
+            'max_retries': self.retry_policy(spec.job_type).max_retries,
+            'handler': self._handler_name(spec.func)
+        }
+        try:
+            self.store.update_job(spec.job_id, {
+                **job_dict,
+                'last_run': None,
+                'last_error': None,
+                'lease_owner': None,
+                'lease_expires_at': None
+            })
+        except Exception as e:
+            logger.error(f"Failed to reschedule job {spec.job_id}: {str(e)}")
+            return JobScheduleResult(job_id=spec.job_id, scheduled=False, error=str(e))
+
+        # Drop the old timer; the new one is armed now or by the window loader
+        if self.timer_engine is not None:
+            self.timer_engine.cancel(spec.job_id)
+        elif self.scheduler.get_job(spec.job_id):
+            self.scheduler.remove_job(spec.job_id)
+        if self._in_arm_window(run_date, now):
+            self._reschedule_job(spec.job_id, run_date, job_dict['handler'])
+        self.job_index.record(
+            spec.job_id,
+            JobStatus.SCHEDULED.value,
+            job_type=job_dict['job_type'],
+            run_date=run_date,
+            retry_count=spec.retry_count
+        )
+        return JobScheduleResult(
+            job_id=spec.job_id,
+            scheduled=True,
+            job=ScheduledJob(**job_dict, created_at=row.get('created_at') or now.isoformat())
+        )
+
     def _create_job(
         self,
         job_id: str,
@@ -466,58 +1451,17 @@ class SupabaseJobScheduler:
         retry_count: int = 0
     ) -> ScheduledJob:
         """Create and store a job"""
-        # Ensure run_date is timezone-aware
-        if run_date.tzinfo is None:
-            run_date = pytz.UTC.localize(run_date)
-            
-        now = datetime.now(pytz.UTC)
-        
-        job_dict = {
-            'job_id': job_id,
-            'job_type': job_type.value,
-            'run_date': run_date.isoformat(),
-            'status': JobStatus.SCHEDULED.value,
-            'metadata': metadata,
-            'created_at': now.isoformat(),
-            'retry_count': retry_count,
-            'max_retries': self.config.max_retries
-        }
-
-        # Store in Supabase
-        self.supabase.table('scheduled_jobs').insert(job_dict).execute()
-        
-        # Schedule in APScheduler with the wrapped function
-        wrapped_func = self._job_wrapper(func)
-        self.scheduler.add_job(
-            func=wrapped_func,
-            trigger='date',
+        result = self.schedule_many([JobSpec(
+            job_id=job_id,
+            job_type=job_type,
             run_date=run_date,
-            id=job_id,
-            kwargs={'job_id': job_id, **metadata},
-            misfire_grace_time=None
-        )
-
-        return ScheduledJob(**job_dict)
-
-    def _get_function_for_job_type(self, job_type: str):
-        """
-        Returns the appropriate function for the given job type
-        
-        Args:
-            job_type (str): The type of job to execute
-            
-        Returns:
-            callable: The function to execute for this job type
-        """
-        job_type_mapping = {
-            'sms': send_sms,
-            # Add other job types here
-        }
-        
-        if job_type not in job_type_mapping:
-            raise ValueError(f"Unknown job type: {job_type}")
-        
-        return job_type_mapping[job_type]
+            func=func,
+            metadata=metadata,
+            retry_count=retry_count
+        )])[0]
+        if not result.scheduled:
+            raise RuntimeError(f"Failed to schedule job {job_id}: {result.error}")
+        return result.job
 
 # Create the Supabase table (run this SQL in Supabase SQL editor):
 """
@@ -536,7 +1480,7 @@ alter table scheduled_jobs replica identity full;
 alter publication supabase_realtime add table scheduled_jobs;
 """
 
-# Create a global instance
+# Create a global instance; the app starts it (see main.lifespan)
 scheduler = SupabaseJobScheduler()
 
 # Expose convenient functions
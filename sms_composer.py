@@ -0,0 +1,158 @@
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+import re
+import unicodedata
+
+# GSM 03.38 default alphabet (one septet each) and its extension table
+# (escape + character, two septets each)
+GSM_BASIC = set(
+    "@£$¥èéùìòÇ\nØø\rÅåΔ_ΦΓΛΩΠΨΣΘΞÆæßÉ !\"#¤%&'()*+,-./0123456789:;<=>?"
+    "¡ABCDEFGHIJKLMNOPQRSTUVWXYZÄÖÑÜ§¿abcdefghijklmnopqrstuvwxyzäöñüà"
+)
+GSM_EXTENDED = set("^{}\\[]~|€\f")
+
+# (single-segment limit, per-segment limit once concatenated)
+SEGMENT_LIMITS = {"GSM-7": (160, 153), "UCS-2": (70, 67)}
+
+# GSM-safe stand-ins for characters our messages use. Decorative emoji are
+# dropped; anything else outside GSM-7 falls back to its accent-stripped form.
+GSM_REPLACEMENTS: Dict[str, str] = {
+    "🔔": "", "📅": "", "📍": "", "⏰": "", "⌛": "", "⏳": "", "🎂": "", "📝": "",
+    "🔄": "", "✅": "", "❌": "",
+    "•": "-", "–": "-", "—": "-", "…": "...",
+    "‘": "'", "’": "'", "“": '"', "”": '"',
+    "\u00a0": " ", "\t": " ",
+    "\ufe0f": "", "\u200d": "",  # Emoji variation selector and zero-width joiner
+}
+
+ELLIPSIS = "..."
+
+
+class SmsEncoding(Enum):
+    GSM_7 = "GSM-7"
+    UCS_2 = "UCS-2"
+
+
+class EmojiPolicy(Enum):
+    KEEP = "keep"  # Send the text as written
+    WHEN_CHEAPER = "when_cheaper"  # Swap to GSM-safe text only if it saves a segment
+    ALWAYS = "always"  # Always swap to GSM-safe text
+
+
+class SmsSegments(BaseModel):
+    encoding: SmsEncoding
+    units: int  # Septets for GSM-7, UTF-16 code units for UCS-2
+    segments: int
+
+
+class ComposedSms(BaseModel):
+    text: str
+    encoding: SmsEncoding
+    segments: int
+    original_segments: int
+    replaced: bool = False  # Non-GSM characters were swapped out
+    truncated: bool = False
+
+
+def _char_units(text: str) -> Tuple[SmsEncoding, List[int]]:
+    """Encoding for text and the cost of each character in it"""
+    if all(char in GSM_BASIC or char in GSM_EXTENDED for char in text):
+        return SmsEncoding.GSM_7, [2 if char in GSM_EXTENDED else 1 for char in text]
+    # Characters outside the BMP (most emoji) take a surrogate pair
+    return SmsEncoding.UCS_2, [2 if ord(char) > 0xFFFF else 1 for char in text]
+
+
+def measure(text: str) -> SmsSegments:
+    """Encoding and billed segment count for text"""
+    encoding, units = _char_units(text)
+    single, per_segment = SEGMENT_LIMITS[encoding.value]
+    total = sum(units)
+    if total <= single:
+        return SmsSegments(encoding=encoding, units=total, segments=1 if total else 0)
+    # Concatenated parts never split an escape sequence or surrogate pair
+    segments, used = 1, 0
+    for cost in units:
+        if used + cost > per_segment:
+            segments += 1
+            used = 0
+        used += cost
+    return SmsSegments(encoding=encoding, units=total, segments=segments)
+
+
+def to_gsm(text: str) -> str:
+    """text with every character outside GSM-7 replaced or dropped"""
+    out = []
+    for char in text:
+        if char in GSM_BASIC or char in GSM_EXTENDED:
+            out.append(char)
+        elif char in GSM_REPLACEMENTS:
+            out.append(GSM_REPLACEMENTS[char])
+        else:
+            # á -> a, ﬁ -> fi; emoji and other symbols decompose to nothing usable
+            out.extend(c for c in unicodedata.normalize("NFKD", char) if c in GSM_BASIC)
+    # Tidy the gaps dropped emoji leave behind
+    lines = [re.sub(r" {2,}", " ", line).strip(" ") for line in "".join(out).split("\n")]
+    return "\n".join(lines)
+
+
+def truncate(text: str, max_segments: int, suffix: str = "") -> str:
+    """
+    Longest prefix of text that, with an ellipsis and suffix, fits in
+    max_segments. Cuts at a word break when one is close by.
+    """
+    if measure(text + suffix).segments <= max_segments:
+        return text + suffix
+    # Segment count only grows with prefix length, so binary search it
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if measure(text[:mid].rstrip() + ELLIPSIS + suffix).segments <= max_segments:
+            low = mid
+        else:
+            high = mid - 1
+    prefix = text[:low]
+    word_break = max(prefix.rfind(" "), prefix.rfind("\n"))
+    if word_break >= len(prefix) - 20 and word_break > 0:
+        prefix = prefix[:word_break]
+    return prefix.rstrip() + ELLIPSIS + suffix
+
+
+def compose_sms(
+    text: str,
+    emoji: EmojiPolicy = EmojiPolicy.WHEN_CHEAPER,
+    max_segments: Optional[int] = None,
+    suffix: str = ""
+) -> ComposedSms:
+    """
+    Final SMS text under a cost policy: swap characters that force UCS-2 for
+    GSM-safe text as the policy allows, then, if max_segments is set, cut the
+    text on a segment boundary while keeping suffix whole.
+    """
+    original = measure(text + suffix)
+    body, replaced = text, False
+    if emoji != EmojiPolicy.KEEP and original.encoding == SmsEncoding.UCS_2:
+        gsm_body, gsm_suffix = to_gsm(text), to_gsm(suffix)
+        if not gsm_body.strip():
+            pass  # Nothing but emoji; send it as written
+        elif emoji == EmojiPolicy.ALWAYS or measure(gsm_body + gsm_suffix).segments < original.segments:
+            body, suffix, replaced = gsm_body, gsm_suffix, True
+        elif max_segments is not None and original.segments > max_segments:
+            # Still worth it if GSM-7 lets more of the text fit before the cut
+            if len(truncate(gsm_body, max_segments, gsm_suffix)) > len(truncate(text, max_segments, suffix)):
+                body, suffix, replaced = gsm_body, gsm_suffix, True
+
+    final = body + suffix
+    truncated = False
+    if max_segments is not None and measure(final).segments > max_segments:
+        final = truncate(body, max_segments, suffix)
+        truncated = True
+    result = measure(final)
+    return ComposedSms(
+        text=final,
+        encoding=result.encoding,
+        segments=result.segments,
+        original_segments=original.segments,
+        replaced=replaced,
+        truncated=truncated
+    )
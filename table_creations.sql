@@ -10,13 +10,478 @@ create table scheduled_jobs (
     last_run timestamp with time zone,
     next_run timestamp with time zone,
     retry_count integer default 0,
-    max_retries integer default 3
+    max_retries integer default 3,
+    handler text,
+    lease_owner text,
+    lease_expires_at timestamp with time zone,
+    last_error text
 );
 
--- Add indexes for common queries
-create index idx_scheduled_jobs_job_id on scheduled_jobs(job_id);
+-- Add indexes for common queries; job lookups and lease claims expect one row per job_id
+create unique index idx_scheduled_jobs_job_id on scheduled_jobs(job_id);
 create index idx_scheduled_jobs_status on scheduled_jobs(status);
 create index idx_scheduled_jobs_run_date on scheduled_jobs(run_date);
+create index idx_scheduled_jobs_lease on scheduled_jobs(status, lease_expires_at);
+-- The scheduler arms only jobs due soon, found by scanning next_run
+create index idx_scheduled_jobs_next_run on scheduled_jobs(status, next_run);
+
+-- Existing deployments: add the job handler reference and lease columns
+-- alter table scheduled_jobs add column if not exists handler text;
+-- alter table scheduled_jobs add column if not exists lease_owner text;
+-- alter table scheduled_jobs add column if not exists lease_expires_at timestamp with time zone;
+-- alter table scheduled_jobs add column if not exists last_error text;
+-- create index if not exists idx_scheduled_jobs_next_run on scheduled_jobs(status, next_run);
+-- update scheduled_jobs set next_run = run_date where next_run is null and status = 'scheduled';
+-- Existing deployments: make job ids unique (remove duplicate rows first)
+-- drop index if exists idx_scheduled_jobs_job_id;
+-- create unique index idx_scheduled_jobs_job_id on scheduled_jobs(job_id);
+
+-- Atomically claim a job for one worker. Succeeds for scheduled jobs and for
+-- running jobs whose lease has expired (takeover); uses the database clock.
+create or replace function claim_scheduled_job(p_job_id text, p_owner text, p_lease_seconds integer)
+returns boolean
+language sql
+as $$
+    with claimed as (
+        update scheduled_jobs
+           set status = 'running',
+               lease_owner = p_owner,
+               lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+               last_run = now(),
+               updated_at = now()
+         where job_id = p_job_id
+           and (status = 'scheduled' or (status = 'running' and lease_expires_at < now()))
+        returning 1
+    )
+    select exists(select 1 from claimed);
+$$;
+
+-- One page of scheduled jobs whose run time passed before p_missed_before,
+-- for misfire catch-up, ordered and paged by (run time, job_id). Rows written
+-- without next_run (direct inserts, rows older than the column) fall back
+-- to run_date, returned as next_run.
+create or replace function get_missed_scheduled_jobs(
+    p_missed_before timestamp with time zone,
+    p_after_run timestamp with time zone,
+    p_after_job_id text,
+    p_limit integer
+)
+returns table (job_id text, job_type text, next_run timestamp with time zone, handler text, metadata jsonb)
+language sql
+stable
+as $$
+    select j.job_id, j.job_type, coalesce(j.next_run, j.run_date), j.handler, j.metadata
+      from scheduled_jobs j
+     where j.status = 'scheduled'
+       and coalesce(j.next_run, j.run_date) < p_missed_before
+       and (p_after_run is null or (coalesce(j.next_run, j.run_date), j.job_id) > (p_after_run, p_after_job_id))
+     order by coalesce(j.next_run, j.run_date), j.job_id
+     limit p_limit;
+$$;
+
+create index if not exists idx_scheduled_jobs_missed on scheduled_jobs(status, (coalesce(next_run, run_date)), job_id);
+
+-- Extend a lease held by p_owner (worker heartbeat)
+create or replace function renew_scheduled_job_lease(p_job_id text, p_owner text, p_lease_seconds integer)
+returns boolean
+language sql
+as $$
+    with renewed as (
+        update scheduled_jobs
+           set lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+               updated_at = now()
+         where job_id = p_job_id
+           and status = 'running'
+           and lease_owner = p_owner
+        returning 1
+    )
+    select exists(select 1 from renewed);
+$$;
+
+-- Finished jobs moved out of the hot table by the scheduler's retention pass
+create table scheduled_jobs_archive (
+    like scheduled_jobs,
+    archived_at timestamp with time zone not null default now()
+);
+create index idx_scheduled_jobs_archive_job_id on scheduled_jobs_archive(job_id);
+
+-- Move one batch of finished jobs (completed, cancelled, or failed; jobs are
+-- only left failed once dead-lettered) last updated before p_finished_before
+-- into the archive.
+create or replace function archive_scheduled_jobs(p_finished_before timestamp with time zone, p_batch_size integer)
+returns integer
+language plpgsql
+as $$
+declare
+    moved integer;
+begin
+    with batch as (
+        select id from scheduled_jobs
+         where status in ('completed', 'cancelled', 'failed')
+           and coalesce(updated_at, created_at) < p_finished_before
+         order by coalesce(updated_at, created_at)
+         limit p_batch_size
+         for update skip locked
+    ), removed as (
+        delete from scheduled_jobs j using batch where j.id = batch.id
+        returning j.*
+    )
+    insert into scheduled_jobs_archive
+    select removed.*, now() from removed;
+    get diagnostics moved = row_count;
+    return moved;
+end;
+$$;
+
+-- Jobs that exhausted their retries, with their last error, for inspection and replay
+create table scheduled_jobs_dead_letter (
+    id bigint generated by default as identity primary key,
+    job_id text not null,
+    job_type text not null,
+    handler text,
+    metadata jsonb not null,
+    retry_count integer not null,
+    last_error text,
+    failed_at timestamp with time zone not null default now(),
+    replayed_at timestamp with time zone
+);
+create index idx_dead_letter_pending on scheduled_jobs_dead_letter(replayed_at, failed_at);
+
+-- Fail a claimed job for good and copy it to the dead-letter table
+create or replace function dead_letter_scheduled_job(p_job_id text, p_owner text, p_error text)
+returns boolean
+language plpgsql
+as $$
+begin
+    with failed as (
+        update scheduled_jobs
+           set status = 'failed',
+               last_error = p_error,
+               lease_owner = null,
+               lease_expires_at = null,
+               updated_at = now()
+         where job_id = p_job_id
+           and status = 'running'
+           and lease_owner = p_owner
+        returning job_id, job_type, handler, metadata, retry_count, last_error
+    )
+    insert into scheduled_jobs_dead_letter (job_id, job_type, handler, metadata, retry_count, last_error)
+    select job_id, job_type, handler, metadata, retry_count, last_error from failed;
+    return found;
+end;
+$$;
+
+-- Put dead-lettered jobs back on the schedule from their dead-letter copy
+create or replace function replay_dead_letter_jobs(p_job_ids text[], p_run_date timestamp with time zone)
+returns table(job_id text, handler text)
+language plpgsql
+as $$
+#variable_conflict use_column
+begin
+    return query
+    with letters as (
+        update scheduled_jobs_dead_letter d
+           set replayed_at = now()
+         where d.job_id = any(p_job_ids)
+           and d.replayed_at is null
+        returning d.job_id, d.job_type, d.handler, d.metadata
+    ), inserted as (
+        -- The failed row is usually still there and is put back in place;
+        -- one that was already archived is inserted again. (Sibling CTEs see
+        -- the same snapshot, so a delete here would not clear the way.)
+        insert into scheduled_jobs (job_id, job_type, run_date, next_run, status, metadata, created_at, retry_count, handler)
+        select distinct on (l.job_id) l.job_id, l.job_type, p_run_date, p_run_date, 'scheduled', l.metadata, now(), 0, l.handler
+          from letters l
+        on conflict (job_id) do update
+           set job_type = excluded.job_type,
+               run_date = excluded.run_date,
+               next_run = excluded.next_run,
+               status = 'scheduled',
+               metadata = excluded.metadata,
+               retry_count = 0,
+               handler = excluded.handler,
+               lease_owner = null,
+               lease_expires_at = null,
+               last_error = null,
+               updated_at = now()
+        returning scheduled_jobs.job_id, scheduled_jobs.handler
+    )
+    select i.job_id, i.handler from inserted i;
+end;
+$$;
+
+-- Provider message SIDs and call ids, what sent them (jobs, reminder or
+-- campaign) and the latest delivery status Twilio or Vapi reported
+create table outbound_deliveries (
+    external_id text primary key,
+    provider text not null,
+    channel text,
+    to_number text,
+    job_ids text[] not null default '{}',
+    reminder_id uuid,
+    campaign_id text,
+    status text,
+    status_rank integer not null default 0,
+    final boolean not null default false,
+    failed boolean not null default false,
+    error_code text,
+    error_message text,
+    details jsonb not null default '{}',
+    created_at timestamp with time zone not null default now(),
+    updated_at timestamp with time zone not null default now()
+);
+create index idx_outbound_deliveries_reminder on outbound_deliveries(reminder_id) where reminder_id is not null;
+create index idx_outbound_deliveries_campaign on outbound_deliveries(campaign_id) where campaign_id is not null;
+
+-- Merge one batch of delivery links and status updates (one row per
+-- external_id) in a single statement. A status only replaces one of equal or
+-- lower rank, since callbacks can arrive out of order. Reminders linked to a
+-- delivery that reached a final status are marked SENT or FAILED from it.
+create or replace function record_outbound_deliveries(p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    written integer;
+begin
+    with incoming as (
+        select * from jsonb_to_recordset(p_rows) as r(
+            external_id text, provider text, channel text, to_number text, job_ids text[],
+            reminder_id uuid, campaign_id text, status text, status_rank integer, final boolean,
+            failed boolean, error_code text, error_message text, details jsonb
+        )
+    ), upserted as (
+        insert into outbound_deliveries as d (
+            external_id, provider, channel, to_number, job_ids, reminder_id, campaign_id,
+            status, status_rank, final, failed, error_code, error_message, details
+        )
+        select external_id, provider, channel, to_number, coalesce(job_ids, '{}'), reminder_id, campaign_id,
+               status, coalesce(status_rank, 0), coalesce(final, false), coalesce(failed, false),
+               error_code, error_message, coalesce(details, '{}')
+          from incoming
+        on conflict (external_id) do update set
+            channel = coalesce(excluded.channel, d.channel),
+            to_number = coalesce(excluded.to_number, d.to_number),
+            job_ids = array(select distinct unnest(d.job_ids || excluded.job_ids)),
+            reminder_id = coalesce(excluded.reminder_id, d.reminder_id),
+            campaign_id = coalesce(excluded.campaign_id, d.campaign_id),
+            status = case when excluded.status is not null and excluded.status_rank >= d.status_rank then excluded.status else d.status end,
+            final = case when excluded.status is not null and excluded.status_rank >= d.status_rank then excluded.final else d.final end,
+            failed = case when excluded.status is not null and excluded.status_rank >= d.status_rank then excluded.failed else d.failed end,
+            error_code = case when excluded.status is not null and excluded.status_rank >= d.status_rank then excluded.error_code else d.error_code end,
+            error_message = case when excluded.status is not null and excluded.status_rank >= d.status_rank then excluded.error_message else d.error_message end,
+            status_rank = case when excluded.status is not null then greatest(d.status_rank, excluded.status_rank) else d.status_rank end,
+            details = d.details || excluded.details,
+            updated_at = now()
+        returning d.reminder_id, d.final, d.failed
+    ), settled as (
+        update reminders r
+           set status = case when u.failed then 'FAILED' else 'SENT' end,
+               updated_at = now()
+          from upserted u
+         where u.reminder_id = r.id
+           and u.final
+           and r.status <> 'CANCELED'
+    )
+    select count(*) into written from upserted;
+    return written;
+end;
+$$;
+
+-- Sends queued by finished jobs and drained by the outbox relay (outbox.py).
+-- A job's sends are inserted in the same transaction that completes it, and
+-- dedup_key comes from the job id, so a job that runs again can't queue its
+-- sends twice. Rows a relay claimed together for one recipient and channel
+-- go out as one message or call; the first dedup_key of the group is sent
+-- to the provider and comes back in its callbacks.
+create table outbound_outbox (
+    dedup_key text primary key,
+    job_id text,
+    channel text not null,
+    to_number text not null,
+    body text not null,
+    status text not null default 'pending',  -- pending, sending, sent or failed
+    attempts integer not null default 0,
+    available_at timestamp with time zone not null default now(),
+    claimed_at timestamp with time zone,
+    lease_owner text,
+    lease_expires_at timestamp with time zone,
+    external_id text,
+    last_error text,
+    created_at timestamp with time zone not null default now(),
+    updated_at timestamp with time zone not null default now(),
+    sent_at timestamp with time zone
+);
+create index idx_outbound_outbox_due on outbound_outbox(status, available_at);
+create index idx_outbound_outbox_recipient on outbound_outbox(channel, to_number) where status = 'pending';
+
+-- Queue sends, skipping any already queued under the same dedup_key. A send
+-- joins the earliest pending send to the same recipient on the same channel,
+-- so reminders due close together are claimed, and sent, together.
+create or replace function enqueue_outbox_messages(p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    queued integer;
+begin
+    insert into outbound_outbox (dedup_key, job_id, channel, to_number, body, available_at)
+    select r.dedup_key, r.job_id, r.channel, r.to_number, r.body,
+           least(r.available_at, coalesce((
+               select min(p.available_at) from outbound_outbox p
+                where p.status = 'pending' and p.channel = r.channel and p.to_number = r.to_number
+           ), r.available_at))
+      from jsonb_to_recordset(p_rows) as r(
+          dedup_key text, job_id text, channel text, to_number text, body text, available_at timestamp with time zone
+      )
+    on conflict (dedup_key) do nothing;
+    get diagnostics queued = row_count;
+    return queued;
+end;
+$$;
+
+-- Complete a claimed job and queue its sends in one transaction, so a crash
+-- leaves both or neither
+create or replace function complete_job_with_outbox(p_job_id text, p_owner text, p_rows jsonb)
+returns boolean
+language plpgsql
+as $$
+begin
+    update scheduled_jobs
+       set status = 'completed',
+           lease_owner = null,
+           lease_expires_at = null,
+           updated_at = now()
+     where job_id = p_job_id
+       and status = 'running'
+       and lease_owner = p_owner;
+    if not found then
+        return false;
+    end if;
+    perform enqueue_outbox_messages(p_rows);
+    return true;
+end;
+$$;
+
+-- Claim up to p_limit due sends for one relay. Sends a dead relay left in
+-- sending (lease expired) are claimed again, unless a provider callback has
+-- since shown they went out.
+create or replace function claim_outbox_messages(p_owner text, p_lease_seconds integer, p_limit integer)
+returns setof outbound_outbox
+language sql
+as $$
+    with due as (
+        select dedup_key from outbound_outbox
+         where (status = 'pending' and available_at <= now())
+            or (status = 'sending' and lease_expires_at < now())
+         order by available_at
+         limit p_limit
+         for update skip locked
+    )
+    update outbound_outbox o
+       set status = 'sending',
+           attempts = o.attempts + 1,
+           claimed_at = now(),
+           lease_owner = p_owner,
+           lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+           updated_at = now()
+      from due
+     where o.dedup_key = due.dedup_key
+    returning o.*;
+$$;
+
+-- Extend the leases p_owner holds on sends still waiting on the provider
+create or replace function renew_outbox_leases(p_owner text, p_keys text[], p_lease_seconds integer)
+returns integer
+language sql
+as $$
+    with renewed as (
+        update outbound_outbox
+           set lease_expires_at = now() + make_interval(secs => p_lease_seconds),
+               updated_at = now()
+         where dedup_key = any(p_keys)
+           and status = 'sending'
+           and lease_owner = p_owner
+        returning 1
+    )
+    select count(*)::integer from renewed;
+$$;
+
+-- Record how sends p_owner claimed went: sent with their provider id, back
+-- to pending for a retry at available_at, or failed for good
+create or replace function settle_outbox_messages(p_owner text, p_rows jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    settled integer;
+begin
+    update outbound_outbox o
+       set status = r.status,
+           external_id = coalesce(r.external_id, o.external_id),
+           last_error = r.last_error,
+           available_at = coalesce(r.available_at, o.available_at),
+           sent_at = case when r.status = 'sent' then now() else o.sent_at end,
+           lease_owner = null,
+           lease_expires_at = null,
+           updated_at = now()
+      from jsonb_to_recordset(p_rows) as r(
+          dedup_key text, status text, external_id text, last_error text, available_at timestamp with time zone
+      )
+     where o.dedup_key = r.dedup_key
+       and o.status = 'sending'
+       and o.lease_owner = p_owner;
+    get diagnostics settled = row_count;
+    return settled;
+end;
+$$;
+
+-- Mark sends sent from provider callbacks that carry their send key, so
+-- sends whose relay died after the provider accepted them aren't sent again.
+-- The key is the first dedup_key of the group claimed together.
+create or replace function link_outbox_sends(p_links jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    linked integer;
+begin
+    update outbound_outbox o
+       set status = 'sent',
+           external_id = l.external_id,
+           sent_at = now(),
+           lease_owner = null,
+           lease_expires_at = null,
+           updated_at = now()
+      from jsonb_to_recordset(p_links) as l(send_key text, external_id text), outbound_outbox k
+     where k.dedup_key = l.send_key
+       and o.status = 'sending'
+       and o.lease_owner = k.lease_owner
+       and o.claimed_at = k.claimed_at
+       and o.channel = k.channel
+       and o.to_number = k.to_number;
+    get diagnostics linked = row_count;
+    return linked;
+end;
+$$;
+
+-- Delete one batch of sent or failed sends last updated before p_finished_before
+create or replace function purge_outbox_messages(p_finished_before timestamp with time zone, p_batch_size integer)
+returns integer
+language sql
+as $$
+    with purged as (
+        delete from outbound_outbox
+         where dedup_key in (
+             select dedup_key from outbound_outbox
+              where status in ('sent', 'failed')
+                and updated_at < p_finished_before
+              limit p_batch_size
+         )
+        returning 1
+    )
+    select count(*)::integer from purged;
+$$;
 
 -- Enable realtime for this table (optional)
 alter table scheduled_jobs replica identity full;
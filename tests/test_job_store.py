@@ -0,0 +1,105 @@
+"""
+Lease and dead-letter transitions in SQLiteJobStore, which mirrors the
+Supabase functions in table_creations.sql.
+
+Usage:
+    python -m pytest tests/test_job_store.py
+"""
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from job_store import SQLiteJobStore  # noqa: E402
+
+OWNER = "worker-1"
+
+
+def new_store(job_id: str = "job_1") -> SQLiteJobStore:
+    store = SQLiteJobStore(":memory:")
+    now = datetime.now(pytz.UTC)
+    store.insert_job({
+        'job_id': job_id,
+        'job_type': 'custom',
+        'run_date': now.isoformat(),
+        'next_run': now.isoformat(),
+        'status': 'scheduled',
+        'metadata': {'n': 1},
+        'created_at': now.isoformat(),
+        'handler': 'record_run'
+    })
+    return store
+
+
+def test_replay_dead_letter_with_failed_row_present():
+    store = new_store()
+    assert store.claim_job("job_1", OWNER, 60)
+    assert store.dead_letter_job("job_1", OWNER, "boom")
+    assert store.get_job("job_1")['status'] == 'failed'
+
+    run_date = datetime.now(pytz.UTC) + timedelta(minutes=5)
+    replayed = store.replay_dead_letters(["job_1"], run_date)
+
+    assert replayed == [{'job_id': "job_1", 'handler': "record_run"}]
+    row = store.get_job("job_1")
+    assert row['status'] == 'scheduled'
+    assert row['retry_count'] == 0
+    assert row['last_error'] is None
+    assert row['lease_owner'] is None
+    assert row['metadata'] == {'n': 1}
+    assert datetime.fromisoformat(row['next_run']) == run_date
+    assert store.claim_job("job_1", OWNER, 60)
+    # Replayed once; a second replay finds nothing
+    assert store.replay_dead_letters(["job_1"], run_date) == []
+
+
+def test_cancel_during_recurring_run_stays_cancelled():
+    store = new_store()
+    assert store.claim_job("job_1", OWNER, 60)
+    store.update_job("job_1", {'status': 'cancelled'})
+
+    next_run = datetime.now(pytz.UTC) + timedelta(hours=1)
+    assert not store.advance_recurring_job("job_1", OWNER, next_run)
+    assert store.get_job("job_1")['status'] == 'cancelled'
+
+
+def test_cancel_during_run_stays_cancelled():
+    store = new_store()
+    assert store.claim_job("job_1", OWNER, 60)
+    store.update_job("job_1", {'status': 'cancelled'})
+
+    assert not store.release_job("job_1", OWNER, 'completed')
+    assert store.get_job("job_1")['status'] == 'cancelled'
+
+
+def test_cancel_during_run_queues_no_sends():
+    store = new_store()
+    assert store.claim_job("job_1", OWNER, 60)
+    store.update_job("job_1", {'status': 'cancelled'})
+
+    message = {
+        'dedup_key': "job_1:sms:+15550100",
+        'job_id': "job_1",
+        'channel': 'sms',
+        'to_number': "+15550100",
+        'body': "Reminder",
+        'available_at': datetime.now(pytz.UTC)
+    }
+    assert not store.complete_job_with_outbox("job_1", OWNER, [message])
+    assert store.get_job("job_1")['status'] == 'cancelled'
+    assert store.claim_outbox(OWNER, 60, 10) == []
+
+
+def test_cancel_during_failing_run_is_not_retried_or_dead_lettered():
+    store = new_store()
+    assert store.claim_job("job_1", OWNER, 60)
+    store.update_job("job_1", {'status': 'cancelled'})
+
+    run_date = datetime.now(pytz.UTC) + timedelta(minutes=1)
+    assert not store.reschedule_job("job_1", OWNER, run_date, 1, "boom")
+    assert not store.dead_letter_job("job_1", OWNER, "boom")
+    assert store.get_job("job_1")['status'] == 'cancelled'
+    assert store.get_dead_letters(10) == []
@@ -0,0 +1,92 @@
+"""
+Call-then-SMS decisions in ReminderEscalator, with stub providers.
+
+Usage:
+    python -m pytest tests/test_reminder_escalation.py
+"""
+import asyncio
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reminder_escalation import CALL_OUTCOME_TIMEOUT_SECONDS, CallOutcome, ReminderEscalator  # noqa: E402
+
+TO = "+15550100"
+TEXT = "Reminder: dentist at 3pm"
+
+
+class StubProviders:
+    """Records what the escalator asked for and answers as configured"""
+
+    def __init__(self, delivery: Optional[Dict[str, Any]] = None, call_error: Optional[Exception] = None):
+        self.delivery = delivery
+        self.call_error = call_error
+        self.calls: List[str] = []
+        self.sms: List[str] = []
+        self.waits: List[tuple] = []
+
+    async def place_call(self, to_number: str, text: str) -> Dict[str, Any]:
+        self.calls.append(to_number)
+        if self.call_error is not None:
+            raise self.call_error
+        return {"id": "call-1"}
+
+    async def send_sms(self, to_number: str, text: str) -> Dict[str, Any]:
+        self.sms.append(to_number)
+        return {"sid": "SM1"}
+
+    async def wait_for_outcome(self, call_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        self.waits.append((call_id, timeout))
+        return self.delivery
+
+    def escalator(self) -> ReminderEscalator:
+        return ReminderEscalator(self.place_call, self.send_sms, self.wait_for_outcome)
+
+
+def deliver(providers: StubProviders, preferences: Optional[Dict[str, bool]] = None):
+    return asyncio.run(providers.escalator().deliver(TO, TEXT, preferences))
+
+
+def test_answered_call_sends_no_sms():
+    providers = StubProviders(delivery={"final": True, "details": {"ended_reason": "customer-ended-call"}})
+    result = deliver(providers)
+    assert result.call_outcome == CallOutcome.ANSWERED
+    assert result.call_id == "call-1"
+    assert not result.sms_sent
+    assert providers.sms == []
+
+
+def test_unanswered_call_falls_back_to_sms():
+    providers = StubProviders(delivery={"final": True, "failed": True,
+                                        "details": {"ended_reason": "customer-did-not-answer"}})
+    result = deliver(providers)
+    assert result.call_outcome == CallOutcome.UNANSWERED
+    assert result.sms_sent and result.sms_id == "SM1"
+    assert providers.sms == [TO]
+
+
+def test_failed_call_falls_back_to_sms():
+    providers = StubProviders(call_error=RuntimeError("Vapi unavailable"))
+    result = deliver(providers)
+    assert result.call_outcome == CallOutcome.FAILED
+    assert result.call_id is None
+    assert providers.waits == []
+    assert result.sms_sent
+
+
+def test_no_outcome_before_timeout_falls_back_to_sms():
+    providers = StubProviders(delivery=None)
+    result = deliver(providers)
+    assert providers.waits == [("call-1", CALL_OUTCOME_TIMEOUT_SECONDS)]
+    assert result.call_outcome == CallOutcome.UNKNOWN
+    assert result.sms_sent
+
+
+def test_calls_turned_off_sends_sms_only():
+    providers = StubProviders()
+    result = deliver(providers, {"call": False})
+    assert result.call_outcome == CallOutcome.SKIPPED
+    assert providers.calls == []
+    assert result.sms_sent
@@ -0,0 +1,194 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# Longest single sleep before the driver re-checks the wall clock
+MAX_SLEEP_SECONDS = 60.0
+
+
+class TimerRecord:
+    """A pending job: just enough to order it and find its payload later"""
+    __slots__ = ("run_at", "seq", "job_id", "handler", "cancelled")
+
+    def __init__(self, run_at: float, seq: int, job_id: str, handler: str):
+        self.run_at = run_at
+        self.seq = seq
+        self.job_id = job_id
+        self.handler = handler
+        self.cancelled = False
+
+    def __lt__(self, other: "TimerRecord") -> bool:
+        if self.run_at != other.run_at:
+            return self.run_at < other.run_at
+        return self.seq < other.seq
+
+    def __repr__(self) -> str:
+        return f"TimerRecord(job_id={self.job_id!r}, run_at={self.run_at}, handler={self.handler!r})"
+
+
+class TimerEngine:
+    """
+    Compact in-process timer for large numbers of one-shot jobs.
+
+    Pending jobs are kept as a heap of __slots__ records holding only the
+    fire time, job id and handler name. Payloads stay in storage and are
+    loaded by the on_fire callback when records come due. A single loop
+    timer is armed for the earliest record instead of one per job.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._heap: List[TimerRecord] = []
+        self._index: Dict[str, TimerRecord] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._on_fire: Optional[Callable[[List[TimerRecord]], Awaitable[None]]] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._armed_for: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, job_id: str) -> bool:
+        return job_id in self._index
+
+    def add(self, job_id: str, run_at: Union[datetime, float], handler: str) -> TimerRecord:
+        """Add or replace the pending record for job_id"""
+        with self._lock:
+            record = self._push(job_id, run_at, handler)
+            is_earliest = self._heap[0] is record
+        if is_earliest:
+            self._request_rearm()
+        return record
+
+    def add_many(self, items: Iterable[Tuple[str, Union[datetime, float], str]]) -> int:
+        """Add (job_id, run_at, handler) items under one lock and one re-arm"""
+        added = 0
+        with self._lock:
+            earliest = self._heap[0] if self._heap else None
+            for job_id, run_at, handler in items:
+                self._push(job_id, run_at, handler)
+                added += 1
+            moved_earlier = bool(self._heap) and self._heap[0] is not earliest
+        if moved_earlier:
+            self._request_rearm()
+        return added
+
+    def _push(self, job_id: str, run_at: Union[datetime, float], handler: str) -> TimerRecord:
+        if isinstance(run_at, datetime):
+            run_at = run_at.timestamp()
+        # Handler names repeat across millions of records; share one string
+        record = TimerRecord(run_at, next(self._seq), job_id, sys.intern(handler))
+        previous = self._index.get(job_id)
+        if previous is not None:
+            previous.cancelled = True
+        self._index[job_id] = record
+        heapq.heappush(self._heap, record)
+        return record
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending record. The heap entry is dropped lazily."""
+        with self._lock:
+            record = self._index.pop(job_id, None)
+        if record is None:
+            return False
+        record.cancelled = True
+        return True
+
+    def next_run_at(self) -> Optional[float]:
+        """Fire time of the earliest live record"""
+        with self._lock:
+            self._discard_cancelled()
+            return self._heap[0].run_at if self._heap else None
+
+    def pop_due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[TimerRecord]:
+        """Remove and return records due at or before now, earliest first"""
+        now = self.clock() if now is None else now
+        due = []
+        with self._lock:
+            while self._heap and (limit is None or len(due) < limit):
+                record = self._heap[0]
+                if record.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                if record.run_at > now:
+                    break
+                heapq.heappop(self._heap)
+                del self._index[record.job_id]
+                due.append(record)
+        return due
+
+    def _discard_cancelled(self) -> None:
+        while self._heap and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+
+    # Event loop driver
+
+    def start(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        on_fire: Callable[[List[TimerRecord]], Awaitable[None]]
+    ) -> None:
+        """Drive the engine from loop, passing due records to on_fire"""
+        self._loop = loop
+        self._on_fire = on_fire
+        self._request_rearm()
+
+    def stop(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = None
+        self._armed_for = None
+        self._loop = None
+
+    def _request_rearm(self) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._rearm()
+        else:
+            loop.call_soon_threadsafe(self._rearm)
+
+    def _rearm(self) -> None:
+        if self._loop is None:
+            return
+        next_at = self.next_run_at()
+        if next_at is None:
+            if self._handle is not None:
+                self._handle.cancel()
+            self._handle, self._armed_for = None, None
+            return
+        if self._handle is not None and self._armed_for is not None and self._armed_for <= next_at:
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+        delay = min(max(next_at - self.clock(), 0.0), MAX_SLEEP_SECONDS)
+        self._armed_for = next_at
+        self._handle = self._loop.call_at(self._loop.time() + delay, self._tick)
+
+    def _tick(self) -> None:
+        self._handle, self._armed_for = None, None
+        due = self.pop_due()
+        if due and self._on_fire is not None:
+            task = self._loop.create_task(self._on_fire(due))
+            task.add_done_callback(self._log_fire_error)
+        self._rearm()
+
+    @staticmethod
+    def _log_fire_error(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Timer dispatch failed: {task.exception()}")
@@ -12,8 +12,10 @@ from typing import Dict, Any, List
 import json
 from datetime import datetime, timedelta
 from supabase import create_client
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from twilio_sms import send_sms 
+from scheduler import scheduler
+from twilio_sms import sms_sender
+from sms_composer import compose_sms
+from reminder_dispatch import dispatch_reminder
 
 # Add at the very top of the file
 load_dotenv()  # Load environment variables from .env file
@@ -28,10 +30,6 @@ supabase = create_client(
     os.getenv("SUPABASE_ANON_KEY")
 )
 
-# Initialize the scheduler
-scheduler = AsyncIOScheduler()
-scheduler.start()
-
 # @ToolFunctionRegistry.register(
 #     name="testFunction",
 #     description="Test if the system is working properly",
@@ -275,10 +273,13 @@ async def perform_research(research_id: str, query: str) -> None:
             
         if research_data.data:
             customer_number = research_data.data['user_id']
-            send_sms(
-                to_number=customer_number,
-                message=f"Research results ready!\n\n{research_result[:160]}...\n\nReply 'MORE' to see full results."
+            # Two segments of findings, cut on a segment boundary with the reply hint kept
+            sms = compose_sms(
+                f"Research results ready!\n\n{research_result}",
+                max_segments=2,
+                suffix="\n\nReply 'MORE' to see full results."
             )
+            await sms_sender.send(to_number=customer_number, message=sms.text)
     except Exception as e:
         logger.error(f"Research failed: {str(e)}")
 
@@ -506,7 +507,7 @@ async def send_event_reminder(event_id: str) -> None:
             if event['location']:
                 message += f"\n📍 Location: {event['location']}"
             
-            send_sms(to_number=event['user_id'], message=message)
+            await dispatch_reminder("sms", event['user_id'], message)
             
             # Update reminder status
             supabase.table("events").update({"reminder_sent": True}).eq("id", event_id).execute()
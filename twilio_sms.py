@@ -1,51 +1,321 @@
 from twilio.rest import Client
+from twilio.base.exceptions import TwilioRestException
+from twilio.http.async_http_client import AsyncTwilioHttpClient
+from twilio.http.http_client import TwilioHttpClient
+from aiohttp import ClientConnectorError, ClientError, ClientSession, ConnectionTimeoutError, TCPConnector
+from pydantic import BaseModel
+from requests import RequestException
+from requests.exceptions import ConnectTimeout
+from urllib3.exceptions import NewConnectionError
+from circuit_breaker import CircuitBreaker
+from metrics import registry
+from sms_composer import ComposedSms, EmojiPolicy, compose_sms
+import asyncio
+import logging
 import os
+from urllib.parse import urlencode
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
 # Load environment variables
 load_dotenv('.env.local')
 
+logger = logging.getLogger(__name__)
+
+TWILIO_API_ORIGIN = "https://api.twilio.com"
+# Send API requests somewhere else, e.g. the local stand-in in benchmarks/provider_stand_in.py
+TWILIO_API_BASE_URL = os.getenv("TWILIO_API_BASE_URL")
+# Query parameter carrying an outbox send key on the status callback URL
+SEND_KEY_PARAM = "send_key"
+
+SMS_SEGMENTS = registry.histogram(
+    "sms_segments", "Billed segments per sent SMS, by encoding", buckets=(1, 2, 3, 4, 6, 8, 10)
+)
+SMS_SEGMENTS_TOTAL = registry.counter("sms_segments_total", "Billed segments sent, by encoding")
+SMS_REWRITES = registry.counter("sms_rewrites_total", "Sent SMS whose text the composer changed, by change")
+
+
+class SmsResult(BaseModel):
+    """Outcome of one SMS send"""
+    to_number: str
+    sid: Optional[str] = None
+    status: Optional[str] = None
+    error_code: Optional[int] = None
+    error_message: Optional[str] = None
+    segments: Optional[int] = None
+    encoding: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.sid is not None and self.error_code is None
+
+    def as_dict(self) -> dict:
+        """The dict send_sms has always returned"""
+        if not self.ok:
+            return {'error': True, 'message': self.error_message}
+        return {'sid': self.sid, 'status': self.status, 'error_message': self.error_message}
+
+
+def _twilio_unhealthy(error: Exception) -> bool:
+    """Timeouts, connection errors and 5xx count against Twilio's circuit; 4xx and 429 don't"""
+    if isinstance(error, TwilioRestException):
+        return (error.status or 0) >= 500
+    return isinstance(error, (ClientError, asyncio.TimeoutError, RequestException))
+
+
+def _twilio_not_sent(error: Exception) -> bool:
+    """Creating a message isn't idempotent, so only retry when the request never reached Twilio"""
+    if isinstance(error, (ClientConnectorError, ConnectionTimeoutError, ConnectTimeout)):
+        return True
+    # requests wraps a refused or unresolvable connection as MaxRetryError(reason=NewConnectionError)
+    reason = getattr(error.args[0], "reason", None) if isinstance(error, RequestException) and error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _rebase(url: str, base_url: Optional[str]) -> str:
+    if base_url and url.startswith(TWILIO_API_ORIGIN):
+        return base_url.rstrip("/") + url[len(TWILIO_API_ORIGIN):]
+    return url
+
+
+class _PooledAsyncHttpClient(AsyncTwilioHttpClient):
+    """Twilio's async client with its session passed in and its timeout applied to every request"""
+
+    def __init__(self, session: ClientSession, timeout: float, base_url: Optional[str] = None):
+        super().__init__(pool_connections=False, timeout=timeout)
+        self.session = session
+        self.base_url = base_url
+
+    async def request(self, method: str, url: str, *args, timeout: Optional[float] = None, **kwargs):
+        # Twilio passes timeout=None through, which aiohttp reads as "no timeout".
+        # aiohttp's timeout covers the whole request, connecting included.
+        return await super().request(method, _rebase(url, self.base_url), *args, timeout=timeout or self.timeout, **kwargs)
+
+
+class _SyncHttpClient(TwilioHttpClient):
+    def __init__(self, timeout: float, connect_timeout: float, base_url: Optional[str] = None):
+        super().__init__(timeout=timeout)
+        # requests takes (connect, read) timeouts as a pair
+        self.timeout = (connect_timeout, timeout)
+        self.base_url = base_url
+
+    def request(self, method: str, url: str, *args, **kwargs):
+        return super().request(method, _rebase(url, self.base_url), *args, **kwargs)
+
+
+class TwilioSmsSender:
+    """
+    Sends SMS through one Twilio client per process.
+
+    The async client keeps a pooled aiohttp session (at most max_connections
+    open to Twilio), created by start() in the app lifespan or on first use
+    and closed by aclose(). send_blocking serves code outside the event loop
+    through a sync client that is likewise built once and reuses its
+    connections.
+
+    Both clients go through one circuit breaker: while Twilio is timing out
+    or returning 5xx, sends fail fast with a CircuitOpenError result rather
+    than each waiting out the timeouts.
+
+    Every message goes through the SMS composer first: under emoji_policy,
+    characters that force UCS-2 are swapped for GSM-safe text when that
+    saves segments, and messages longer than max_segments are cut on a
+    segment boundary.
+    """
+
+    def __init__(
+        self,
+        account_sid: Optional[str] = None,
+        auth_token: Optional[str] = None,
+        from_number: Optional[str] = None,
+        max_connections: int = int(os.getenv("TWILIO_MAX_CONNECTIONS", "10")),
+        max_concurrency: int = 10,
+        timeout_seconds: float = float(os.getenv("TWILIO_TIMEOUT", "10")),
+        connect_timeout_seconds: float = float(os.getenv("TWILIO_CONNECT_TIMEOUT", "3")),
+        emoji_policy: EmojiPolicy = EmojiPolicy(os.getenv("SMS_EMOJI_POLICY", "when_cheaper")),
+        max_segments: Optional[int] = int(os.getenv("SMS_MAX_SEGMENTS", "10")) or None,
+        status_callback: Optional[str] = os.getenv("TWILIO_STATUS_CALLBACK_URL"),
+        base_url: Optional[str] = TWILIO_API_BASE_URL
+    ):
+        self.account_sid = account_sid or os.getenv('TWILIO_ACCOUNT_SID')
+        self.auth_token = auth_token or os.getenv('TWILIO_AUTH_TOKEN')
+        self.from_number = from_number or os.getenv('TWILIO_PHONE_NUMBER')
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.timeout_seconds = timeout_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+        self.emoji_policy = emoji_policy
+        self.max_segments = max_segments
+        # Public URL of POST /callbacks/twilio/sms; Twilio reports delivery status there
+        self.status_callback = status_callback
+        self.base_url = base_url
+        self._client: Optional[Client] = None
+        self._http_client: Optional[_PooledAsyncHttpClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sync_client: Optional[Client] = None
+        self.breaker = CircuitBreaker("twilio_messages", _twilio_unhealthy)
+
+    async def start(self) -> None:
+        """Open the pooled async client on the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is loop:
+            return
+        # aiohttp sessions belong to the loop that created them
+        self._http_client = _PooledAsyncHttpClient(
+            ClientSession(connector=TCPConnector(limit=self.max_connections)),
+            self.timeout_seconds,
+            self.base_url
+        )
+        self._client = Client(self.account_sid, self.auth_token, http_client=self._http_client)
+        self._loop = loop
+
+    async def aclose(self) -> None:
+        if self._http_client is not None and self._http_client.session is not None:
+            await self._http_client.session.close()
+        self._client = None
+        self._http_client = None
+        self._loop = None
+
+    async def send(
+        self,
+        to_number: str,
+        message: str,
+        from_number: Optional[str] = None,
+        send_key: Optional[str] = None,
+        **kwargs
+    ) -> SmsResult:
+        """Send one SMS without blocking the event loop; send_key comes back on its status callbacks"""
+        await self.start()
+        composed = self.compose(message)
+        try:
+            sent = await self.breaker.call(
+                lambda: self._client.messages.create_async(
+                    body=composed.text,
+                    from_=from_number or self.from_number,
+                    to=to_number,
+                    **self._callback_options(send_key)
+                ),
+                retry_if=_twilio_not_sent
+            )
+            return self._result(to_number, sent, composed)
+        except Exception as e:
+            return self._error(to_number, e)
+
+    async def send_many(
+        self,
+        messages: Iterable[Tuple[str, str]],
+        from_number: Optional[str] = None,
+        max_concurrency: Optional[int] = None
+    ) -> List[SmsResult]:
+        """
+        Send (to_number, message) pairs with at most max_concurrency in
+        flight. Results come back in input order; failures are results too.
+        """
+        slots = asyncio.Semaphore(max_concurrency or self.max_concurrency)
+
+        async def send_one(to_number: str, message: str) -> SmsResult:
+            async with slots:
+                return await self.send(to_number, message, from_number)
+
+        return list(await asyncio.gather(*(send_one(to, body) for to, body in messages)))
+
+    def send_blocking(
+        self,
+        to_number: str,
+        message: str,
+        from_number: Optional[str] = None,
+        send_key: Optional[str] = None,
+        **kwargs
+    ) -> SmsResult:
+        """Send one SMS from synchronous code"""
+        if self._sync_client is None:
+            self._sync_client = Client(
+                self.account_sid,
+                self.auth_token,
+                http_client=_SyncHttpClient(self.timeout_seconds, self.connect_timeout_seconds, self.base_url)
+            )
+        composed = self.compose(message)
+        try:
+            sent = self.breaker.call_blocking(
+                lambda: self._sync_client.messages.create(
+                    body=composed.text,
+                    from_=from_number or self.from_number,
+                    to=to_number,
+                    **self._callback_options(send_key)
+                ),
+                retry_if=_twilio_not_sent
+            )
+            return self._result(to_number, sent, composed)
+        except Exception as e:
+            return self._error(to_number, e)
+
+    def status_callback_url(self, send_key: Optional[str] = None) -> Optional[str]:
+        """Status callback URL for a message, carrying its outbox send key if it has one"""
+        if not self.status_callback or not send_key:
+            return self.status_callback
+        separator = "&" if "?" in self.status_callback else "?"
+        return f"{self.status_callback}{separator}{urlencode({SEND_KEY_PARAM: send_key})}"
+
+    def _callback_options(self, send_key: Optional[str] = None) -> dict:
+        url = self.status_callback_url(send_key)
+        return {"status_callback": url} if url else {}
+
+    def compose(self, message: str) -> ComposedSms:
+        """The text send() would actually send, with its encoding and segment count"""
+        return compose_sms(message, self.emoji_policy, self.max_segments)
+
+    @staticmethod
+    def _result(to_number: str, sent, composed: ComposedSms) -> SmsResult:
+        logger.info(f"Message sent to {to_number}, SID: {sent.sid}, "
+                    f"{composed.segments} {composed.encoding.value} segment(s)")
+        encoding = composed.encoding.value
+        SMS_SEGMENTS.observe(composed.segments, encoding=encoding)
+        SMS_SEGMENTS_TOTAL.inc(composed.segments, encoding=encoding)
+        if composed.replaced:
+            SMS_REWRITES.inc(change="replaced")
+        if composed.truncated:
+            SMS_REWRITES.inc(change="truncated")
+        return SmsResult(
+            to_number=to_number,
+            sid=sent.sid,
+            status=sent.status,
+            error_code=sent.error_code,
+            error_message=sent.error_message,
+            segments=composed.segments,
+            encoding=encoding
+        )
+
+    @staticmethod
+    def _error(to_number: str, error: Exception) -> SmsResult:
+        if isinstance(error, TwilioRestException):
+            # Keep the HTTP status in the text so callers can spot 429s
+            result = SmsResult(to_number=to_number, error_code=error.code or error.status,
+                               error_message=f"HTTP {error.status}: {error.msg}")
+        else:
+            # Timeouts stringify to nothing
+            result = SmsResult(to_number=to_number, error_code=-1, error_message=str(error) or repr(error))
+        logger.error(f"Error sending message to {to_number}: {result.error_message}")
+        return result
+
+
+sms_sender = TwilioSmsSender()
+
+
 def send_sms(to_number: str, message: str, from_number: Optional[str] = None, **kwargs) -> dict:
     """
     Send an SMS message using Twilio
-    
+
     Args:
         to_number (str): The recipient's phone number
         message (str): The message content
         from_number (Optional[str]): The sender's phone number (defaults to env var)
         **kwargs: Additional keyword arguments (ignored)
-    
+
     Returns:
         dict: Response from Twilio API
     """
-    try:
-        # Initialize Twilio client with credentials from .env
-        client = Client(
-            os.getenv('TWILIO_ACCOUNT_SID'),
-            os.getenv('TWILIO_AUTH_TOKEN')
-        )
-        
-        # Send message
-        message = client.messages.create(
-            body=message,
-            from_=from_number or os.getenv('TWILIO_PHONE_NUMBER'),
-            to=to_number
-        )
-        
-        print(f"Message sent successfully! SID: {message.sid}")
-        return {
-            'sid': message.sid,
-            'status': message.status,
-            'error_message': message.error_message
-        }
-        
-    except Exception as e:
-        print(f"Error sending message: {str(e)}")
-        return {
-            'error': True,
-            'message': str(e)
-        }
+    return sms_sender.send_blocking(to_number, message, from_number).as_dict()
 
 # Example usage:
 # send_sms("+1234567890", "Hello from your app!")
+# await sms_sender.send_many([("+1234567890", "Hello"), ("+1987654321", "Hi")])